@@ -1,8 +1,66 @@
-from django.contrib import admin
-from .models import Category, TimeSlot, UserProfile
+from datetime import timedelta
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.conf import settings
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.template.response import TemplateResponse
+from . import bulk, slowqueries
+from .models import BookingEvent, Category, SlowQuery, Task, TimeSlot, UserProfile
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 
+
+class EstimatedCountPaginator(Paginator):
+  """
+  Paginator that trusts the database's row estimate for large, unfiltered tables.
+
+  An exact COUNT(*) over a huge table is a full scan on every changelist page.
+  When the queryset has no filters and the planner statistics say the table is
+  bigger than `estimate_threshold`, that estimate is used instead.
+  """
+  estimate_threshold = 10000
+
+  @cached_property
+  def count(self):
+    queryset = self.object_list
+    if hasattr(queryset, 'query') and not queryset.query.where:
+      estimate = self._estimated_count(queryset)
+      if estimate is not None and estimate >= self.estimate_threshold:
+        return estimate
+    return super().count
+
+  def _estimated_count(self, queryset):
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'postgresql':
+      sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = %s"
+    elif connection.vendor == 'sqlite':
+      # Populated by ANALYZE; the first number of `stat` is the table's row count.
+      sql = "SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 WHERE tbl = %s LIMIT 1"
+    else:
+      return None
+    try:
+      with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    except DatabaseError:
+      return None
+    if not row or row[0] is None or row[0] < 0:
+      return None
+    return int(row[0])
+
+
+def _is_autocomplete_request(request):
+  return request.resolver_match is not None and request.resolver_match.url_name == 'autocomplete'
+
+
 class UserProfileInline(admin.StackedInline):
   model = UserProfile
   can_delete = False
@@ -14,6 +72,24 @@ class CustomUserAdmin(BaseUserAdmin):
   inlines = (UserProfileInline,)
   list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'get_interested_categories')
   list_select_related = ('profile',)
+  paginator = EstimatedCountPaginator
+  show_full_result_count = False
+  # Prefix matches can use the username index; used for TimeSlot.booked_by autocomplete.
+  autocomplete_search_fields = ('^username',)
+
+  def get_queryset(self, request):
+    queryset = super().get_queryset(request)
+    if _is_autocomplete_request(request):
+      # Autocomplete only renders the pk and str(user).
+      return queryset.only('id', 'username')
+    return queryset.prefetch_related(
+      Prefetch('profile__interested_categories', queryset=Category.objects.only('id', 'name'))
+    )
+
+  def get_search_fields(self, request):
+    if _is_autocomplete_request(request):
+      return self.autocomplete_search_fields
+    return super().get_search_fields(request)
 
   def get_interested_categories(self, instance):
       try:
@@ -33,13 +109,204 @@ class CategoryAdmin(admin.ModelAdmin):
   list_display = ('name',)
   search_fields = ('name',)
 
+class BookedByListFilter(admin.RelatedFieldListFilter):
+  """
+  TimeSlot.booked_by filter that picks the user with the admin autocomplete
+  widget instead of listing every user in the sidebar; only the selected user
+  is loaded. "Not booked" and "Booked" filter on booked_by being empty.
+  Requires booked_by in the ModelAdmin's autocomplete_fields.
+  """
+  template = 'admin/api/autocomplete_filter.html'
+
+  def __init__(self, field, request, params, model, model_admin, field_path):
+    self.admin_site = model_admin.admin_site
+    # Submitting the cleared picker means "any user", not an invalid id.
+    lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+    if params.get(lookup_kwarg) in ([''], ''):
+      del params[lookup_kwarg]
+    super().__init__(field, request, params, model, model_admin, field_path)
+
+  def field_choices(self, field, request, model_admin):
+    if not self.lookup_val:
+      return []
+    try:
+      return [(user.pk, str(user)) for user in User.objects.filter(pk__in=self.lookup_val)]
+    except (ValueError, ValidationError):
+      return []  # the changelist reports the bad parameter itself
+
+  def has_output(self):
+    return True
+
+  def choices(self, changelist):
+    yield {
+      'selected': not self.lookup_val and self.lookup_val_isnull is None,
+      'query_string': changelist.get_query_string(remove=[self.lookup_kwarg, self.lookup_kwarg_isnull]),
+      'display': 'All',
+    }
+    for pk, username in self.lookup_choices:
+      yield {
+        'selected': True,
+        'query_string': changelist.get_query_string({self.lookup_kwarg: pk}, [self.lookup_kwarg_isnull]),
+        'display': username,
+      }
+    for value, display in (('True', 'Not booked'), ('False', 'Booked')):
+      yield {
+        'selected': self.lookup_val_isnull == value,
+        'query_string': changelist.get_query_string({self.lookup_kwarg_isnull: value}, [self.lookup_kwarg]),
+        'display': display,
+      }
+    # The user picker submits the other active filters along with its own value.
+    self.hidden_params = [
+      (name, value) for name, value in changelist.params.items()
+      if name not in (self.lookup_kwarg, self.lookup_kwarg_isnull)
+    ]
+
+  def widget(self):
+    chooser = forms.ModelChoiceField(
+      queryset=User.objects.all(), required=False, widget=AutocompleteSelect(self.field, self.admin_site),
+    )
+    return chooser.widget.render(self.lookup_kwarg, self.lookup_val[-1] if self.lookup_val else None)
+
+
+class TimeSlotActionForm(ActionForm):
+  """ Extra inputs for the bulk TimeSlot actions, shown next to the action dropdown. """
+  offset_minutes = forms.IntegerField(required=False, label='Shift by (minutes)')
+  weeks = forms.IntegerField(required=False, min_value=1, label='Clone for (weeks)')
+  target_category = forms.ModelChoiceField(queryset=Category.objects.all(), required=False, label='New category')
+
+
 @admin.register(TimeSlot)
 class TimeSlotAdmin(admin.ModelAdmin):
   list_display = ('category', 'start_time', 'end_time', 'booked_by', 'is_booked')
-  list_filter = ('category', 'start_time', 'booked_by')
+  list_select_related = ('category', 'booked_by')
+  # booked_by is picked by username autocomplete; listing every user would not scale.
+  list_filter = ('category', 'start_time', ('booked_by', BookedByListFilter))
   search_fields = ('category__name', 'booked_by__username')
   autocomplete_fields = ['category', 'booked_by']
+  date_hierarchy = 'start_time'
+  paginator = EstimatedCountPaginator
+  show_full_result_count = False
+  action_form = TimeSlotActionForm
+  actions = ['release_bookings', 'shift_slots', 'clone_to_weeks', 'reassign_category']
+
+  @property
+  def media(self):
+    # The booked_by filter in the changelist sidebar uses the autocomplete widget.
+    return super().media + AutocompleteSelect(TimeSlot._meta.get_field('booked_by'), self.admin_site).media
+
+  def _action_value(self, request, name):
+    form = self.action_form(request.POST)
+    form.fields['action'].choices = self.get_action_choices(request)
+    if form.is_valid():
+      return form.cleaned_data.get(name)
+    return None
+
+  @admin.action(description='Release bookings on selected time slots', permissions=['change'])
+  def release_bookings(self, request, queryset):
+    count = bulk.release_bookings(queryset)
+    self.message_user(request, f"Released {count} booking(s).", messages.SUCCESS)
+
+  @admin.action(description='Shift selected time slots by offset', permissions=['change'])
+  def shift_slots(self, request, queryset):
+    minutes = self._action_value(request, 'offset_minutes')
+    if not minutes:
+      self.message_user(request, "Enter a non-zero 'Shift by (minutes)' value.", messages.ERROR)
+      return
+    count = bulk.shift_slots(queryset, timedelta(minutes=minutes))
+    self.message_user(request, f"Shifted {count} time slot(s) by {minutes} minute(s).", messages.SUCCESS)
+
+  @admin.action(description='Clone selected time slots to following weeks', permissions=['add'])
+  def clone_to_weeks(self, request, queryset):
+    weeks = self._action_value(request, 'weeks')
+    if not weeks:
+      self.message_user(request, "Enter a 'Clone for (weeks)' value of at least 1.", messages.ERROR)
+      return
+    count = bulk.clone_to_weeks(queryset, weeks)
+    self.message_user(request, f"Created {count} time slot(s) over {weeks} week(s).", messages.SUCCESS)
+
+  @admin.action(description='Reassign selected time slots to category', permissions=['change'])
+  def reassign_category(self, request, queryset):
+    category = self._action_value(request, 'target_category')
+    if category is None:
+      self.message_user(request, "Choose a 'New category'.", messages.ERROR)
+      return
+    count = bulk.reassign_category(queryset, category)
+    self.message_user(request, f"Moved {count} time slot(s) to {category}.", messages.SUCCESS)
+
+  @admin.display(boolean=True, description='Is booked', ordering='booked_by')
+  def is_booked(self, obj):
+    # Reads the FK column directly, no need to load the user.
+    return obj.booked_by_id is not None
+
+
+@admin.register(BookingEvent)
+class BookingEventAdmin(admin.ModelAdmin):
+  """ Read-only view of the append-only booking log. """
+  # Raw ids: the referenced slot or user may have been deleted since.
+  list_display = ('created_at', 'action', 'outcome', 'slot_id', 'user_id')
+  list_filter = ('action', 'outcome')
+  date_hierarchy = 'created_at'
+  paginator = EstimatedCountPaginator
+  show_full_result_count = False
+
+  def has_add_permission(self, request):
+    return False
+
+  def has_change_permission(self, request, obj=None):
+    return False
+
+  def has_delete_permission(self, request, obj=None):
+    return False
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+  list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_after', 'created_at', 'finished_at')
+  list_filter = ('status', 'name')
+  search_fields = ('name',)
+  readonly_fields = ('claim_token', 'claimed_at', 'created_at', 'finished_at', 'last_error')
+  paginator = EstimatedCountPaginator
+  show_full_result_count = False
+  actions = ['requeue']
+
+  @admin.action(description='Queue selected tasks to run again now', permissions=['change'])
+  def requeue(self, request, queryset):
+    count = queryset.exclude(status=Task.RUNNING).update(
+      status=Task.QUEUED, run_after=timezone.now(), attempts=0, claim_token='', finished_at=None
+    )
+    self.message_user(request, f"Queued {count} task(s).", messages.SUCCESS)
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+  """ The slow-query log of all processes, worst total time first, full scans highlighted. """
+  def has_add_permission(self, request):
+    return False
+
+  def has_change_permission(self, request, obj=None):
+    return False
+
+  def has_delete_permission(self, request, obj=None):
+    return False
+
+  def changelist_view(self, request, extra_context=None):
+    if not self.has_view_permission(request):
+      raise PermissionDenied
+    entries = slowqueries.collect()
+    only_full_scans = request.GET.get('full_scan') == '1'
+    if only_full_scans:
+      entries = [entry for entry in entries if entry['full_scan']]
+    context = {
+      **self.admin_site.each_context(request),
+      'opts': self.model._meta,
+      'title': 'Slow queries',
+      'entries': entries,
+      'only_full_scans': only_full_scans,
+      'threshold_ms': getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100),
+      **(extra_context or {}),
+    }
+    return TemplateResponse(request, 'admin/api/slowquery/change_list.html', context)
 
 # Re-register UserAdmin
 admin.site.unregister(User)
-admin.site.register(User, CustomUserAdmin)
\ No newline at end of file
+admin.site.register(User, CustomUserAdmin)
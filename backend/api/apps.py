@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
   default_auto_field = 'django.db.models.BigAutoField'
   name = 'api'
+
+  def ready(self):
+    # Connects the Category cache invalidation and slow-query log receivers.
+    from . import cache, slowqueries  # noqa: F401
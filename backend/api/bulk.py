@@ -0,0 +1,120 @@
+"""
+Set-based bulk operations on TimeSlot querysets.
+
+Each operation runs as a fixed number of set-based UPDATE or INSERT ... SELECT
+statements (one, or two for releases, which also log BookingEvents), so the
+cost does not depend on how many slots are selected. Per-row signals are not
+sent; instead `timeslots_bulk_changed` fires once with the affected count.
+"""
+from datetime import timedelta
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, transaction
+from django.db.models import DateTimeField, Exists, ExpressionWrapper, F, OuterRef, Value
+from django.utils import timezone
+from .models import BookingEvent, TimeSlot
+from .signals import timeslots_bulk_changed
+
+
+def _finish(action, count):
+  if count:
+    timeslots_bulk_changed.send(sender=TimeSlot, action=action, count=count)
+  return count
+
+
+def release_bookings(queryset):
+  """
+  Clear `booked_by` on every booked slot in the queryset.
+
+  Each release is logged as a RELEASE BookingEvent for the user who held the
+  slot (one INSERT ... SELECT before the UPDATE), so the audit log tells staff
+  releases apart from users unbooking and utilization reports count both.
+  """
+  booked = queryset.filter(booked_by__isnull=False)
+  events = booked.order_by().values(
+    event_slot=F('id'),
+    event_user=F('booked_by_id'),
+    event_action=Value(BookingEvent.RELEASE),
+    event_outcome=Value(BookingEvent.OK),
+    event_created_at=Value(timezone.now(), output_field=DateTimeField()),
+  )
+  try:
+    select, params = events.query.sql_with_params()
+  except EmptyResultSet:  # e.g. queryset.none()
+    return 0
+  connection = connections[queryset.db]
+  qn = connection.ops.quote_name
+  opts = BookingEvent._meta
+  columns = ', '.join(qn(opts.get_field(name).column) for name in ('slot', 'user', 'action', 'outcome', 'created_at'))
+  sql = f"INSERT INTO {qn(opts.db_table)} ({columns}) {select}"
+
+  with transaction.atomic(using=queryset.db):
+    with connection.cursor() as cursor:
+      cursor.execute(sql, params)
+    count = booked.update(booked_by=None)
+  return _finish('release', count)
+
+
+def shift_slots(queryset, offset):
+  """ Move start and end of every slot in the queryset by `offset` (a timedelta). """
+  if not offset:
+    return 0
+  count = queryset.update(start_time=F('start_time') + offset, end_time=F('end_time') + offset)
+  return _finish('shift', count)
+
+
+def reassign_category(queryset, category):
+  """ Move every slot in the queryset to `category`. """
+  count = queryset.exclude(category=category).update(category=category)
+  return _finish('reassign', count)
+
+
+def _shifted(expression, offset):
+  return ExpressionWrapper(expression + offset, output_field=DateTimeField())
+
+
+def clone_to_weeks(queryset, weeks):
+  """
+  Copy the selected slots 1..`weeks` weeks into the future as unbooked slots.
+
+  Runs one INSERT ... SELECT over a UNION ALL of the shifted selections. Slots
+  that already exist at the target time in the same category are skipped, so
+  re-running a clone is harmless.
+  """
+  if weeks < 1:
+    return 0
+
+  selects, params = [], []
+  for week in range(1, weeks + 1):
+    offset = timedelta(weeks=week)
+    already_cloned = TimeSlot.objects.filter(
+      category_id=OuterRef('category_id'),
+      start_time=_shifted(OuterRef('start_time'), offset),
+    )
+    clones = (
+      queryset.order_by()
+      .filter(~Exists(already_cloned))
+      .values(
+        clone_category=F('category_id'),
+        clone_start=_shifted(F('start_time'), offset),
+        clone_end=_shifted(F('end_time'), offset),
+      )
+    )
+    sql, select_params = clones.query.sql_with_params()
+    selects.append(sql)
+    params.extend(select_params)
+
+  connection = connections[queryset.db]
+  qn = connection.ops.quote_name
+  opts = TimeSlot._meta
+  columns = ', '.join(qn(opts.get_field(name).column) for name in ('category', 'start_time', 'end_time'))
+  # DISTINCT collapses identical targets produced by different source slots.
+  sql = (
+    f"INSERT INTO {qn(opts.db_table)} ({columns}) "
+    f"SELECT DISTINCT clone_category, clone_start, clone_end FROM ({' UNION ALL '.join(selects)}) clones"
+  )
+
+  with transaction.atomic(using=queryset.db):
+    with connection.cursor() as cursor:
+      cursor.execute(sql, params)
+      count = cursor.rowcount
+  return _finish('clone', count)
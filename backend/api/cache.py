@@ -0,0 +1,126 @@
+"""
+Process-local cache of Category rows.
+
+Categories are few and change rarely but are read on nearly every request, so
+each process keeps them in memory. Freshness is tracked with a version token
+stored in Django's cache: saving or deleting a Category replaces it with a new
+random token (see the receivers below), and any process holding another token
+reloads on its next read. With a shared cache backend this keeps every worker
+consistent. With the default local-memory backend other processes never see
+the new token, so each copy is also reloaded once it is CATEGORY_CACHE_TTL
+seconds old, and a lookup of an id the copy doesn't have reloads it once (a
+category created elsewhere); ids still missing after that reload are not
+retried until the next one. Code reading many rows (CachedCategoryField) takes
+one `snapshot()` so the version is checked once, not per row.
+
+Queryset.update()/bulk_create() on Category skip the signals; call
+`category_cache.invalidate()` after using them.
+"""
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Category
+
+VERSION_KEY = 'api:category-cache-version'
+
+
+def _new_version():
+  return uuid.uuid4().hex
+
+
+class CategoryCache:
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._version = None
+    self._loaded_at = 0.0
+    self._by_id = {}
+    self._ordered = []
+    self._missing = set()  # ids looked up since the last load that don't exist
+
+  def _current_version(self):
+    version = cache.get(VERSION_KEY)
+    if version is None:
+      # Never set or evicted: start a new version so every process reloads.
+      cache.add(VERSION_KEY, _new_version(), timeout=None)
+      version = cache.get(VERSION_KEY)
+    return version
+
+  def _expired(self):
+    return time.monotonic() - self._loaded_at >= getattr(settings, 'CATEGORY_CACHE_TTL', 60)
+
+  def _ensure_fresh(self):
+    version = self._current_version()
+    if version == self._version and not self._expired():
+      return
+    with self._lock:
+      if version == self._version and not self._expired():
+        return
+      self._load(version)
+
+  def _load(self, version):
+    # Called with the lock held.
+    ordered = list(Category.objects.order_by('pk'))
+    self._by_id = {category.pk: category for category in ordered}
+    self._ordered = ordered
+    self._missing = set()
+    self._version = version
+    self._loaded_at = time.monotonic()
+
+  def _reload_for(self, pks):
+    """ Reload once for ids this copy doesn't know yet; returns nothing. """
+    with self._lock:
+      unknown = {pk for pk in pks if pk not in self._by_id and pk not in self._missing}
+      if not unknown:
+        return
+      self._load(self._current_version())
+      self._missing = {pk for pk in unknown if pk not in self._by_id}
+
+  def invalidate(self):
+    """ Mark every process's copy stale. """
+    cache.set(VERSION_KEY, _new_version(), timeout=None)
+    self._version = None
+
+  def all(self):
+    """ All categories, ordered by id. """
+    self._ensure_fresh()
+    return list(self._ordered)
+
+  def snapshot(self):
+    """
+    {pk: category} as of one freshness check, for reading many rows at once.
+
+    Don't mutate it; look ids it lacks up with `get()`, which handles reloads.
+    """
+    self._ensure_fresh()
+    return self._by_id
+
+  def get(self, pk):
+    """ The category with this primary key, or None. """
+    self._ensure_fresh()
+    if pk not in self._by_id and pk not in self._missing:
+      self._reload_for([pk])
+    return self._by_id.get(pk)
+
+  def get_many(self, pks):
+    """ {pk: category} for the given primary keys that exist. """
+    self._ensure_fresh()
+    if any(pk not in self._by_id and pk not in self._missing for pk in pks):
+      self._reload_for(pks)
+    return {pk: self._by_id[pk] for pk in pks if pk in self._by_id}
+
+
+category_cache = CategoryCache()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, **kwargs):
+  category_cache.invalidate()
+  # Again once the change is visible to other connections, so a reload that
+  # raced with the open transaction does not keep the old rows.
+  transaction.on_commit(category_cache.invalidate)
@@ -0,0 +1,158 @@
+"""
+Content codecs used for HTTP response compression.
+
+gzip is always available. Brotli (`br`) and Zstandard (`zstd`) are used when
+the optional `brotli` and `zstandard` packages are installed. Every codec
+exposes one-shot `compress()` and an incremental `compressor()` for streaming
+responses, which flushes every STREAM_FLUSH_SIZE bytes of input rather than
+per chunk.
+"""
+import zlib
+
+try:
+  import brotli
+except ImportError:  # optional dependency
+  brotli = None
+
+try:
+  import zstandard
+except ImportError:  # optional dependency
+  zstandard = None
+
+
+# Uncompressed bytes a streaming compressor takes in before it flushes. Flushing
+# every chunk would send a block (and lose the compression context's benefit)
+# per chunk: for a CSV streamed row by row that is several times the size of
+# the one-shot output.
+STREAM_FLUSH_SIZE = 16 * 1024
+
+
+class _StreamCompressor:
+  """ Buffers input and flushes it to the client every STREAM_FLUSH_SIZE bytes. """
+  flush_size = STREAM_FLUSH_SIZE
+
+  def __init__(self):
+    self._pending = 0
+
+  def compress(self, data):
+    output = self.process(data)
+    self._pending += len(data)
+    if self._pending >= self.flush_size:
+      self._pending = 0
+      output += self.flush()
+    return output
+
+
+class _GzipCompressor(_StreamCompressor):
+  def __init__(self, level):
+    super().__init__()
+    self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+  def process(self, data):
+    return self._obj.compress(data)
+
+  def flush(self):
+    return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+  def finish(self):
+    return self._obj.flush(zlib.Z_FINISH)
+
+
+class _BrotliCompressor(_StreamCompressor):
+  def __init__(self, level):
+    super().__init__()
+    self._obj = brotli.Compressor(quality=level)
+
+  def process(self, data):
+    return self._obj.process(data)
+
+  def flush(self):
+    return self._obj.flush()
+
+  def finish(self):
+    return self._obj.finish()
+
+
+class _ZstdCompressor(_StreamCompressor):
+  def __init__(self, level):
+    super().__init__()
+    self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+  def process(self, data):
+    return self._obj.compress(data)
+
+  def flush(self):
+    return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+  def finish(self):
+    return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+class Codec:
+  def __init__(self, name, default_level, compressor_class, available):
+    self.name = name
+    self.default_level = default_level
+    self.compressor_class = compressor_class
+    self.available = available
+
+  def compressor(self, level=None):
+    return self.compressor_class(self.default_level if level is None else level)
+
+  def compress(self, data, level=None):
+    compressor = self.compressor(level)
+    return compressor.process(data) + compressor.finish()
+
+  def __repr__(self):
+    return f"<Codec {self.name}>"
+
+
+# Preference order when the client accepts several encodings equally.
+CODECS = {
+  'zstd': Codec('zstd', 3, _ZstdCompressor, zstandard is not None),
+  'br': Codec('br', 4, _BrotliCompressor, brotli is not None),
+  'gzip': Codec('gzip', 6, _GzipCompressor, True),
+}
+
+
+def available_codecs():
+  return [codec for codec in CODECS.values() if codec.available]
+
+
+def parse_accept_encoding(header):
+  """ {'gzip': 1.0, 'br': 0.5, ...} from an Accept-Encoding header value. """
+  accepted = {}
+  for part in header.split(','):
+    name, _, params = part.strip().partition(';')
+    name = name.strip().lower()
+    if not name:
+      continue
+    quality = 1.0
+    params = params.strip()
+    if params.startswith('q='):
+      try:
+        quality = float(params[2:])
+      except ValueError:
+        quality = 0.0
+    accepted[name] = quality
+  return accepted
+
+
+def negotiate(header, allowed=None):
+  """
+  Pick the codec for an Accept-Encoding header, or None for identity.
+
+  The highest client q-value wins; ties go to the order of CODECS. `allowed`
+  optionally restricts the candidate codec names.
+  """
+  if not header:
+    return None
+  accepted = parse_accept_encoding(header)
+  wildcard = accepted.get('*', 0.0)
+  best, best_quality = None, 0.0
+  for codec in available_codecs():
+    if allowed is not None and codec.name not in allowed:
+      continue
+    quality = accepted.get(codec.name, wildcard)
+    if quality > best_quality:
+      best, best_quality = codec, quality
+  return best
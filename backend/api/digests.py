@@ -0,0 +1,117 @@
+"""
+"New slots in your categories" digest emails.
+
+New slots are found by id watermark, joined against the profile/category M2M
+in one query ordered by user, and grouped into one email per user. Emails go
+out in batches over a single mail connection; the watermark records progress
+after every batch so an interrupted run resumes where it stopped.
+"""
+from itertools import groupby
+from operator import itemgetter
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from .models import DigestWatermark, TimeSlot
+from .tasks import task
+
+WATERMARK_NAME = 'new_slots'
+
+_USER = 'category__userprofile__user'
+
+
+def pending_rows(low_id, high_id, after_user_id=0):
+  """
+  One row per (interested user, new slot) in the id window (low_id, high_id],
+  ordered by user then start time. Only future, unbooked slots are included.
+  """
+  return (
+    TimeSlot.objects
+    .filter(
+      id__gt=low_id,
+      id__lte=high_id,
+      booked_by__isnull=True,
+      start_time__gte=timezone.now(),
+      **{f'{_USER}__id__gt': after_user_id, f'{_USER}__is_active': True, f'{_USER}__email__gt': ''},
+    )
+    .values(
+      'id', 'start_time', 'end_time',
+      category_name=F('category__name'),
+      user_id=F(f'{_USER}__id'),
+      email=F(f'{_USER}__email'),
+      username=F(f'{_USER}__username'),
+    )
+    .order_by('user_id', 'start_time', 'id')
+  )
+
+
+def build_message(username, email, slots):
+  lines = [f"Hi {username},", "", "New time slots were added in categories you follow:", ""]
+  for slot in slots:
+    start = timezone.localtime(slot['start_time']).strftime('%a %Y-%m-%d %H:%M')
+    end = timezone.localtime(slot['end_time']).strftime('%H:%M')
+    lines.append(f"  - {slot['category_name']}: {start} - {end}")
+  subject = f"{len(slots)} new time slot(s) in your categories"
+  return EmailMessage(subject, "\n".join(lines), settings.DEFAULT_FROM_EMAIL, [email])
+
+
+def _start_run():
+  """ Lock in the id window for this run, or pick up an interrupted one. """
+  with transaction.atomic():
+    watermark, created = DigestWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+    if watermark.pending_slot_id is None:
+      high_id = TimeSlot.objects.aggregate(high=Max('id'))['high'] or 0
+      if created:
+        # First run: start from now instead of mailing the whole history.
+        watermark.last_slot_id = high_id
+      else:
+        watermark.pending_slot_id = high_id
+        watermark.last_user_id = 0
+      watermark.save()
+  return watermark
+
+
+def send_new_slot_digests(batch_size=100, connection=None):
+  """
+  Send pending digests and advance the watermark.
+
+  Returns a dict with `users` (emails sent), `slots` (slot rows included),
+  and `resumed` (whether an interrupted run was continued).
+  """
+  watermark = _start_run()
+  stats = {'users': 0, 'slots': 0, 'resumed': watermark.last_user_id > 0}
+  if watermark.pending_slot_id is None:
+    return stats
+
+  rows = pending_rows(watermark.last_slot_id, watermark.pending_slot_id, watermark.last_user_id)
+  connection = connection or get_connection()
+  batch, batch_last_user = [], None
+
+  def flush():
+    connection.send_messages(batch)
+    DigestWatermark.objects.filter(pk=watermark.pk).update(last_user_id=batch_last_user, updated_at=timezone.now())
+    batch.clear()
+
+  with connection:
+    for user_id, user_rows in groupby(rows.iterator(chunk_size=2000), key=itemgetter('user_id')):
+      slots = list(user_rows)
+      batch.append(build_message(slots[0]['username'], slots[0]['email'], slots))
+      batch_last_user = user_id
+      stats['users'] += 1
+      stats['slots'] += len(slots)
+      if len(batch) >= batch_size:
+        flush()
+    if batch:
+      flush()
+
+  DigestWatermark.objects.filter(pk=watermark.pk).update(
+    last_slot_id=watermark.pending_slot_id, pending_slot_id=None, last_user_id=0, updated_at=timezone.now()
+  )
+  return stats
+
+
+@task
+def send_new_slot_digests_task(batch_size=100):
+  """ Queued variant for `send_slot_digests --enqueue`; a retry resumes from the watermark. """
+  send_new_slot_digests(batch_size=batch_size)
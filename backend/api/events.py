@@ -0,0 +1,165 @@
+"""
+Buffered writer for the BookingEvent audit log.
+
+`record()` only appends to an in-process list, so logging a booking attempt
+costs the request no database round trip. A background thread inserts the
+buffer with one `bulk_create` once it holds BOOKING_EVENT_BUFFER_SIZE events
+or BOOKING_EVENT_FLUSH_INTERVAL seconds after the oldest one was recorded,
+whichever comes first; whatever is left is flushed when the process exits.
+
+Events still in memory are lost if the process is killed without running its
+exit handlers (SIGKILL, OOM). With BOOKING_EVENT_FLUSH_INTERVAL = None there is
+no background thread: the buffer is flushed by whichever `record()` call fills
+it, by `flush()`, or at exit.
+
+A write that fails with OperationalError (typically SQLite's "database is
+locked" while requests are writing) puts the rows back at the front of the
+buffer and is retried up to BOOKING_EVENT_FLUSH_RETRIES times, waiting
+BOOKING_EVENT_RETRY_DELAY seconds and twice as long after each further
+failure. Only then, or on any other error, is the batch logged and dropped.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.utils import timezone
+from .models import BookingEvent
+
+logger = logging.getLogger(__name__)
+
+
+class EventBuffer:
+  def __init__(self, model):
+    self.model = model
+    self._events = []
+    self._oldest = None
+    self._condition = threading.Condition()
+    self._thread = None
+    self._pid = None
+    self._failures = 0  # consecutive failed writes of the batch at the front
+    self._retry_at = None
+
+  @property
+  def size(self):
+    return getattr(settings, 'BOOKING_EVENT_BUFFER_SIZE', 100)
+
+  @property
+  def interval(self):
+    return getattr(settings, 'BOOKING_EVENT_FLUSH_INTERVAL', 2.0)
+
+  @property
+  def retries(self):
+    return getattr(settings, 'BOOKING_EVENT_FLUSH_RETRIES', 3)
+
+  @property
+  def retry_delay(self):
+    return getattr(settings, 'BOOKING_EVENT_RETRY_DELAY', 0.5)
+
+  def record(self, **fields):
+    """ Queue one row; `created_at` defaults to now. """
+    fields.setdefault('created_at', timezone.now())
+    event = self.model(**fields)
+    interval = self.interval
+    with self._condition:
+      first = not self._events
+      if first:
+        self._oldest = time.monotonic()
+      self._events.append(event)
+      full = len(self._events) >= self.size and self._retry_at is None
+      if interval is not None:
+        self._ensure_thread()
+        if first or full:
+          # Wake the flusher to start the interval timer or write a full buffer.
+          self._condition.notify()
+        return
+    if full:
+      self.flush()
+
+  def pending(self):
+    with self._condition:
+      return len(self._events)
+
+  def discard(self):
+    """ Drop buffered rows without writing them; returns how many. """
+    with self._condition:
+      events, self._events, self._oldest = self._events, [], None
+      self._failures, self._retry_at = 0, None
+    return len(events)
+
+  def flush(self):
+    """ Insert everything buffered so far; returns how many rows were written. """
+    with self._condition:
+      events, self._events, self._oldest = self._events, [], None
+    if not events:
+      return 0
+    try:
+      self.model.objects.bulk_create(events, batch_size=self.size)
+    except OperationalError:
+      with self._condition:
+        self._failures += 1
+        if self._failures <= self.retries:
+          delay = self.retry_delay * 2 ** (self._failures - 1)
+          self._retry_at = time.monotonic() + delay
+          self._events[:0] = events
+          self._oldest = time.monotonic()
+          logger.warning('Could not write %d %s rows; retrying in %gs.', len(events), self.model.__name__, delay, exc_info=True)
+          return 0
+        self._failures, self._retry_at = 0, None
+      logger.exception('Dropped %d %s rows that could not be written.', len(events), self.model.__name__)
+      return 0
+    except Exception:
+      with self._condition:
+        self._failures, self._retry_at = 0, None
+      logger.exception('Dropped %d %s rows that could not be written.', len(events), self.model.__name__)
+      return 0
+    with self._condition:
+      self._failures, self._retry_at = 0, None
+    return len(events)
+
+  def drain(self):
+    """ Flush, waiting out retries, until the buffer is empty or a batch is dropped; used at exit. """
+    written = self.flush()
+    while self._retry_at is not None:
+      time.sleep(max(0, self._retry_at - time.monotonic()))
+      written += self.flush()
+    return written
+
+  def _ensure_thread(self):
+    # A forked worker inherits the buffer but not the thread; start its own.
+    if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+      return
+    self._pid = os.getpid()
+    self._thread = threading.Thread(target=self._run, name=f'{self.model.__name__}-flusher', daemon=True)
+    self._thread.start()
+
+  def _due_in(self):
+    interval = self.interval
+    if not self._events or interval is None:
+      return None
+    if self._retry_at is not None:
+      return max(0, self._retry_at - time.monotonic())
+    if len(self._events) >= self.size:
+      return 0
+    return max(0, self._oldest + interval - time.monotonic())
+
+  def _run(self):
+    while True:
+      with self._condition:
+        due_in = self._due_in()
+        while due_in != 0:
+          self._condition.wait(timeout=due_in)
+          due_in = self._due_in()
+      self.flush()
+      # This thread's connection would otherwise stay open for the process lifetime.
+      connections.close_all()
+
+
+booking_events = EventBuffer(BookingEvent)
+atexit.register(booking_events.drain)
+
+
+def record_booking_event(request, slot_id, action, outcome):
+  booking_events.record(slot_id=slot_id, user_id=request.user.pk, action=action, outcome=outcome)
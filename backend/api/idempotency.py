@@ -0,0 +1,151 @@
+"""
+Idempotency-Key support for unsafe API actions.
+
+A client that may retry a POST sends a unique `Idempotency-Key` header. The
+first request with a given (user, key) runs normally and its response is
+stored; retries within IDEMPOTENCY_KEY_TTL get that stored response back
+(with an `Idempotent-Replayed: true` header) without running the view, so the
+retried booking is neither re-checked nor re-serialized. Responses with a 5xx
+status are not stored, so those requests can be retried for real.
+
+While the first request runs, its key is claimed: a concurrent retry gets 409.
+The claim is a lease of IDEMPOTENCY_CLAIM_TIMEOUT, so if the worker dies
+mid-request a later retry takes the key over and runs the view instead of
+getting 409 until the key expires. Replays are exempt from the booking
+throttles: once a throttle rejects a request, `might_replay()` checks a marker
+set in Django's cache when the response was stored, and only then is the
+record read (`is_replay()`). A client retrying a completed request gets its
+stored response rather than 429, while a rejected request with a fresh key
+still costs no database query. With the default per-process cache the marker
+is only seen by the worker that stored the response; elsewhere the retry is
+throttled like any other request.
+"""
+import hashlib
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def _ttl():
+  return getattr(settings, 'IDEMPOTENCY_KEY_TTL', timedelta(hours=24))
+
+
+def _claim_timeout():
+  return getattr(settings, 'IDEMPOTENCY_CLAIM_TIMEOUT', timedelta(minutes=1))
+
+
+def _marker_key(user_pk, key):
+  # Client keys may be long or contain characters some cache backends reject.
+  return f'api:idempotency-replay:{user_pk}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def _lookup(request):
+  """ The stored record for the request's key (or None), read once per request. """
+  if not hasattr(request, '_idempotency_record'):
+    key = request.headers.get(HEADER)
+    record = None
+    if key and len(key) <= MAX_KEY_LENGTH and request.user.is_authenticated:
+      record = IdempotencyRecord.objects.filter(user=request.user, key=key).first()
+    request._idempotency_record = record
+  return request._idempotency_record
+
+
+def might_replay(request):
+  """ Whether a stored response was recently marked for the request's key; reads the cache, not the database. """
+  key = request.headers.get(HEADER)
+  if not key or len(key) > MAX_KEY_LENGTH or not request.user.is_authenticated:
+    return False
+  return cache.get(_marker_key(request.user.pk, key)) is not None
+
+
+def is_replay(request):
+  """ Whether the request will be answered from a stored response without running the view. """
+  record = _lookup(request)
+  return record is not None and record.status_code is not None and record.expires_at > timezone.now()
+
+
+def _replay(record, fingerprint):
+  if record.fingerprint != fingerprint:
+    return Response(
+      {'detail': f'{HEADER} was already used for a different request.'},
+      status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+    )
+  if record.status_code is None:
+    return Response(
+      {'detail': 'A request with this Idempotency-Key is still being processed.'},
+      status=status.HTTP_409_CONFLICT,
+    )
+  response = Response(record.response_body, status=record.status_code)
+  response['Idempotent-Replayed'] = 'true'
+  return response
+
+
+def idempotent(view_method):
+  """ Decorate a viewset action to honour the Idempotency-Key header. """
+  @wraps(view_method)
+  def wrapper(self, request, *args, **kwargs):
+    key = request.headers.get(HEADER)
+    if not key or not request.user.is_authenticated:
+      return view_method(self, request, *args, **kwargs)
+    if len(key) > MAX_KEY_LENGTH:
+      return Response(
+        {'detail': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters.'},
+        status=status.HTTP_400_BAD_REQUEST,
+      )
+
+    now = timezone.now()
+    fingerprint = f'{request.method} {request.path}'[:255]
+    record = _lookup(request)
+    if record is not None and record.expires_at > now:
+      stale_claim = record.status_code is None and record.claimed_at <= now - _claim_timeout()
+      if not stale_claim or record.fingerprint != fingerprint:
+        return _replay(record, fingerprint)
+      # The request holding the claim died or hung: take the key over, unless another retry just did.
+      taken = IdempotencyRecord.objects.filter(
+        pk=record.pk, status_code__isnull=True, claimed_at=record.claimed_at
+      ).update(claimed_at=now, expires_at=now + _ttl())
+      if not taken:
+        return _replay(IdempotencyRecord.objects.get(pk=record.pk), fingerprint)
+      record.claimed_at = now
+    else:
+      # Claim the key before running the view so a concurrent retry gets 409, not a second booking.
+      try:
+        with transaction.atomic():
+          if record is not None:
+            record.delete()  # expired
+          record = IdempotencyRecord.objects.create(
+            user=request.user, key=key, fingerprint=fingerprint, claimed_at=now, expires_at=now + _ttl()
+          )
+      except IntegrityError:
+        return _replay(IdempotencyRecord.objects.get(user=request.user, key=key), fingerprint)
+
+    # Only touch the record while the claim is still ours (not taken over after a timeout).
+    claim = IdempotencyRecord.objects.filter(pk=record.pk, claimed_at=record.claimed_at)
+    try:
+      response = view_method(self, request, *args, **kwargs)
+    except Exception:
+      claim.delete()
+      raise
+    if response.status_code >= 500:
+      claim.delete()
+    elif claim.update(status_code=response.status_code, response_body=response.data):
+      timeout = (record.expires_at - timezone.now()).total_seconds()
+      if timeout > 0:
+        cache.set(_marker_key(request.user.pk, key), True, timeout)
+    return response
+  return wrapper
+
+
+def purge_expired(now=None):
+  """ Delete expired records; returns how many were removed. """
+  deleted, _ = IdempotencyRecord.objects.filter(expires_at__lte=now or timezone.now()).delete()
+  return deleted
@@ -0,0 +1,35 @@
+from datetime import datetime, time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.models import TimeSlot
+
+
+class TimeSlotSelectionCommand(BaseCommand):
+  """ Base for bulk TimeSlot commands: shared --ids/--category/--from/--to selection. """
+
+  def add_arguments(self, parser):
+    parser.add_argument('--ids', nargs='+', type=int, help='Explicit TimeSlot ids.')
+    parser.add_argument('--category', type=int, help='Only slots in this category id.')
+    parser.add_argument('--from', dest='date_from', help='Only slots starting on or after this date (YYYY-MM-DD).')
+    parser.add_argument('--to', dest='date_to', help='Only slots starting before this date (YYYY-MM-DD).')
+
+  def _parse_date(self, value, option):
+    try:
+      day = datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+      raise CommandError(f"{option} must be a date in YYYY-MM-DD format, got '{value}'.")
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+  def get_queryset(self, options):
+    if not any(options.get(key) for key in ('ids', 'category', 'date_from', 'date_to')):
+      raise CommandError("Select slots with at least one of --ids, --category, --from, --to.")
+    queryset = TimeSlot.objects.all()
+    if options.get('ids'):
+      queryset = queryset.filter(pk__in=options['ids'])
+    if options.get('category'):
+      queryset = queryset.filter(category_id=options['category'])
+    if options.get('date_from'):
+      queryset = queryset.filter(start_time__gte=self._parse_date(options['date_from'], '--from'))
+    if options.get('date_to'):
+      queryset = queryset.filter(start_time__lt=self._parse_date(options['date_to'], '--to'))
+    return queryset
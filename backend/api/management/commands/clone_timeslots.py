@@ -0,0 +1,17 @@
+from django.core.management.base import CommandError
+from api import bulk
+from ._timeslot_selection import TimeSlotSelectionCommand
+
+
+class Command(TimeSlotSelectionCommand):
+  help = "Clone the selected time slots into the following weeks with one INSERT ... SELECT."
+
+  def add_arguments(self, parser):
+    super().add_arguments(parser)
+    parser.add_argument('--weeks', type=int, default=1, help='Number of following weeks to fill (default 1).')
+
+  def handle(self, *args, **options):
+    if options['weeks'] < 1:
+      raise CommandError("--weeks must be at least 1.")
+    count = bulk.clone_to_weeks(self.get_queryset(options), options['weeks'])
+    self.stdout.write(self.style.SUCCESS(f"Created {count} time slot(s) over {options['weeks']} week(s)."))
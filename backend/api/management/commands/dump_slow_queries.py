@@ -0,0 +1,41 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.slowqueries import collect
+
+
+class Command(BaseCommand):
+  help = (
+    "Print the slow-query log (see api/slowqueries.py) merged across the processes that "
+    "published to the cache, worst total time first."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument('--limit', type=int, default=20, help='Number of fingerprints to show (default 20).')
+    parser.add_argument('--full-scans', action='store_true', help='Only statements whose plan reads a whole table.')
+    parser.add_argument('--json', action='store_true', help='Print the entries as JSON.')
+
+  def handle(self, *args, **options):
+    entries = collect()
+    if options['full_scans']:
+      entries = [entry for entry in entries if entry['full_scan']]
+    entries = entries[:options['limit']]
+
+    if options['json']:
+      self.stdout.write(json.dumps(entries, indent=2, default=str))
+      return
+    if not entries:
+      threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100)
+      self.stdout.write(f"No statements slower than {threshold} ms recorded.")
+      return
+
+    for entry in entries:
+      flag = self.style.ERROR(' FULL SCAN') if entry['full_scan'] else ''
+      self.stdout.write(self.style.MIGRATE_HEADING(
+        f"{entry['count']} x, total {entry['total_ms']:.1f} ms, avg {entry['avg_ms']:.1f} ms, max {entry['max_ms']:.1f} ms"
+      ) + flag)
+      self.stdout.write(f"  {entry['fingerprint']}")
+      self.stdout.write("  views: " + ", ".join(f"{view} ({count})" for view, count in entry['views'].items()))
+      for line in (entry['plan'] or '(no plan)').splitlines():
+        self.stdout.write(f"  | {line}")
+      self.stdout.write("")
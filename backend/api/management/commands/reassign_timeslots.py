@@ -0,0 +1,20 @@
+from django.core.management.base import CommandError
+from api import bulk
+from api.models import Category
+from ._timeslot_selection import TimeSlotSelectionCommand
+
+
+class Command(TimeSlotSelectionCommand):
+  help = "Move the selected time slots to another category in one UPDATE."
+
+  def add_arguments(self, parser):
+    super().add_arguments(parser)
+    parser.add_argument('--to-category', type=int, required=True, help='Target category id.')
+
+  def handle(self, *args, **options):
+    try:
+      category = Category.objects.get(pk=options['to_category'])
+    except Category.DoesNotExist:
+      raise CommandError(f"Category {options['to_category']} does not exist.")
+    count = bulk.reassign_category(self.get_queryset(options), category)
+    self.stdout.write(self.style.SUCCESS(f"Moved {count} time slot(s) to {category}."))
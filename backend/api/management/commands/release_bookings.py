@@ -0,0 +1,10 @@
+from api import bulk
+from ._timeslot_selection import TimeSlotSelectionCommand
+
+
+class Command(TimeSlotSelectionCommand):
+  help = "Release every booking on the selected time slots in one UPDATE."
+
+  def handle(self, *args, **options):
+    count = bulk.release_bookings(self.get_queryset(options))
+    self.stdout.write(self.style.SUCCESS(f"Released {count} booking(s)."))
@@ -0,0 +1,33 @@
+import signal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.tasks import Worker
+
+
+class Command(BaseCommand):
+  help = "Run queued background tasks (see api/tasks.py) on a thread pool until stopped with Ctrl-C or SIGTERM."
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      '--threads', type=int, default=getattr(settings, 'TASK_WORKER_THREADS', 4),
+      help='Tasks run concurrently (default TASK_WORKER_THREADS).',
+    )
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty (default 1).')
+    parser.add_argument('--once', action='store_true', help='Exit once no task is runnable instead of polling.')
+
+  def handle(self, *args, **options):
+    if options['threads'] < 1:
+      raise CommandError("--threads must be at least 1.")
+    worker = Worker(threads=options['threads'], poll_interval=options['poll_interval'])
+    previous_handler = signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    if not options['once']:
+      self.stdout.write(f"Worker running with {options['threads']} thread(s).")
+    try:
+      counts = worker.run(once=options['once'])
+    except KeyboardInterrupt:
+      counts = worker.counts
+    finally:
+      signal.signal(signal.SIGTERM, previous_handler)
+    self.stdout.write(self.style.SUCCESS(
+      f"Ran {counts['done']} task(s); {counts['queued']} to be retried, {counts['failed']} failed."
+    ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.digests import send_new_slot_digests, send_new_slot_digests_task
+
+
+class Command(BaseCommand):
+  help = (
+    "Email each user the new time slots in their interested categories since the last run. "
+    "Safe to run from cron; an interrupted run is resumed on the next invocation."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument('--batch-size', type=int, default=100, help='Emails sent per batch (default 100).')
+    parser.add_argument('--enqueue', action='store_true', help='Queue the run for `run_worker` instead of sending now.')
+
+  def handle(self, *args, **options):
+    if options['batch_size'] < 1:
+      raise CommandError("--batch-size must be at least 1.")
+    if options['enqueue']:
+      queued = send_new_slot_digests_task.enqueue(batch_size=options['batch_size'])
+      self.stdout.write(self.style.SUCCESS(f"Queued digest run as task #{queued.pk}."))
+      return
+    stats = send_new_slot_digests(batch_size=options['batch_size'])
+    resumed = " (resumed interrupted run)" if stats['resumed'] else ""
+    self.stdout.write(self.style.SUCCESS(
+      f"Sent {stats['users']} digest(s) covering {stats['slots']} slot notification(s){resumed}."
+    ))
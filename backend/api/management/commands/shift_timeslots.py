@@ -0,0 +1,18 @@
+from datetime import timedelta
+from django.core.management.base import CommandError
+from api import bulk
+from ._timeslot_selection import TimeSlotSelectionCommand
+
+
+class Command(TimeSlotSelectionCommand):
+  help = "Shift start and end of the selected time slots by an offset in one UPDATE."
+
+  def add_arguments(self, parser):
+    super().add_arguments(parser)
+    parser.add_argument('--minutes', type=int, required=True, help='Offset in minutes; negative moves slots earlier.')
+
+  def handle(self, *args, **options):
+    if not options['minutes']:
+      raise CommandError("--minutes must be non-zero.")
+    count = bulk.shift_slots(self.get_queryset(options), timedelta(minutes=options['minutes']))
+    self.stdout.write(self.style.SUCCESS(f"Shifted {count} time slot(s) by {options['minutes']} minute(s)."))
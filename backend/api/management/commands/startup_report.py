@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+CHILD = """
+import json
+from api.warmup import profile_startup
+print(json.dumps(profile_startup(include_warm_up={warm_up})))
+"""
+
+
+def _ms(seconds):
+  return f"{seconds * 1000:8.1f}"
+
+
+class Command(BaseCommand):
+  help = (
+    "Report where process startup time goes: settings, import/models/ready per installed app "
+    "and each warm-up step. Measured in a fresh interpreter."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument('--no-warm-up', action='store_true', help="Only measure django.setup(); don't run the warm-up steps.")
+    parser.add_argument('--json', action='store_true', help='Print the raw measurements as JSON.')
+
+  def handle(self, *args, **options):
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'backend.settings')}
+    result = subprocess.run(
+      [sys.executable, '-c', CHILD.format(warm_up=not options['no_warm_up'])],
+      cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode:
+      raise CommandError(f"Startup failed:\n{result.stderr}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    if options['json']:
+      self.stdout.write(json.dumps(report, indent=2))
+      return
+
+    self.stdout.write(f"{'App':<32}{'import':>9}{'models':>9}{'ready':>9}{'total':>9}  (ms)")
+    for app in sorted(report['apps'], key=lambda app: -(app['import'] + app['models'] + app['ready'])):
+      total = app['import'] + app['models'] + app['ready']
+      self.stdout.write(f"{app['name']:<32}{_ms(app['import'])} {_ms(app['models'])} {_ms(app['ready'])} {_ms(total)}")
+    self.stdout.write("")
+    self.stdout.write(f"{'settings':<32}{_ms(report['settings'])}")
+    self.stdout.write(f"{'django.setup()':<32}{_ms(report['setup'])}")
+    for name, seconds in report['warm_up']:
+      timing = self.style.WARNING('  failed') if seconds is None else _ms(seconds)
+      self.stdout.write(f"{'warm-up: ' + name:<32}{timing}")
+    self.stdout.write(self.style.SUCCESS(f"{'total':<32}{_ms(report['total'])}"))
@@ -0,0 +1,32 @@
+from api.models import TimeSlot
+from api.reports import csv_lines, utilization_rows
+from ._timeslot_selection import TimeSlotSelectionCommand
+
+
+class Command(TimeSlotSelectionCommand):
+  help = (
+    "Write booking utilization per category per week as CSV: slots offered, booked, released "
+    "and booking rate. Without a selection every slot is included."
+  )
+
+  def add_arguments(self, parser):
+    super().add_arguments(parser)
+    parser.add_argument('--output', help='Write to this file instead of stdout.')
+
+  def get_queryset(self, options):
+    if not any(options.get(key) for key in ('ids', 'category', 'date_from', 'date_to')):
+      return TimeSlot.objects.all()
+    return super().get_queryset(options)
+
+  def handle(self, *args, **options):
+    lines = csv_lines(utilization_rows(self.get_queryset(options)))
+    if not options['output']:
+      for line in lines:
+        self.stdout.write(line, ending='')
+      return
+    written = -1  # header
+    with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+      for line in lines:
+        output.write(line)
+        written += 1
+    self.stderr.write(self.style.SUCCESS(f"Wrote {written} row(s) to {options['output']}."))
@@ -0,0 +1,125 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from . import compression, profiling, slowqueries
+
+
+class CompressionMiddleware:
+  """
+  Compress API responses with the best encoding the client accepts
+  (zstd, br or gzip, see api/compression.py).
+
+  Only content types listed in API_COMPRESSION_CONTENT_TYPES are compressed;
+  HTML is left alone because pages carrying CSRF tokens are exposed to
+  BREACH-style attacks when compressed. Regular responses smaller than
+  API_COMPRESSION_MIN_SIZE bytes are sent as-is. Streaming responses are
+  always compressed chunk by chunk since their size is unknown upfront.
+  """
+  def __init__(self, get_response):
+    self.get_response = get_response
+    self.min_size = getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024)
+    self.levels = getattr(settings, 'API_COMPRESSION_LEVELS', {})
+    self.content_types = tuple(getattr(settings, 'API_COMPRESSION_CONTENT_TYPES', ('application/json',)))
+    self.codecs = getattr(settings, 'API_COMPRESSION_CODECS', None)
+
+  def __call__(self, request):
+    response = self.get_response(request)
+    return self.process_response(request, response)
+
+  def _compressible(self, response):
+    if response.has_header('Content-Encoding'):
+      return False
+    if 'no-transform' in response.get('Cache-Control', ''):
+      return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type.startswith(self.content_types)
+
+  def process_response(self, request, response):
+    if not self._compressible(response):
+      return response
+    if not response.streaming and len(response.content) < self.min_size:
+      return response
+
+    # The representation now depends on Accept-Encoding, even when we send identity.
+    patch_vary_headers(response, ('Accept-Encoding',))
+    codec = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.codecs)
+    if codec is None:
+      return response
+    level = self.levels.get(codec.name)
+
+    if response.streaming:
+      if response.is_async:
+        response.streaming_content = _compress_async(response.streaming_content, codec.compressor(level))
+      else:
+        response.streaming_content = _compress_stream(response.streaming_content, codec.compressor(level))
+      del response.headers['Content-Length']
+    else:
+      compressed = codec.compress(response.content, level)
+      if len(compressed) >= len(response.content):
+        return response
+      response.content = compressed
+      response.headers['Content-Length'] = str(len(compressed))
+
+    # The compressed body is a different byte sequence: a strong ETag no longer matches it.
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+      response.headers['ETag'] = 'W/' + etag
+    response.headers['Content-Encoding'] = codec.name
+    return response
+
+
+def _compress_stream(chunks, compressor):
+  for chunk in chunks:
+    data = compressor.compress(chunk)
+    if data:
+      yield data
+  yield compressor.finish()
+
+
+async def _compress_async(chunks, compressor):
+  async for chunk in chunks:
+    data = compressor.compress(chunk)
+    if data:
+      yield data
+  yield compressor.finish()
+
+
+class ProfilingMiddleware:
+  """
+  Profile requests that staff users flag with `X-Profile` or `?_profile`
+  (see api/profiling.py). Removed from the stack entirely when
+  REQUEST_PROFILING_ENABLED is False.
+  """
+  def __init__(self, get_response):
+    if not getattr(settings, 'REQUEST_PROFILING_ENABLED', True):
+      raise MiddlewareNotUsed
+    self.get_response = get_response
+
+  def __call__(self, request):
+    mode = profiling.requested_mode(request)
+    if mode is None or not profiling.is_staff_request(request):
+      return self.get_response(request)
+    response, report = profiling.profile_request(self.get_response, request)
+    if mode == 'inline':
+      return JsonResponse(report)
+    profiling.store_report(report)
+    response['X-Profile-Id'] = report['id']
+    return response
+
+
+class SlowQueryOriginMiddleware:
+  """ Label statements in the slow-query log (api/slowqueries.py) with the view that ran them. """
+  def __init__(self, get_response):
+    self.get_response = get_response
+
+  def __call__(self, request):
+    token = slowqueries.current_origin.set(f'{request.method} {request.path}')
+    try:
+      return self.get_response(request)
+    finally:
+      slowqueries.current_origin.reset(token)
+
+  def process_view(self, request, view_func, view_args, view_kwargs):
+    match = request.resolver_match
+    slowqueries.current_origin.set(f'{request.method} {match.view_name if match else view_func.__name__}')
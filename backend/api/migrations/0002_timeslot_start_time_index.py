@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-19 14:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['start_time'], name='api_timeslot_start_idx'),
+        ),
+    ]
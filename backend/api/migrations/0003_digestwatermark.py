@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-19 14:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_timeslot_start_time_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DigestWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_slot_id', models.BigIntegerField(default=0)),
+                ('pending_slot_id', models.BigIntegerField(blank=True, null=True)),
+                ('last_user_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-19 14:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_idempotencyrecord'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('book', 'Book'), ('unbook', 'Unbook')], max_length=10)),
+                ('outcome', models.CharField(choices=[('ok', 'OK'), ('already_booked', 'Already booked'), ('past', 'Slot in the past'), ('conflict', 'Conflicting booking'), ('not_owner', 'Booked by someone else'), ('throttled', 'Throttled')], max_length=20)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('slot', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.timeslot')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['slot', 'created_at'], name='api_bookingevent_slot_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-19 15:11
+
+from django.db import migrations, models
+
+
+def fill_name_key(apps, schema_editor):
+    Category = apps.get_model('api', 'Category')
+    categories = list(Category.objects.only('id', 'name'))
+    for category in categories:
+        category.name_key = category.name.casefold()  # Category.normalize()
+    Category.objects.bulk_update(categories, ['name_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_slowquery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='name_key',
+            field=models.CharField(default='', editable=False, max_length=300),
+        ),
+        migrations.RunPython(fill_name_key, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['name_key', 'id'], name='api_category_name_key_idx'),
+        ),
+    ]
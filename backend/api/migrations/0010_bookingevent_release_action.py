@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_idempotencyrecord_claimed_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bookingevent',
+            name='action',
+            field=models.CharField(choices=[('book', 'Book'), ('unbook', 'Unbook'), ('release', 'Released by staff')], max_length=10),
+        ),
+    ]
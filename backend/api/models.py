@@ -1,13 +1,35 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 
 class Category(models.Model):
   name = models.CharField(max_length=100, unique=True)
+  # normalize(name), kept by save() for case-insensitive prefix search (longer than
+  # name: casefold() turns ß into ss). bulk_create() and QuerySet.update() bypass
+  # save(); set it yourself when using them.
+  name_key = models.CharField(max_length=300, editable=False, default='')
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['name_key', 'id'], name='api_category_name_key_idx'),
+    ]
 
   def __str__(self):
       return self.name
 
+  @staticmethod
+  def normalize(name):
+    return name.casefold()
+
+  def save(self, *args, **kwargs):
+    self.name_key = self.normalize(self.name)
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'name' in update_fields:
+      kwargs['update_fields'] = {*update_fields, 'name_key'}
+    super().save(*args, **kwargs)
+
 class UserProfile(models.Model):
   user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='profile')
   interested_categories = models.ManyToManyField(Category, blank=True)
@@ -39,10 +61,150 @@ class TimeSlot(models.Model):
 
   class Meta:
     ordering = ['start_time']
+    indexes = [
+      models.Index(fields=['start_time'], name='api_timeslot_start_idx'),
+    ]
 
   def is_booked(self):
-    return self.booked_by is not None
+    return self.booked_by_id is not None
 
   def __str__(self):
     status = f"Booked by {self.booked_by.username}" if self.is_booked() else "Available"
-    return f"{self.category.name} Slot: {self.start_time.strftime('%Y-%m-%d %H:%M')} - {status}"
\ No newline at end of file
+    return f"{self.category.name} Slot: {self.start_time.strftime('%Y-%m-%d %H:%M')} - {status}"
+
+
+class DigestWatermark(models.Model):
+  """
+  Progress marker for a batched notification job (see api/digests.py).
+
+  `last_slot_id` is the highest TimeSlot id already covered. While a run is in
+  progress, `pending_slot_id` holds the upper bound of its window and
+  `last_user_id` the last user whose digest was sent, so a crashed run can be
+  resumed without re-sending completed batches.
+  """
+  name = models.CharField(max_length=50, unique=True)
+  last_slot_id = models.BigIntegerField(default=0)
+  pending_slot_id = models.BigIntegerField(null=True, blank=True)
+  last_user_id = models.BigIntegerField(default=0)
+  updated_at = models.DateTimeField(auto_now=True)
+
+  def __str__(self):
+    return f"{self.name} @ {self.last_slot_id}"
+
+
+class IdempotencyRecord(models.Model):
+  """
+  Stored outcome of a request sent with an Idempotency-Key header (see
+  api/idempotency.py). `status_code` is null while the first request is still
+  being processed; it claimed the key at `claimed_at`. Rows past `expires_at`
+  are ignored and removed by the purge_idempotency_keys command.
+  """
+  user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+  key = models.CharField(max_length=255)
+  fingerprint = models.CharField(max_length=255)
+  status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+  response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+  # A retry may take over a claim older than IDEMPOTENCY_CLAIM_TIMEOUT.
+  claimed_at = models.DateTimeField(default=timezone.now)
+  expires_at = models.DateTimeField(db_index=True)
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=['user', 'key'], name='api_idempotency_user_key_uniq'),
+    ]
+
+  def __str__(self):
+    return f"{self.key} ({self.fingerprint})"
+
+
+class BookingEvent(models.Model):
+  """
+  Append-only record of a book/unbook attempt, successful or not. Rows are
+  buffered in memory and inserted in batches (see api/events.py), so the
+  foreign keys carry no database constraint: an event may outlive its slot or
+  user, and a batch never fails because one of them was deleted meanwhile.
+
+  RELEASE rows come from bulk.release_bookings (admin action, management
+  command): staff cleared the booking, and `user` is the former holder.
+  """
+  BOOK = 'book'
+  UNBOOK = 'unbook'
+  RELEASE = 'release'
+  ACTION_CHOICES = [(BOOK, 'Book'), (UNBOOK, 'Unbook'), (RELEASE, 'Released by staff')]
+
+  OK = 'ok'
+  ALREADY_BOOKED = 'already_booked'
+  PAST = 'past'
+  CONFLICT = 'conflict'
+  NOT_OWNER = 'not_owner'
+  THROTTLED = 'throttled'
+  OUTCOME_CHOICES = [
+    (OK, 'OK'),
+    (ALREADY_BOOKED, 'Already booked'),
+    (PAST, 'Slot in the past'),
+    (CONFLICT, 'Conflicting booking'),
+    (NOT_OWNER, 'Booked by someone else'),
+    (THROTTLED, 'Throttled'),
+  ]
+
+  slot = models.ForeignKey(TimeSlot, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+  user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+  action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+  outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES)
+  created_at = models.DateTimeField(db_index=True)
+
+  class Meta:
+    ordering = ['created_at', 'id']
+    indexes = [
+      models.Index(fields=['slot', 'created_at'], name='api_bookingevent_slot_idx'),
+    ]
+
+  def __str__(self):
+    return f"{self.action} slot {self.slot_id} by user {self.user_id}: {self.outcome}"
+
+
+class Task(models.Model):
+  """
+  A unit of background work for the database-backed queue in api/tasks.py.
+
+  `name` is the dotted path of a function decorated with @task. A worker
+  claims a row by setting `claim_token`, runs it and marks it done, or puts it
+  back with a later `run_after` until `max_attempts` is used up.
+  """
+  QUEUED = 'queued'
+  RUNNING = 'running'
+  DONE = 'done'
+  FAILED = 'failed'
+  STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+  name = models.CharField(max_length=200)
+  args = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+  kwargs = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+  status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+  attempts = models.PositiveIntegerField(default=0)
+  max_attempts = models.PositiveIntegerField(default=3)
+  run_after = models.DateTimeField(default=timezone.now)
+  claim_token = models.CharField(max_length=64, blank=True)
+  claimed_at = models.DateTimeField(null=True, blank=True)
+  last_error = models.TextField(blank=True)
+  created_at = models.DateTimeField(auto_now_add=True)
+  finished_at = models.DateTimeField(null=True, blank=True)
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['status', 'run_after'], name='api_task_ready_idx'),
+      models.Index(fields=['claim_token'], name='api_task_claim_idx'),
+    ]
+
+  def __str__(self):
+    return f"{self.name} #{self.pk} ({self.status})"
+
+
+class SlowQuery(models.Model):
+  """
+  No table: gives the in-memory slow-query log (api/slowqueries.py) a page
+  and a view permission in the admin.
+  """
+  class Meta:
+    managed = False
+    verbose_name_plural = 'slow queries'
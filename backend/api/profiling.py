@@ -0,0 +1,172 @@
+"""
+On-demand profiling of a single request, for staff users.
+
+A request sent with an `X-Profile` header or a `_profile` query parameter by a
+staff user runs under cProfile and tracemalloc while every SQL statement is
+recorded. The report (top functions by cumulative time, net allocations by
+line, SQL with timings) is kept in the cache for REQUEST_PROFILING_TTL seconds
+and its id is returned in the `X-Profile-Id` response header; fetch it from
+/api/profiles/<id>/. With the value `inline` the report replaces the response
+body instead. Streaming response bodies are produced after profiling ends.
+
+Stored reports live in Django's default cache. With the per-process
+local-memory backend (the default) a report can only be fetched from the
+worker that profiled the request, so /api/profiles/<id>/ answers 404 whenever
+the fetch lands on another one; under a multi-process server either configure
+a shared cache or use `inline`.
+
+Requests without the flag only pay a header and query parameter lookup.
+cProfile covers the thread serving the request only, while tracemalloc is
+process-wide: with a threaded server, allocations of concurrent requests show
+up in the report too.
+"""
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+import uuid
+from contextlib import ExitStack
+from importlib import import_module
+from types import SimpleNamespace
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+HEADER = 'HTTP_X_PROFILE'
+QUERY_PARAM = '_profile'
+CACHE_KEY = 'api:profile:%s'
+
+
+def requested_mode(request):
+  """ None, 'store' or 'inline' depending on the profiling flag of the request. """
+  value = request.META.get(HEADER)
+  if value is None:
+    value = request.GET.get(QUERY_PARAM)
+    if value is None:
+      return None
+  return 'inline' if value.strip().lower() == 'inline' else 'store'
+
+
+def is_staff_request(request):
+  """
+  Whether the caller is a staff user. Runs before the authentication
+  middleware and DRF, so it checks the API's token authentication and the
+  session cookie itself.
+  """
+  try:
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    user = Request(request, authenticators=authenticators).user
+  except APIException:
+    return False
+  if not user.is_authenticated:
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+      return False
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    user = get_user(SimpleNamespace(session=session))
+  return user.is_active and user.is_staff
+
+
+class _SqlRecorder:
+  def __init__(self, alias):
+    self.alias = alias
+    self.queries = []
+
+  def __call__(self, execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+      return execute(sql, params, many, context)
+    finally:
+      self.queries.append({
+        'database': self.alias,
+        'sql': sql,
+        'many': many,
+        'ms': round((time.perf_counter() - started) * 1000, 3),
+      })
+
+
+def _top_functions(profile, limit):
+  stats = pstats.Stats(profile, stream=io.StringIO())
+  rows = []
+  for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():
+    rows.append({
+      'function': f'{filename}:{line}({name})',
+      'calls': calls,
+      'total_ms': round(total * 1000, 3),
+      'cumulative_ms': round(cumulative * 1000, 3),
+    })
+  rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+  return rows[:limit]
+
+
+def _top_allocations(before, after, limit):
+  ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+  differences = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), 'lineno')
+  rows = []
+  for stat in differences:
+    if stat.size_diff <= 0:
+      continue
+    frame = stat.traceback[0]
+    rows.append({'line': f'{frame.filename}:{frame.lineno}', 'kb': round(stat.size_diff / 1024, 1), 'blocks': stat.count_diff})
+    if len(rows) == limit:
+      break
+  return rows
+
+
+def profile_request(get_response, request):
+  """ Run `get_response(request)` under the profilers; returns (response, report). """
+  limit = getattr(settings, 'REQUEST_PROFILING_TOP', 30)
+  recorders = [_SqlRecorder(alias) for alias in connections]
+  started_tracing = not tracemalloc.is_tracing()
+  if started_tracing:
+    tracemalloc.start()
+  tracemalloc.reset_peak()
+  profile = cProfile.Profile()
+  try:
+    before = tracemalloc.take_snapshot()
+    with ExitStack() as stack:
+      for recorder in recorders:
+        stack.enter_context(connections[recorder.alias].execute_wrapper(recorder))
+      started = time.perf_counter()
+      profile.enable()
+      try:
+        response = get_response(request)
+      finally:
+        profile.disable()
+      elapsed = time.perf_counter() - started
+    after = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+  finally:
+    if started_tracing:
+      tracemalloc.stop()
+
+  queries = [query for recorder in recorders for query in recorder.queries]
+  report = {
+    'id': uuid.uuid4().hex,
+    'method': request.method,
+    'path': request.get_full_path(),
+    'status': response.status_code,
+    'ms': round(elapsed * 1000, 3),
+    'peak_memory_kb': round(peak / 1024, 1),
+    'functions': _top_functions(profile, limit),
+    'allocations': _top_allocations(before, after, limit),
+    'sql': {
+      'count': len(queries),
+      'ms': round(sum(query['ms'] for query in queries), 3),
+      'queries': queries,
+    },
+  }
+  return response, report
+
+
+def store_report(report):
+  cache.set(CACHE_KEY % report['id'], report, getattr(settings, 'REQUEST_PROFILING_TTL', 3600))
+
+
+def get_report(report_id):
+  return cache.get(CACHE_KEY % report_id)
@@ -0,0 +1,82 @@
+"""
+Booking utilization per category per week, as CSV.
+
+Two GROUP BY queries do the counting in the database: slots offered and
+currently booked per (week, category) from TimeSlot, and releases (successful
+unbook events, plus the release events bulk.release_bookings writes for staff
+releases; see BookingEvent) per (week of the slot, category). Both come
+back ordered by week and category and are merge-joined as they stream, so
+memory use doesn't grow with the date range.
+
+Weeks start on Monday in the current time zone. `booking_rate` is booked /
+offered.
+"""
+import csv
+from django.db.models import Count, F
+from django.db.models.functions import TruncWeek
+from .models import BookingEvent, TimeSlot
+
+HEADER = ['week_start', 'category_id', 'category', 'offered', 'booked', 'released', 'booking_rate']
+
+
+def _slot_counts(slots):
+  return (
+    slots
+    .annotate(week=TruncWeek('start_time'))
+    .values('week', 'category_id')
+    .annotate(category=F('category__name'), offered=Count('id'), booked=Count('booked_by'))
+    .order_by('week', 'category_id')
+  )
+
+
+def _release_counts(slots):
+  return (
+    BookingEvent.objects
+    .filter(action__in=[BookingEvent.UNBOOK, BookingEvent.RELEASE], outcome=BookingEvent.OK, slot__in=slots.values('id'))
+    .annotate(week=TruncWeek('slot__start_time'), category_id=F('slot__category_id'))
+    .values('week', 'category_id')
+    .annotate(released=Count('id'))
+    .order_by('week', 'category_id')
+  )
+
+
+def utilization_rows(slots=None, chunk_size=2000):
+  """
+  Yield one row (in HEADER order) per category and week among `slots`
+  (a TimeSlot queryset, default all).
+  """
+  if slots is None:
+    slots = TimeSlot.objects.all()
+  releases = _release_counts(slots).iterator(chunk_size=chunk_size)
+  release = next(releases, None)
+  for row in _slot_counts(slots).iterator(chunk_size=chunk_size):
+    key = (row['week'], row['category_id'])
+    while release is not None and (release['week'], release['category_id']) < key:
+      release = next(releases, None)  # slot deleted since; nothing to report against
+    released = 0
+    if release is not None and (release['week'], release['category_id']) == key:
+      released = release['released']
+      release = next(releases, None)
+    yield [
+      row['week'].date().isoformat(),
+      row['category_id'],
+      row['category'],
+      row['offered'],
+      row['booked'],
+      released,
+      f"{row['booked'] / row['offered']:.4f}",
+    ]
+
+
+class _Echo:
+  """ File-like object whose write() hands the line back to csv.writer's caller. """
+  def write(self, value):
+    return value
+
+
+def csv_lines(rows, header=HEADER):
+  """ Encode rows as CSV lines, one string per row, header first. """
+  writer = csv.writer(_Echo())
+  yield writer.writerow(header)
+  for row in rows:
+    yield writer.writerow(row)
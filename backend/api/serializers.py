@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+from .cache import category_cache
 from .models import Category, TimeSlot, UserProfile
 from django.contrib.auth.models import User
 
@@ -13,9 +15,89 @@ class UserSerializer(serializers.ModelSerializer):
     fields = ('id', 'username', 'first_name', 'last_name')
 
 
+class BulkManyRelatedField(serializers.ManyRelatedField):
+  """ ManyRelatedField that looks up all submitted primary keys with one IN query. """
+  def to_internal_value(self, data):
+    if isinstance(data, str) or not hasattr(data, '__iter__'):
+      self.fail('not_a_list', input_type=type(data).__name__)
+    if not self.allow_empty and len(data) == 0:
+      self.fail('empty')
+
+    child = self.child_relation
+    queryset = child.get_queryset()
+    pk_field = queryset.model._meta.pk
+    pks = []
+    for item in data:
+      if isinstance(item, bool):
+        child.fail('incorrect_type', data_type=type(item).__name__)
+      try:
+        pks.append(pk_field.to_python(item))
+      except Exception:
+        child.fail('incorrect_type', data_type=type(item).__name__)
+
+    found = queryset.in_bulk(set(pks))
+    for pk in pks:
+      if pk not in found:
+        child.fail('does_not_exist', pk_value=pk)
+    return [found[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+  """ PrimaryKeyRelatedField whose many=True form validates in bulk. """
+  @classmethod
+  def many_init(cls, *args, **kwargs):
+    list_kwargs = {'child_relation': cls(*args, **kwargs)}
+    for key in kwargs:
+      if key in MANY_RELATION_KWARGS:
+        list_kwargs[key] = kwargs[key]
+    return BulkManyRelatedField(**list_kwargs)
+
+
+class CachedCategoryPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+  """ Category primary key input checked against the category cache; the DB is only asked on a miss. """
+  def to_internal_value(self, data):
+    if isinstance(data, bool):
+      self.fail('incorrect_type', data_type=type(data).__name__)
+    try:
+      pk = Category._meta.pk.to_python(data)
+    except Exception:
+      self.fail('incorrect_type', data_type=type(data).__name__)
+    category = category_cache.get(pk)
+    if category is not None:
+      return category
+    return super().to_internal_value(pk)
+
+
+class CachedCategoryField(serializers.Field):
+  """ Renders a category id as the cached category's CategorySerializer data, optionally limited to `fields`. """
+  def __init__(self, fields=None, **kwargs):
+    kwargs['read_only'] = True
+    kwargs.setdefault('source', 'category_id')
+    super().__init__(**kwargs)
+    self.only_fields = fields
+    self.category_serializer = CategorySerializer()
+    self._categories = None
+
+  def to_representation(self, value):
+    # Check the cache version once per serializer, not once per row (with a
+    # shared cache backend every check is a round trip). A category created
+    # since the cache was loaded makes it reload once, not query per row.
+    if self._categories is None:
+      self._categories = category_cache.snapshot()
+    category = self._categories.get(value)
+    if category is None:
+      category = category_cache.get(value)
+    if category is None:
+      return None
+    data = self.category_serializer.to_representation(category)
+    if self.only_fields:
+      data = {name: data[name] for name in data if name in self.only_fields}
+    return data
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
   interested_categories = CategorySerializer(many=True, read_only=True)
-  interested_category_ids = serializers.PrimaryKeyRelatedField(
+  interested_category_ids = BulkPrimaryKeyRelatedField(
     many=True, queryset=Category.objects.all(), source='interested_categories', write_only=True
   )
   user = UserSerializer(read_only=True)
@@ -25,27 +107,106 @@ class UserProfileSerializer(serializers.ModelSerializer):
     fields = ['user', 'interested_categories', 'interested_category_ids']
 
 
+class RelatedIdField(serializers.Field):
+    """ Renders a relation as {"id": <pk>} straight from the FK column, without loading the related row. """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return {'id': value}
+
+
 class TimeSlotSerializer(serializers.ModelSerializer):
-    category = CategorySerializer(read_only=True)
-    category_id = serializers.PrimaryKeyRelatedField(
+    """
+    Supports sparse fieldsets through the `fields` and `expand` context keys
+    (set by TimeSlotViewSet from `?fields=` / `?expand=`). Without `fields`
+    every field is rendered with nested relations, as before.
+
+    With `fields`, only the listed top-level fields are rendered. A relation
+    listed bare (`category`) renders as its primary key unless it is also in
+    `expand`; dotted names (`category.id`, `booked_by.username`) render the
+    relation nested with just those sub-fields.
+    """
+    # Served from the category cache, so listing slots never joins api_category.
+    category = CachedCategoryField()
+    category_id = CachedCategoryPrimaryKeyField(
         queryset=Category.objects.all(), source='category', write_only=True, required=False
     )
     booked_by = UserSerializer(read_only=True)
     is_booked = serializers.BooleanField(read_only=True)
     booked_by_user = serializers.SerializerMethodField()
 
+    # Relations that may be expanded, with the serializer used when they are.
+    expandable_fields = {'category': CategorySerializer, 'booked_by': UserSerializer}
+
     class Meta:
         model = TimeSlot
         fields = ['id', 'category', 'category_id', 'start_time', 'end_time', 'booked_by', 'is_booked', 'booked_by_user']
         read_only_fields = ['booked_by']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        sparse = self.context.get('fields')
+        if sparse is None:
+            return
+        expand = self.context.get('expand') or set()
+        wanted, nested = split_sparse_fields(sparse)
+        wanted |= set(expand)
+
+        for name in list(self.fields):
+            if self.fields[name].write_only:
+                continue
+            if name not in wanted:
+                self.fields.pop(name)
+            elif name in self.expandable_fields and name not in expand:
+                sub_fields = nested.get(name)
+                if not sub_fields:
+                    self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+                elif name == 'category':
+                    self.fields[name] = CachedCategoryField(fields=sub_fields)
+                elif sub_fields == {'id'}:
+                    self.fields[name] = RelatedIdField(source=f'{name}_id')
+                else:
+                    related = self.expandable_fields[name](read_only=True)
+                    for sub_name in set(related.fields) - sub_fields:
+                        related.fields.pop(sub_name)
+                    self.fields[name] = related
+
     def get_booked_by_user(self, obj):
       """ Check if the slot is booked by the current request's user. """
       request = self.context.get('request')
       if request and hasattr(request, 'user') and request.user.is_authenticated:
-        return obj.booked_by == request.user
+        # Compare ids so the booking user never has to be loaded.
+        return obj.booked_by_id is not None and obj.booked_by_id == request.user.pk
       return False 
 
+    @classmethod
+    def invalid_sparse_fields(cls, sparse, expand):
+        """ Return the requested field names this serializer does not know. """
+        readable = [name for name in cls.Meta.fields if name != 'category_id']
+        wanted, nested = split_sparse_fields(sparse)
+        unknown = sorted((wanted - set(readable)) | (set(expand) - set(cls.expandable_fields)))
+        for name, sub_fields in nested.items():
+            related = cls.expandable_fields.get(name)
+            if related is None:
+                unknown.extend(f'{name}.{sub}' for sub in sorted(sub_fields))
+            else:
+                unknown.extend(f'{name}.{sub}' for sub in sorted(sub_fields - set(related.Meta.fields)))
+        return unknown
+
+
+def split_sparse_fields(sparse):
+    """ Split ['id', 'category.id'] into top-level names and {relation: {sub-fields}}. """
+    wanted, nested = set(), {}
+    for name in sparse:
+        top, _, sub = name.partition('.')
+        wanted.add(top)
+        if sub:
+            nested.setdefault(top, set()).add(sub)
+    return wanted, nested
+
+
 class BookingActionSerializer(serializers.Serializer):
     # No fields needed, action determined by endpoint/method
     pass
\ No newline at end of file
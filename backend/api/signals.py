@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent once per set-based TimeSlot operation (see api/bulk.py) instead of a
+# post_save per row. Receivers get `action` (str) and `count` (rows affected).
+timeslots_bulk_changed = Signal()
@@ -0,0 +1,199 @@
+"""
+Slow-query log.
+
+Every database connection gets an execute wrapper (installed on
+`connection_created`) that times each statement. Statements taking at least
+SLOW_QUERY_THRESHOLD_MS are aggregated in memory per fingerprint (the SQL
+with literals, placeholders and IN lists normalised), with count, total and
+max duration, the views that issued them and the query plan, captured with
+EXPLAIN QUERY PLAN (SQLite) or EXPLAIN (PostgreSQL, MySQL) the first time a
+fingerprint is seen (outside a transaction on PostgreSQL and MySQL). Plans
+that read a whole table are flagged as full scans.
+
+Statements under the threshold cost two clock reads. EXPLAIN runs on a raw
+backend cursor, so it is neither re-timed nor counted in Django's query log.
+
+Each process publishes its aggregates to Django's cache (at most every
+SLOW_QUERY_PUBLISH_INTERVAL seconds, immediately for a new fingerprint); the
+admin page and the dump_slow_queries command merge what all processes
+published. With the default local-memory cache that is only the current
+process, so use a shared cache backend to see the web workers' queries from a
+management command.
+"""
+import contextvars
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+INDEX_KEY = 'api:slow-queries:index'
+SNAPSHOT_KEY = 'api:slow-queries:%s'
+
+# Set by SlowQueryOriginMiddleware to e.g. 'GET timeslot-list'.
+current_origin = contextvars.ContextVar('slow_query_origin', default='(no request)')
+
+_FINGERPRINT_RULES = [
+  (re.compile(r"'(?:[^']|'')*'"), '?'),                      # string literals
+  (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),                    # numbers
+  (re.compile(r'%s|\?'), '?'),                                # placeholders
+  (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),       # IN (?, ?, ...)
+  (re.compile(r'(?:\(\.\.\.\)\s*,\s*)+\(\.\.\.\)'), '(...)'), # multi-row VALUES
+  (re.compile(r'\s+'), ' '),
+]
+
+_EXPLAIN = {
+  'sqlite': ('EXPLAIN QUERY PLAN ', lambda row: row[-1]),
+  'postgresql': ('EXPLAIN ', lambda row: row[0]),
+  'mysql': ('EXPLAIN ', lambda row: ' | '.join(str(value) for value in row)),
+}
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+_FULL_SCAN = re.compile(r'^\s*SCAN (?!.*\bUSING\b)|\bSeq Scan\b|\|\s*ALL\s*\|', re.MULTILINE)
+
+
+def fingerprint(sql):
+  for pattern, replacement in _FINGERPRINT_RULES:
+    sql = pattern.sub(replacement, sql)
+  return sql.strip()
+
+
+def explain(connection, sql, params):
+  """ The plan of `sql` as text, or None if it can't be explained here. """
+  if connection.vendor not in _EXPLAIN or not sql.lstrip().upper().startswith(_EXPLAINABLE):
+    return None
+  if connection.in_atomic_block and connection.vendor != 'sqlite':
+    # A failing statement would abort the caller's transaction; try again outside one.
+    return None
+  prefix, format_row = _EXPLAIN[connection.vendor]
+  cursor = connection.create_cursor()
+  try:
+    cursor.execute(prefix + sql, params)
+    return '\n'.join(str(format_row(row)) for row in cursor.fetchall())
+  except Exception:
+    logger.debug('Could not EXPLAIN %s', sql, exc_info=True)
+    return None
+  finally:
+    cursor.close()
+
+
+class SlowQueryLog:
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._entries = {}
+    self._published_at = 0.0
+    self._recording = threading.local()
+
+  def __call__(self, execute, sql, params, many, context):
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if elapsed_ms >= getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100) and not getattr(self._recording, 'active', False):
+      self._recording.active = True
+      try:
+        self.record(context['connection'], sql, params, elapsed_ms, many)
+      except Exception:
+        logger.exception('Could not record slow query.')
+      finally:
+        self._recording.active = False
+    return result
+
+  def record(self, connection, sql, params, elapsed_ms, many=False):
+    key = fingerprint(sql)
+    with self._lock:
+      entry = self._entries.get(key)
+      new = entry is None
+      needs_plan = new or entry['plan'] is None
+    # EXPLAIN outside the lock; at worst two threads explain the same new query.
+    plan = explain(connection, sql, params) if needs_plan and not many else None
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        entry = self._entries[key] = {
+          'fingerprint': key, 'sql': sql, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+          'views': Counter(), 'plan': None, 'full_scan': False, 'last_seen': 0.0,
+        }
+      entry['count'] += 1
+      entry['total_ms'] += elapsed_ms
+      if elapsed_ms > entry['max_ms']:
+        entry['max_ms'] = elapsed_ms
+        entry['sql'] = sql
+      entry['views'][current_origin.get()] += 1
+      entry['last_seen'] = time.time()
+      if plan and not entry['plan']:
+        entry['plan'] = plan
+        entry['full_scan'] = bool(_FULL_SCAN.search(plan))
+      self._evict()
+    self.publish(force=new)
+
+  def _evict(self):
+    limit = getattr(settings, 'SLOW_QUERY_LOG_MAX_ENTRIES', 200)
+    while len(self._entries) > limit:
+      del self._entries[min(self._entries, key=lambda key: self._entries[key]['total_ms'])]
+
+  def snapshot(self):
+    with self._lock:
+      return [{**entry, 'views': dict(entry['views'])} for entry in self._entries.values()]
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+
+  def publish(self, force=False):
+    """ Store this process's aggregates in the cache for the admin page and the dump command. """
+    now = time.monotonic()
+    if not force and now - self._published_at < getattr(settings, 'SLOW_QUERY_PUBLISH_INTERVAL', 10):
+      return
+    self._published_at = now
+    key = SNAPSHOT_KEY % f'{socket.gethostname()}:{os.getpid()}'
+    cache.set(key, self.snapshot(), getattr(settings, 'SLOW_QUERY_LOG_TTL', 86400))
+    index = cache.get(INDEX_KEY) or []
+    if key not in index:
+      cache.set(INDEX_KEY, [*index, key], None)
+
+
+slow_query_log = SlowQueryLog()
+
+
+def collect():
+  """ Aggregates published by every process, merged per fingerprint, slowest total first. """
+  slow_query_log.publish(force=True)
+  index = cache.get(INDEX_KEY) or []
+  snapshots = cache.get_many(index)
+  if len(snapshots) < len(index):
+    cache.set(INDEX_KEY, [key for key in index if key in snapshots], None)
+
+  merged = {}
+  for snapshot in snapshots.values():
+    for entry in snapshot:
+      total = merged.get(entry['fingerprint'])
+      if total is None:
+        merged[entry['fingerprint']] = {**entry, 'views': Counter(entry['views'])}
+        continue
+      total['count'] += entry['count']
+      total['total_ms'] += entry['total_ms']
+      if entry['max_ms'] > total['max_ms']:
+        total['max_ms'], total['sql'] = entry['max_ms'], entry['sql']
+      total['views'].update(entry['views'])
+      total['last_seen'] = max(total['last_seen'], entry['last_seen'])
+      if not total['plan']:
+        total['plan'], total['full_scan'] = entry['plan'], entry['full_scan']
+
+  entries = sorted(merged.values(), key=lambda entry: entry['total_ms'], reverse=True)
+  for entry in entries:
+    entry['avg_ms'] = entry['total_ms'] / entry['count']
+    entry['views'] = dict(entry['views'].most_common())
+  return entries
+
+
+@receiver(connection_created)
+def install_slow_query_log(sender, connection, **kwargs):
+  if getattr(settings, 'SLOW_QUERY_LOG_ENABLED', True) and slow_query_log not in connection.execute_wrappers:
+    connection.execute_wrappers.append(slow_query_log)
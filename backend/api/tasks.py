@@ -0,0 +1,184 @@
+"""
+Minimal database-backed task queue.
+
+Slow side effects (email, cache rebuilds, digests) are queued as Task rows
+and run by `manage.py run_worker`, so no outside broker is needed and it works
+on SQLite.
+
+    @task(max_attempts=5)
+    def send_receipt(booking_id): ...
+
+    send_receipt.enqueue(booking.pk)
+
+`enqueue()` inserts the row through the current connection, so inside a
+transaction the task is committed (and becomes visible to workers) only if
+that transaction commits, and disappears with it on rollback. Arguments must
+be JSON-serializable.
+
+Workers claim tasks with a single conditional UPDATE (`... WHERE status =
+'queued'`), so two workers can never run the same task. A failed task is put
+back with exponential backoff until it has used `max_attempts`; a task whose
+worker died is reclaimed once TASK_CLAIM_TIMEOUT has passed since it was
+claimed, or marked failed if that was its last attempt. Tasks may therefore run more than once and should be idempotent.
+"""
+import logging
+import random
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+  return getattr(settings, name, default)
+
+
+def task(func=None, *, max_attempts=None):
+  """ Mark a function as runnable by the worker and give it an `.enqueue()` shortcut. """
+  if func is None:
+    return partial(task, max_attempts=max_attempts)
+  func.task_name = f'{func.__module__}.{func.__qualname__}'
+  func.max_attempts = max_attempts
+  func.enqueue = partial(enqueue, func)
+  return func
+
+
+def enqueue(func, *args, delay=None, max_attempts=None, **kwargs):
+  """ Queue `func(*args, **kwargs)`; `delay` (a timedelta) postpones the first run. """
+  name = getattr(func, 'task_name', None)
+  if name is None:
+    raise TypeError(f"{func!r} is not a task; decorate it with @task.")
+  return Task.objects.create(
+    name=name,
+    args=list(args),
+    kwargs=kwargs,
+    max_attempts=max_attempts or func.max_attempts or _setting('TASK_MAX_ATTEMPTS', 3),
+    run_after=timezone.now() + (delay or timedelta()),
+  )
+
+
+def retry_delay(attempts):
+  """ Seconds before retry number `attempts`: exponential, capped, with up to 10% jitter. """
+  base = _setting('TASK_RETRY_BACKOFF', 30)
+  delay = min(base * 2 ** (attempts - 1), _setting('TASK_RETRY_BACKOFF_MAX', 3600))
+  return delay * random.uniform(1, 1.1)
+
+
+def claim(limit, now=None):
+  """
+  Claim up to `limit` runnable tasks for this caller and return them.
+
+  Candidates are read first and then taken with one UPDATE that re-checks
+  their state; rows another worker took in between are simply not updated.
+  """
+  now = now or timezone.now()
+  stale = Q(status=Task.RUNNING, claimed_at__lt=now - _setting('TASK_CLAIM_TIMEOUT', timedelta(minutes=10)))
+  # A task that keeps killing its worker (OOM, segfault) must not be reclaimed forever.
+  given_up = Task.objects.filter(stale, attempts__gte=F('max_attempts')).update(
+    status=Task.FAILED, finished_at=now, claim_token='',
+    last_error='The worker did not finish its last attempt within TASK_CLAIM_TIMEOUT.',
+  )
+  if given_up:
+    logger.error('Gave up on %d task(s) whose last attempt did not finish.', given_up)
+  runnable = Q(status=Task.QUEUED, run_after__lte=now) | (stale & Q(attempts__lt=F('max_attempts')))
+  candidates = list(
+    Task.objects.filter(runnable).order_by('run_after', 'id').values_list('id', flat=True)[:limit]
+  )
+  if not candidates:
+    return []
+  token = uuid.uuid4().hex
+  Task.objects.filter(runnable, id__in=candidates).update(
+    status=Task.RUNNING, claim_token=token, claimed_at=now, attempts=F('attempts') + 1
+  )
+  return list(Task.objects.filter(claim_token=token, status=Task.RUNNING).order_by('run_after', 'id'))
+
+
+def execute(claimed):
+  """ Run one claimed task and record the outcome; returns the final status. """
+  # Only update the row while it is still ours (not reclaimed after a timeout).
+  mine = Task.objects.filter(pk=claimed.pk, claim_token=claimed.claim_token)
+  try:
+    func = import_string(claimed.name)
+    if getattr(func, 'task_name', None) != claimed.name:
+      raise TypeError(f"{claimed.name} is not a task.")
+    func(*claimed.args, **claimed.kwargs)
+  except Exception:
+    error = traceback.format_exc()
+    if claimed.attempts < claimed.max_attempts:
+      delay = retry_delay(claimed.attempts)
+      logger.warning('Task %s failed (attempt %d/%d); retrying in %.0fs.', claimed, claimed.attempts, claimed.max_attempts, delay)
+      mine.update(status=Task.QUEUED, run_after=timezone.now() + timedelta(seconds=delay), last_error=error, claim_token='')
+      return Task.QUEUED
+    logger.error('Task %s failed after %d attempts.', claimed, claimed.attempts)
+    mine.update(status=Task.FAILED, finished_at=timezone.now(), last_error=error, claim_token='')
+    return Task.FAILED
+  mine.update(status=Task.DONE, finished_at=timezone.now(), claim_token='')
+  return Task.DONE
+
+
+class Worker:
+  """ Claims tasks in batches and runs them on a thread pool until stopped. """
+  def __init__(self, threads=4, poll_interval=1.0):
+    self.threads = threads
+    self.poll_interval = poll_interval
+    self.stopping = threading.Event()
+    self._idle = threading.Semaphore(threads)
+    self.counts = {Task.DONE: 0, Task.QUEUED: 0, Task.FAILED: 0}
+    self._counts_lock = threading.Lock()
+
+  def _run(self, claimed):
+    try:
+      status = execute(claimed)
+      with self._counts_lock:
+        self.counts[status] += 1
+    finally:
+      close_old_connections()
+      self._idle.release()
+
+  def run(self, once=False):
+    """ Process tasks until stop() is called; with `once`, until nothing is runnable. """
+    with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='task-worker') as pool:
+      while not self.stopping.is_set():
+        # Wait for at least one free thread, then claim as many tasks as there are free threads.
+        if not self._idle.acquire(timeout=self.poll_interval):
+          continue
+        free = 1
+        while free < self.threads and self._idle.acquire(blocking=False):
+          free += 1
+        try:
+          claimed = claim(free)
+        except Exception:
+          # e.g. "database is locked" on SQLite; try again on the next poll.
+          logger.exception('Could not claim tasks.')
+          claimed = []
+        for item in claimed:
+          pool.submit(self._run, item)
+        for _ in range(free - len(claimed)):
+          self._idle.release()
+        if not claimed:
+          if once and self._all_idle():
+            break
+          self.stopping.wait(self.poll_interval)
+      # Leaving the with-block waits for the tasks already running.
+    return self.counts
+
+  def _all_idle(self):
+    taken = 0
+    while self._idle.acquire(blocking=False):
+      taken += 1
+    for _ in range(taken):
+      self._idle.release()
+    return taken == self.threads
+
+  def stop(self):
+    self.stopping.set()
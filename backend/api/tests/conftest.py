@@ -1,6 +1,9 @@
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from rest_framework.test import APIClient, APIRequestFactory
+from api.cache import category_cache
+from api.events import booking_events
 from api.models import Category, TimeSlot, UserProfile
 from datetime import datetime, timedelta
 import zoneinfo
@@ -8,6 +11,35 @@ import zoneinfo
 
 User = get_user_model()
 
+@pytest.fixture(autouse=True)
+def plain_static_storage(settings):
+    """ Tests run without collectstatic, so there is no manifest to look hashed names up in. """
+    settings.STORAGES = {
+        **settings.STORAGES,
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    }
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    """ Start every test with empty throttle buckets and a stale category cache
+    (test transactions roll back without sending signals). """
+    cache.clear()
+    category_cache.invalidate()
+
+@pytest.fixture(autouse=True)
+def inline_booking_events(settings):
+    """ No background flusher thread in tests, and no events left over from the previous test. """
+    settings.BOOKING_EVENT_FLUSH_INTERVAL = None
+    booking_events.discard()
+
+@pytest.fixture
+def booking_rates(settings):
+    """ Low booking throttle rates, so tests can hit them in a few requests. """
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {'booking': '3/min', 'booking_global': '5/min'},
+    }
+
 # --- Client Fixtures ---
 @pytest.fixture
 def api_client():
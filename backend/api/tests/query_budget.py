@@ -0,0 +1,41 @@
+"""
+Query-budget assertions: pin how many SQL queries a request may issue and
+check that the number does not grow with the amount of data.
+"""
+from contextlib import contextmanager
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Row counts every budgeted endpoint is exercised at.
+SCALES = (1, 100, 10_000)
+
+
+def _format_queries(captured):
+    return "\n".join(f"  {i}. {query['sql']}" for i, query in enumerate(captured, start=1))
+
+
+@contextmanager
+def assert_max_queries(budget, using=connection):
+    """ Fail if the block runs more than `budget` queries, listing the SQL. """
+    with CaptureQueriesContext(using) as captured:
+        yield captured
+    count = len(captured.captured_queries)
+    assert count <= budget, f"{count} queries, budget is {budget}:\n{_format_queries(captured.captured_queries)}"
+
+
+def assert_query_budget(budget, grow, perform, scales=SCALES):
+    """
+    For each scale: `grow(scale)` brings the data up to that many rows and
+    returns any per-step context; `perform(context)` makes the request and
+    returns the response. Every step must succeed within `budget` queries and
+    all steps must issue the same number of queries.
+    """
+    counts = {}
+    for scale in scales:
+        context = grow(scale)
+        with assert_max_queries(budget) as captured:
+            response = perform(context)
+        assert response.status_code < 400, f"HTTP {response.status_code} at {scale} rows: {getattr(response, 'data', '')}"
+        counts[scale] = len(captured.captured_queries)
+    assert len(set(counts.values())) == 1, f"query count grows with rows: {counts}"
+    return counts
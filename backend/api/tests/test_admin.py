@@ -0,0 +1,135 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from api.admin import BookedByListFilter, EstimatedCountPaginator
+from api.models import Category, TimeSlot, UserProfile
+from datetime import timedelta
+from django.utils import timezone
+
+User = get_user_model()
+
+
+def _bulk_create_users(prefix, count, categories):
+    """ Create users + profiles + category links without per-row signals. """
+    users = User.objects.bulk_create(
+        [User(username=f'{prefix}{i:05d}', password='!') for i in range(count)],
+        batch_size=1000,
+    )
+    profiles = UserProfile.objects.bulk_create(
+        [UserProfile(user=user) for user in users], batch_size=1000
+    )
+    through = UserProfile.interested_categories.through
+    through.objects.bulk_create(
+        [through(userprofile_id=profile.id, category_id=cat.id) for profile in profiles for cat in categories],
+        batch_size=1000,
+    )
+
+
+@pytest.mark.django_db
+def test_user_changelist_query_count_at_10k_users(admin_client):
+    """ The user changelist must not issue a query per row (N+1) at 10k users. """
+    categories = Category.objects.bulk_create([Category(name=f'Admin Cat {i}') for i in range(3)])
+    url = reverse('admin:auth_user_changelist')
+
+    _bulk_create_users('small', 10, categories)
+    with CaptureQueriesContext(connection) as small:
+        response = admin_client.get(url)
+    assert response.status_code == 200
+
+    _bulk_create_users('bulk', 10000, categories)
+    with CaptureQueriesContext(connection) as large:
+        response = admin_client.get(url)
+    assert response.status_code == 200
+    assert 'Admin Cat 0, Admin Cat 1, Admin Cat 2' in response.content.decode()
+
+    assert len(large.captured_queries) == len(small.captured_queries)
+    assert len(large.captured_queries) <= 10
+
+
+@pytest.mark.django_db
+def test_timeslot_changelist_query_count(admin_client, test_category, test_user):
+    """ Category and booked_by columns are joined, not fetched per row. """
+    now = timezone.now()
+    url = reverse('admin:api_timeslot_changelist')
+
+    def add_slots(count):
+        TimeSlot.objects.bulk_create([
+            TimeSlot(category=test_category, start_time=now + timedelta(hours=i),
+                     end_time=now + timedelta(hours=i, minutes=30), booked_by=test_user)
+            for i in range(count)
+        ])
+
+    add_slots(5)
+    with CaptureQueriesContext(connection) as small:
+        assert admin_client.get(url).status_code == 200
+    add_slots(95)
+    with CaptureQueriesContext(connection) as large:
+        assert admin_client.get(url).status_code == 200
+
+    assert len(large.captured_queries) == len(small.captured_queries)
+
+
+@pytest.mark.django_db
+def test_booked_by_autocomplete_uses_prefix_search(admin_client, test_user, other_user):
+    """ booked_by autocomplete matches usernames by prefix only. """
+    url = reverse('admin:autocomplete')
+    params = {'app_label': 'api', 'model_name': 'timeslot', 'field_name': 'booked_by'}
+
+    response = admin_client.get(url, {**params, 'term': 'test'})
+    assert response.status_code == 200
+    assert [r['text'] for r in response.json()['results']] == ['testuser']
+
+    response = admin_client.get(url, {**params, 'term': 'user'})
+    assert response.json()['results'] == []
+
+
+@pytest.mark.django_db
+def test_timeslot_changelist_filters_by_booking_user(admin_client, test_category, test_user, other_user):
+    """ booked_by is filtered through an autocomplete picker, not a list of every user. """
+    now = timezone.now()
+    mine, theirs, free = TimeSlot.objects.bulk_create([
+        TimeSlot(category=test_category, start_time=now + timedelta(hours=i),
+                 end_time=now + timedelta(hours=i, minutes=30), booked_by=user)
+        for i, user in enumerate([test_user, other_user, None])
+    ])
+    url = reverse('admin:api_timeslot_changelist')
+
+    response = admin_client.get(url)
+    assert response.status_code == 200
+    content = response.content.decode()
+    assert 'name="booked_by__id__exact"' in content and 'admin-autocomplete' in content
+    assert 'otheruser</a>' not in content  # users are not listed in the sidebar
+
+    response = admin_client.get(url, {'booked_by__id__exact': test_user.pk, 'category__id__exact': test_category.pk})
+    assert [slot.pk for slot in response.context['cl'].result_list] == [mine.pk]
+    booked_by_filter = next(spec for spec in response.context['cl'].filter_specs if isinstance(spec, BookedByListFilter))
+    assert ('category__id__exact', str(test_category.pk)) in booked_by_filter.hidden_params
+
+    response = admin_client.get(url, {'booked_by__id__exact': ''})  # picker cleared
+    assert len(response.context['cl'].result_list) == 3
+
+    response = admin_client.get(url, {'booked_by__isnull': 'True'})
+    assert [slot.pk for slot in response.context['cl'].result_list] == [free.pk]
+    response = admin_client.get(url, {'booked_by__isnull': 'False'})
+    assert {slot.pk for slot in response.context['cl'].result_list} == {mine.pk, theirs.pk}
+
+
+@pytest.mark.django_db
+def test_estimated_count_paginator_uses_table_statistics(test_category):
+    """ Unfiltered querysets use the planner estimate once the table is large enough. """
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+        cursor.execute("DELETE FROM sqlite_stat1 WHERE tbl = %s", [TimeSlot._meta.db_table])
+        cursor.execute(
+            "INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (%s, NULL, %s)",
+            [TimeSlot._meta.db_table, '50000'],
+        )
+
+    paginator = EstimatedCountPaginator(TimeSlot.objects.all(), 100)
+    assert paginator.count == 50000
+
+    # Filtered querysets still get an exact count.
+    filtered = EstimatedCountPaginator(TimeSlot.objects.filter(category=test_category), 100)
+    assert filtered.count == 0
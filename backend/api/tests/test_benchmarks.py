@@ -0,0 +1,56 @@
+import pytest
+from django.contrib.auth.models import User
+from api.models import Category, TimeSlot, UserProfile
+from benchmarks.compare import compare
+from benchmarks.data import generate
+from benchmarks.hotpaths import CASES, run_suite
+
+
+@pytest.mark.django_db
+def test_generated_data_is_deterministic():
+    first = generate(60)
+    rows = list(TimeSlot.objects.order_by('id').values_list('category__name', 'start_time', 'booked_by__username'))
+    assert len(rows) == 60
+    assert Category.objects.count() == 5
+    assert UserProfile.objects.filter(user__username__startswith='bench').count() == User.objects.count()
+    assert first.free_slot.booked_by is None
+
+    TimeSlot.objects.all().delete()
+    Category.objects.all().delete()
+    User.objects.all().delete()
+    generate(60)
+    assert list(TimeSlot.objects.order_by('id').values_list('category__name', 'start_time', 'booked_by__username')) == rows
+
+
+@pytest.mark.django_db
+def test_suite_measures_every_case():
+    """ The suite rolls its data back, so it can run inside a test. """
+    results = run_suite({'tiny': 40}, repeat=2)
+    assert set(results['tiny']) == set(CASES)
+    for metrics in results['tiny'].values():
+        assert set(metrics) == {'median_ms', 'min_ms', 'peak_kb', 'queries'}
+        assert metrics['min_ms'] <= metrics['median_ms']
+    assert TimeSlot.objects.count() == 0
+
+
+def _report(min_ms, peak_kb=100.0, queries=2):
+    return {'results': {'small': {'case': {'median_ms': min_ms, 'min_ms': min_ms, 'peak_kb': peak_kb, 'queries': queries}}}}
+
+
+def _regressed(rows):
+    return [metric for _, _, metric, *_, regressed in rows if regressed]
+
+
+def test_compare_flags_changes_beyond_the_threshold():
+    baseline = _report(10.0)
+    assert _regressed(compare(baseline, _report(12.0), threshold=0.25)) == []
+    assert _regressed(compare(baseline, _report(13.0), threshold=0.25)) == ['min_ms']
+    assert _regressed(compare(baseline, _report(8.0, peak_kb=200.0), threshold=0.25)) == ['peak_kb']
+    assert _regressed(compare(baseline, _report(10.0, queries=3))) == ['queries']
+
+
+def test_compare_ignores_tiny_absolute_changes_and_new_cases():
+    assert _regressed(compare(_report(0.01), _report(0.04))) == []
+    rows = compare({'results': {}}, _report(10.0))
+    assert _regressed(rows) == []
+    assert {before for _, _, _, before, *_ in rows} == {None}
@@ -0,0 +1,163 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from api import bulk
+from api.models import BookingEvent, Category, TimeSlot
+from api.signals import timeslots_bulk_changed
+from datetime import timedelta
+from io import StringIO
+
+
+@pytest.fixture
+def week_of_slots(db, test_category, test_user):
+    """ Five future slots on consecutive days, the first two booked. """
+    start = (timezone.now() + timedelta(days=1)).replace(microsecond=0)
+    return [
+        TimeSlot.objects.create(
+            category=test_category,
+            start_time=start + timedelta(days=i),
+            end_time=start + timedelta(days=i, hours=1),
+            booked_by=test_user if i < 2 else None,
+        )
+        for i in range(5)
+    ]
+
+
+@pytest.fixture
+def bulk_events():
+    """ Collect timeslots_bulk_changed signals sent during the test. """
+    events = []
+    def receiver(sender, **kwargs):
+        events.append((kwargs['action'], kwargs['count']))
+    timeslots_bulk_changed.connect(receiver)
+    yield events
+    timeslots_bulk_changed.disconnect(receiver)
+
+
+@pytest.mark.django_db
+def test_release_bookings_single_update(week_of_slots, bulk_events):
+    """ Releasing bookings is one INSERT of staff-release events, one UPDATE and one consolidated signal. """
+    booked = dict(TimeSlot.objects.filter(booked_by__isnull=False).values_list('id', 'booked_by_id'))
+    with CaptureQueriesContext(connection) as queries:
+        count = bulk.release_bookings(TimeSlot.objects.all())
+
+    assert count == 2
+    assert len([q for q in queries.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE'))]) == 2
+    assert len(queries.captured_queries) <= 4  # plus SAVEPOINT/RELEASE inside the test transaction
+    assert not TimeSlot.objects.filter(booked_by__isnull=False).exists()
+    assert bulk_events == [('release', 2)]
+    assert set(BookingEvent.objects.values_list('slot_id', 'user_id', 'action', 'outcome')) == {
+        (slot_id, user_id, BookingEvent.RELEASE, BookingEvent.OK) for slot_id, user_id in booked.items()
+    }
+
+
+@pytest.mark.django_db
+def test_shift_slots(week_of_slots, bulk_events):
+    """ Shifting moves both ends of each selected slot. """
+    first = week_of_slots[0]
+    count = bulk.shift_slots(TimeSlot.objects.filter(pk=first.pk), timedelta(minutes=-30))
+
+    assert count == 1
+    first_before = (first.start_time, first.end_time)
+    first.refresh_from_db()
+    assert first.start_time == first_before[0] - timedelta(minutes=30)
+    assert first.end_time == first_before[1] - timedelta(minutes=30)
+    assert bulk_events == [('shift', 1)]
+
+
+@pytest.mark.django_db
+def test_clone_to_weeks_is_one_insert_and_idempotent(week_of_slots, test_category, bulk_events):
+    """ Cloning inserts unbooked copies for each week and skips existing ones. """
+    with CaptureQueriesContext(connection) as queries:
+        count = bulk.clone_to_weeks(TimeSlot.objects.all(), weeks=2)
+
+    inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+    assert count == 10
+    assert len(inserts) == 1
+    assert TimeSlot.objects.count() == 15
+
+    for slot in week_of_slots:
+        for week in (1, 2):
+            clone = TimeSlot.objects.get(category=test_category, start_time=slot.start_time + timedelta(weeks=week))
+            assert clone.end_time == slot.end_time + timedelta(weeks=week)
+            assert clone.booked_by is None
+
+    # Re-running the same clone creates nothing.
+    originals = TimeSlot.objects.filter(pk__in=[s.pk for s in week_of_slots])
+    assert bulk.clone_to_weeks(originals, weeks=2) == 0
+
+    # Cloning everything one week ahead only adds week three once, not once per source.
+    assert bulk.clone_to_weeks(TimeSlot.objects.all(), weeks=1) == 5
+    assert bulk_events == [('clone', 10), ('clone', 5)]
+
+
+@pytest.mark.django_db
+def test_reassign_category(week_of_slots, bulk_events):
+    """ Reassigning moves the selection to the new category. """
+    new_category = Category.objects.create(name='Moved Cat')
+    count = bulk.reassign_category(TimeSlot.objects.filter(pk__in=[s.pk for s in week_of_slots[:3]]), new_category)
+
+    assert count == 3
+    assert TimeSlot.objects.filter(category=new_category).count() == 3
+    assert bulk_events == [('reassign', 3)]
+
+
+@pytest.mark.django_db
+def test_no_signal_when_nothing_changed(week_of_slots, bulk_events):
+    """ The hook does not fire for empty selections. """
+    assert bulk.release_bookings(TimeSlot.objects.none()) == 0
+    assert bulk_events == []
+
+
+@pytest.mark.django_db
+def test_admin_shift_action(admin_client, week_of_slots):
+    """ The admin action reads its offset from the action form. """
+    url = reverse('admin:api_timeslot_changelist')
+    first = week_of_slots[0]
+    response = admin_client.post(url, {
+        'action': 'shift_slots',
+        '_selected_action': [first.pk],
+        'offset_minutes': 60,
+    }, follow=True)
+
+    assert response.status_code == 200
+    assert 'Shifted 1 time slot(s) by 60 minute(s).' in response.content.decode()
+    original_start = first.start_time
+    first.refresh_from_db()
+    assert first.start_time == original_start + timedelta(hours=1)
+
+
+@pytest.mark.django_db
+def test_admin_release_action(admin_client, week_of_slots):
+    """ Releasing from the admin reports the affected count. """
+    url = reverse('admin:api_timeslot_changelist')
+    response = admin_client.post(url, {
+        'action': 'release_bookings',
+        '_selected_action': [s.pk for s in week_of_slots],
+    }, follow=True)
+
+    assert 'Released 2 booking(s).' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_management_commands(week_of_slots, test_category):
+    """ Commands select by category and report counts. """
+    out = StringIO()
+    call_command('release_bookings', '--category', str(test_category.pk), stdout=out)
+    assert 'Released 2 booking(s).' in out.getvalue()
+
+    out = StringIO()
+    call_command('clone_timeslots', '--category', str(test_category.pk), '--weeks', '1', stdout=out)
+    assert 'Created 5 time slot(s) over 1 week(s).' in out.getvalue()
+
+    target = Category.objects.create(name='Target Cat')
+    out = StringIO()
+    call_command('reassign_timeslots', '--ids', str(week_of_slots[0].pk), '--to-category', str(target.pk), stdout=out)
+    assert 'Moved 1 time slot(s) to Target Cat.' in out.getvalue()
+
+    out = StringIO()
+    call_command('shift_timeslots', '--category', str(target.pk), '--minutes', '15', stdout=out)
+    assert 'Shifted 1 time slot(s) by 15 minute(s).' in out.getvalue()
@@ -0,0 +1,92 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from api.cache import VERSION_KEY, category_cache
+from api.models import Category, TimeSlot
+from api.serializers import TimeSlotSerializer
+
+
+@pytest.mark.django_db
+def test_category_cache_loads_once(test_category):
+    """ Repeated reads are served from memory after the first load. """
+    category_cache.all()
+    category_cache.get(999999)  # an unknown id reloads once, then is remembered as missing
+    with CaptureQueriesContext(connection) as queries:
+        assert category_cache.get(test_category.pk) == test_category
+        assert category_cache.get_many([test_category.pk, 999999]) == {test_category.pk: test_category}
+        assert category_cache.all() == [test_category]
+    assert len(queries.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_category_cache_invalidated_on_save_and_delete(test_category):
+    """ Saving or deleting a Category makes the next read reload. """
+    assert category_cache.get(test_category.pk).name == 'Shared Test Cat'
+
+    test_category.name = 'Renamed Cat'
+    test_category.save()
+    assert category_cache.get(test_category.pk).name == 'Renamed Cat'
+
+    new_category = Category.objects.create(name='Brand New Cat')
+    assert category_cache.get(new_category.pk) == new_category
+
+    new_category_pk = new_category.pk
+    new_category.delete()
+    assert category_cache.get(new_category_pk) is None
+
+
+def _created_elsewhere(name):
+    """ Like a save in another process with a per-process cache: no version change seen here. """
+    return Category.objects.bulk_create([Category(name=name, name_key=Category.normalize(name))])[0]
+
+
+@pytest.mark.django_db
+def test_category_from_another_process_reloads_once(test_category, test_timeslot):
+    """ Slots in a category this copy hasn't seen cost one reload, not a query per row. """
+    category_cache.all()
+    unseen = _created_elsewhere('Unseen Cat')
+    TimeSlot.objects.bulk_create(
+        TimeSlot(category=unseen, start_time=test_timeslot.start_time, end_time=test_timeslot.end_time)
+        for _ in range(50)
+    )
+    slots = list(TimeSlot.objects.filter(category=unseen).select_related('booked_by'))
+    with CaptureQueriesContext(connection) as queries:
+        data = TimeSlotSerializer(slots, many=True).data
+    assert len(queries.captured_queries) == 1
+    assert {row['category']['name'] for row in data} == {'Unseen Cat'}
+
+
+@pytest.mark.django_db
+def test_category_cache_reloads_after_ttl(settings, test_category):
+    category_cache.all()
+    Category.objects.filter(pk=test_category.pk).update(name='Renamed Elsewhere')
+    assert category_cache.get(test_category.pk).name == 'Shared Test Cat'
+    settings.CATEGORY_CACHE_TTL = 0
+    assert category_cache.get(test_category.pk).name == 'Renamed Elsewhere'
+
+
+@pytest.mark.django_db
+def test_evicted_version_makes_every_copy_reload(test_category):
+    """ A fresh token after eviction never equals one a process already holds. """
+    category_cache.all()
+    Category.objects.filter(pk=test_category.pk).update(name='Renamed Elsewhere')
+    cache.delete(VERSION_KEY)
+    assert category_cache.get(test_category.pk).name == 'Renamed Elsewhere'
+
+
+@pytest.mark.django_db
+def test_serializer_checks_cache_version_once(monkeypatch, test_category, test_timeslot):
+    """ Serializing many rows costs one version lookup, not one per row. """
+    TimeSlot.objects.bulk_create(
+        TimeSlot(category=test_category, start_time=test_timeslot.start_time, end_time=test_timeslot.end_time)
+        for _ in range(50)
+    )
+    slots = list(TimeSlot.objects.select_related('booked_by'))
+    category_cache.all()
+    lookups = []
+    real_get = cache.get
+    monkeypatch.setattr(cache, 'get', lambda key, *args, **kwargs: lookups.append(key) or real_get(key, *args, **kwargs))
+    data = TimeSlotSerializer(slots, many=True).data
+    assert len(data) == 51
+    assert lookups == [VERSION_KEY]
@@ -0,0 +1,83 @@
+import pytest
+from django.urls import reverse
+from api.models import Category
+
+URL = reverse('category-list')
+
+
+@pytest.fixture
+def catalog(db):
+    names = ['Yoga', 'yoga nidra', 'Pilates', 'YOGA Flow', 'Yogalates', 'Straße', 'Spin']
+    return {name: Category.objects.create(name=name) for name in names}
+
+
+@pytest.fixture
+def client(api_client, test_user):
+    api_client.force_authenticate(user=test_user)
+    return api_client
+
+
+def _names(response):
+    assert response.status_code == 200, response.data
+    return [category['name'] for category in response.data['results']]
+
+
+@pytest.mark.django_db
+def test_prefix_search_is_case_insensitive_and_ordered_by_name(client, catalog):
+    assert _names(client.get(URL, {'q': 'yOgA'})) == ['Yoga', 'YOGA Flow', 'yoga nidra', 'Yogalates']
+    assert _names(client.get(URL, {'q': ' yoga n '})) == ['yoga nidra']
+    assert _names(client.get(URL, {'q': 'STRASSE'})) == ['Straße']
+    assert _names(client.get(URL, {'q': 'oga'})) == []
+
+
+@pytest.mark.django_db
+def test_search_pages_with_a_cursor(client, catalog):
+    seen = []
+    params = {'limit': 3}
+    while True:
+        response = client.get(URL, params)
+        assert set(response.data) == {'results', 'next'}
+        seen += _names(response)
+        if response.data['next'] is None:
+            break
+        params['cursor'] = response.data['next']
+    assert seen == sorted(catalog, key=Category.normalize)
+    assert all(set(category) == {'id', 'name'} for category in client.get(URL, {'q': ''}).data['results'])
+
+
+@pytest.mark.django_db
+def test_cursor_keeps_order_among_equal_names(client, catalog):
+    """ Ties on name_key are broken by id, so no row is skipped or repeated. """
+    Category.objects.filter(name__istartswith='yoga').update(name_key='yoga')
+    first = client.get(URL, {'q': 'yoga', 'limit': 1})
+    second = client.get(URL, {'q': 'yoga', 'limit': 10, 'cursor': first.data['next']})
+    assert _names(first) + _names(second) == ['Yoga', 'yoga nidra', 'YOGA Flow', 'Yogalates']
+
+
+@pytest.mark.django_db
+def test_plain_list_is_unchanged(client, catalog):
+    response = client.get(URL)
+    assert [category['name'] for category in response.data] == list(catalog)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params, field', [
+    ({'limit': 'ten'}, 'limit'),
+    ({'limit': 0}, 'limit'),
+    ({'limit': 101}, 'limit'),
+    ({'cursor': 'not-a-cursor'}, 'cursor'),
+    ({'cursor': 'WyJhIl0'}, 'cursor'),  # ["a"]
+])
+def test_bad_parameters_are_rejected(client, params, field):
+    response = client.get(URL, params)
+    assert response.status_code == 400
+    assert field in response.data
+
+
+@pytest.mark.django_db
+def test_name_key_follows_renames(catalog):
+    category = catalog['Spin']
+    category.name = 'SPINNING'
+    category.save(update_fields=['name'])
+    category.refresh_from_db()
+    assert category.name_key == 'spinning'
@@ -0,0 +1,109 @@
+import gzip
+import json
+import pytest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from api import compression
+from api.middleware import CompressionMiddleware
+from api.models import TimeSlot
+from datetime import timedelta
+
+BIG_PAYLOAD = [{'id': i, 'category': {'id': 1, 'name': 'Yoga'}, 'is_booked': False} for i in range(200)]
+
+
+def _run(response, accept_encoding='gzip'):
+    request = RequestFactory().get('/api/timeslots/', HTTP_ACCEPT_ENCODING=accept_encoding)
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip', 'gzip'),
+    ('gzip, deflate, br, zstd', 'zstd' if compression.zstandard else ('br' if compression.brotli else 'gzip')),
+    ('br;q=0.5, gzip;q=0.9', 'gzip'),
+    ('gzip;q=0', None),
+    ('identity', None),
+    ('*', 'zstd' if compression.zstandard else ('br' if compression.brotli else 'gzip')),
+    ('', None),
+])
+def test_negotiate(header, expected):
+    """ Highest q-value wins; ties go to the server's preference order. """
+    codec = compression.negotiate(header)
+    assert (codec.name if codec else None) == expected
+
+
+def test_json_response_gzipped():
+    """ Large JSON responses are compressed and marked as varying on Accept-Encoding. """
+    response = _run(JsonResponse(BIG_PAYLOAD, safe=False))
+
+    assert response['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response['Vary']
+    assert int(response['Content-Length']) == len(response.content)
+    assert json.loads(gzip.decompress(response.content)) == BIG_PAYLOAD
+
+
+def test_small_and_html_responses_untouched():
+    """ Below the size threshold, or non-JSON content, nothing is compressed. """
+    small = _run(JsonResponse({'ok': True}))
+    assert not small.has_header('Content-Encoding')
+
+    html = _run(HttpResponse('<p>csrf</p>' * 500, content_type='text/html'))
+    assert not html.has_header('Content-Encoding')
+
+
+def test_streaming_response_compressed_incrementally():
+    """ Iterator-based responses are compressed chunk by chunk. """
+    chunks = [json.dumps(row).encode() + b'\n' for row in BIG_PAYLOAD]
+    response = _run(StreamingHttpResponse(iter(chunks), content_type='application/json'))
+
+    assert response['Content-Encoding'] == 'gzip'
+    assert not response.has_header('Content-Length')
+    assert gzip.decompress(b''.join(response.streaming_content)) == b''.join(chunks)
+
+
+@pytest.mark.parametrize('name', ['gzip', 'br', 'zstd'])
+def test_streaming_flushes_in_blocks_not_per_chunk(name):
+    """ Row-sized chunks compress about as well as the whole body at once. """
+    codec = compression.CODECS[name]
+    if not codec.available:
+        pytest.skip(f'{name} is not installed')
+    rows = [f'2030-03-04,{i},Category {i % 40},{i % 7},{i % 5},0,0.5000\r\n'.encode() for i in range(10_000)]
+    body = b''.join(rows)
+    compressor = codec.compressor()
+    parts = [compressor.compress(row) for row in rows]
+    streamed = b''.join(parts) + compressor.finish()
+
+    assert len(streamed) < len(codec.compress(body)) * 1.2
+    # Still delivered progressively: output appears at least every STREAM_FLUSH_SIZE bytes of input.
+    assert sum(1 for part in parts if part) >= len(body) // compression.STREAM_FLUSH_SIZE
+
+
+@pytest.mark.parametrize('name, module', [('br', 'brotli'), ('zstd', 'zstandard')])
+def test_optional_codecs(name, module):
+    """ Brotli and zstd are used when their packages are installed. """
+    lib = pytest.importorskip(module)
+    response = _run(JsonResponse(BIG_PAYLOAD, safe=False), accept_encoding=name)
+
+    assert response['Content-Encoding'] == name
+    if name == 'br':
+        body = lib.decompress(response.content)
+    else:
+        body = lib.ZstdDecompressor().decompressobj().decompress(response.content)
+    assert json.loads(body) == BIG_PAYLOAD
+
+
+@pytest.mark.django_db
+def test_timeslot_list_compressed_end_to_end(api_client, test_user_with_profile, test_category):
+    """ A dense week listing comes back gzipped through the full middleware stack. """
+    now = timezone.now()
+    TimeSlot.objects.bulk_create([
+        TimeSlot(category=test_category, start_time=now + timedelta(hours=i), end_time=now + timedelta(hours=i, minutes=30))
+        for i in range(50)
+    ])
+    api_client.force_authenticate(user=test_user_with_profile)
+    response = api_client.get(reverse('timeslot-list'), HTTP_ACCEPT_ENCODING='gzip')
+
+    assert response.status_code == 200
+    assert response['Content-Encoding'] == 'gzip'
+    assert len(json.loads(gzip.decompress(response.content))) == 50
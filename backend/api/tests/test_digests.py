@@ -0,0 +1,139 @@
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from api.digests import send_new_slot_digests
+from api.models import Category, DigestWatermark, TimeSlot
+from datetime import timedelta
+from io import StringIO
+
+User = get_user_model()
+
+
+def _subscriber(username, *categories):
+    user = User.objects.create_user(username=username, email=f'{username}@example.com', password='password')
+    user.profile.interested_categories.add(*categories)
+    return user
+
+
+def _new_slot(category, hours):
+    start = timezone.now() + timedelta(hours=hours)
+    return TimeSlot.objects.create(category=category, start_time=start, end_time=start + timedelta(hours=1))
+
+
+@pytest.fixture
+def initialised_watermark(db):
+    """ The first run only records the starting point. """
+    send_new_slot_digests()
+    return DigestWatermark.objects.get()
+
+
+@pytest.mark.django_db
+def test_first_run_does_not_mail_history(test_category):
+    """ Slots existing before the first run are not announced. """
+    _subscriber('alice', test_category)
+    slot = _new_slot(test_category, 5)
+
+    stats = send_new_slot_digests()
+
+    assert stats['users'] == 0
+    assert len(mail.outbox) == 0
+    assert DigestWatermark.objects.get().last_slot_id == slot.id
+
+
+@pytest.mark.django_db
+def test_digest_grouped_per_user(initialised_watermark, test_category):
+    """ Each user gets one email listing only slots in their categories. """
+    other_cat = Category.objects.create(name='Other Cat')
+    _subscriber('alice', test_category)
+    _subscriber('bob', test_category, other_cat)
+    _subscriber('carol')  # no interests
+    User.objects.create_user(username='noemail', password='password').profile.interested_categories.add(test_category)
+
+    _new_slot(test_category, 5)
+    _new_slot(other_cat, 6)
+    _new_slot(test_category, -5)  # already started, not announced
+
+    stats = send_new_slot_digests()
+
+    assert stats == {'users': 2, 'slots': 3, 'resumed': False}
+    by_recipient = {m.to[0]: m for m in mail.outbox}
+    assert set(by_recipient) == {'alice@example.com', 'bob@example.com'}
+    assert 'Other Cat' not in by_recipient['alice@example.com'].body
+    assert by_recipient['bob@example.com'].subject.startswith('2 new time slot(s)')
+
+    # Nothing new: nothing sent.
+    mail.outbox.clear()
+    assert send_new_slot_digests()['users'] == 0
+    assert mail.outbox == []
+
+
+@pytest.mark.django_db
+def test_digest_query_count_independent_of_users(initialised_watermark, test_category):
+    """ Finding recipients is one joined query, not one per user or category. """
+    for i in range(20):
+        _subscriber(f'user{i}', test_category)
+    _new_slot(test_category, 5)
+
+    with CaptureQueriesContext(connection) as queries:
+        send_new_slot_digests(batch_size=5)
+
+    selects = [q for q in queries.captured_queries if 'api_userprofile_interested_categories' in q['sql']]
+    assert len(selects) == 1
+    assert len(mail.outbox) == 20
+
+
+class FailingConnection:
+    """ Mail connection that fails on the Nth send_messages call. """
+    def __init__(self, fail_on):
+        self.calls = 0
+        self.fail_on = fail_on
+        self.sent = []
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+    def send_messages(self, messages):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise ConnectionError('SMTP went away')
+        self.sent.extend(m.to[0] for m in messages)
+        return len(messages)
+
+
+@pytest.mark.django_db
+def test_interrupted_run_resumes_without_resending(initialised_watermark, test_category):
+    """ A crash mid-run continues after the last completed batch. """
+    users = [_subscriber(f'user{i}', test_category) for i in range(5)]
+    _new_slot(test_category, 5)
+
+    failing = FailingConnection(fail_on=2)
+    with pytest.raises(ConnectionError):
+        send_new_slot_digests(batch_size=2, connection=failing)
+    assert failing.sent == ['user0@example.com', 'user1@example.com']
+
+    # A slot created after the crash belongs to the next run, not the resumed one.
+    _new_slot(test_category, 7)
+
+    stats = send_new_slot_digests(batch_size=2)
+    assert stats == {'users': 3, 'slots': 3, 'resumed': True}
+    assert sorted(m.to[0] for m in mail.outbox) == [u.email for u in users[2:]]
+
+    mail.outbox.clear()
+    assert send_new_slot_digests()['users'] == 5
+
+
+@pytest.mark.django_db
+def test_send_slot_digests_command(initialised_watermark, test_category):
+    """ The command reports what it sent. """
+    _subscriber('alice', test_category)
+    _new_slot(test_category, 5)
+
+    out = StringIO()
+    call_command('send_slot_digests', '--batch-size', '10', stdout=out)
+
+    assert 'Sent 1 digest(s) covering 1 slot notification(s).' in out.getvalue()
+    assert len(mail.outbox) == 1
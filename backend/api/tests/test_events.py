@@ -0,0 +1,150 @@
+import pytest
+import time
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from api.events import booking_events
+from api.models import BookingEvent, TimeSlot
+
+
+def _events():
+    return list(BookingEvent.objects.values_list('slot_id', 'user_id', 'action', 'outcome'))
+
+
+@pytest.mark.django_db
+def test_book_and_unbook_attempts_are_logged(api_client, test_user_with_profile, other_user, test_timeslot):
+    """ Successful and rejected attempts both end up in the log, once flushed. """
+    book = reverse('timeslot-book', kwargs={'pk': test_timeslot.pk})
+    unbook = reverse('timeslot-unbook', kwargs={'pk': test_timeslot.pk})
+    api_client.force_authenticate(user=test_user_with_profile)
+    assert api_client.post(book).status_code == 200
+    api_client.force_authenticate(user=other_user)
+    assert api_client.post(book).status_code == 400
+    assert api_client.post(unbook).status_code == 403
+    api_client.force_authenticate(user=test_user_with_profile)
+    assert api_client.post(unbook).status_code == 200
+
+    assert BookingEvent.objects.count() == 0
+    assert booking_events.flush() == 4
+    slot, owner, other = test_timeslot.pk, test_user_with_profile.pk, other_user.pk
+    assert _events() == [
+        (slot, owner, 'book', 'ok'),
+        (slot, other, 'book', 'already_booked'),
+        (slot, other, 'unbook', 'not_owner'),
+        (slot, owner, 'unbook', 'ok'),
+    ]
+
+
+@pytest.mark.django_db
+def test_conflicting_booking_is_logged(api_client, test_user_with_profile, booked_by_test_user_timeslot, test_category):
+    overlapping = TimeSlot.objects.create(
+        category=test_category,
+        start_time=booked_by_test_user_timeslot.start_time,
+        end_time=booked_by_test_user_timeslot.end_time,
+    )
+    api_client.force_authenticate(user=test_user_with_profile)
+    assert api_client.post(reverse('timeslot-book', kwargs={'pk': overlapping.pk})).status_code == 400
+    booking_events.flush()
+    assert _events() == [(overlapping.pk, test_user_with_profile.pk, 'book', 'conflict')]
+
+
+@pytest.mark.django_db
+def test_throttled_attempt_is_logged(booking_rates, api_client, test_user_with_profile, test_timeslot):
+    api_client.force_authenticate(user=test_user_with_profile)
+    url = reverse('timeslot-unbook', kwargs={'pk': test_timeslot.pk})
+    for _ in range(4):
+        api_client.post(url)
+    booking_events.flush()
+    assert [outcome for *_, outcome in _events()] == ['not_owner'] * 3 + ['throttled']
+
+
+@pytest.mark.django_db
+def test_recording_is_free_and_flush_is_one_insert(test_user, test_timeslot):
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(50):
+            booking_events.record(slot_id=test_timeslot.pk, user_id=test_user.pk, action='book', outcome='ok')
+    assert len(queries.captured_queries) == 0
+    assert booking_events.pending() == 50
+
+    with CaptureQueriesContext(connection) as queries:
+        assert booking_events.flush() == 50
+    assert sum('INSERT' in q['sql'] for q in queries.captured_queries) == 1
+    assert BookingEvent.objects.count() == 50
+
+
+@pytest.mark.django_db
+def test_full_buffer_flushes_without_interval(settings, test_user, test_timeslot):
+    settings.BOOKING_EVENT_BUFFER_SIZE = 3
+    for _ in range(2):
+        booking_events.record(slot_id=test_timeslot.pk, user_id=test_user.pk, action='book', outcome='ok')
+    assert BookingEvent.objects.count() == 0
+    booking_events.record(slot_id=test_timeslot.pk, user_id=test_user.pk, action='book', outcome='ok')
+    assert BookingEvent.objects.count() == 3
+    assert booking_events.pending() == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_background_thread_flushes_after_interval(settings, test_user, test_timeslot):
+    settings.BOOKING_EVENT_FLUSH_INTERVAL = 0.05
+    booking_events.record(slot_id=test_timeslot.pk, user_id=test_user.pk, action='book', outcome='ok')
+    deadline = time.monotonic() + 5
+    while booking_events.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert booking_events.pending() == 0
+    deadline = time.monotonic() + 5
+    while not BookingEvent.objects.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert BookingEvent.objects.count() == 1
+
+
+def _locked_once(monkeypatch):
+    """ Make the next bulk_create fail like SQLite under write contention. """
+    real_bulk_create = BookingEvent.objects.bulk_create
+    calls = []
+
+    def bulk_create(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise OperationalError('database is locked')
+        return real_bulk_create(*args, **kwargs)
+    monkeypatch.setattr(BookingEvent.objects, 'bulk_create', bulk_create)
+
+
+@pytest.mark.django_db
+def test_failed_flush_keeps_rows_for_a_retry(settings, monkeypatch, test_user, test_timeslot):
+    settings.BOOKING_EVENT_RETRY_DELAY = 0
+    _locked_once(monkeypatch)
+    for _ in range(3):
+        booking_events.record(slot_id=test_timeslot.pk, user_id=test_user.pk, action='book', outcome='ok')
+
+    assert booking_events.flush() == 0
+    assert booking_events.pending() == 3
+    booking_events.record(slot_id=test_timeslot.pk, user_id=test_user.pk, action='unbook', outcome='ok')
+    assert booking_events.drain() == 4
+    assert list(BookingEvent.objects.order_by('id').values_list('action', flat=True)) == ['book'] * 3 + ['unbook']
+
+
+@pytest.mark.django_db
+def test_flush_gives_up_after_bounded_retries(settings, monkeypatch, test_user, test_timeslot):
+    settings.BOOKING_EVENT_FLUSH_RETRIES = 2
+    settings.BOOKING_EVENT_RETRY_DELAY = 0
+    attempts = []
+
+    def locked(*args, **kwargs):
+        attempts.append(1)
+        raise OperationalError('database is locked')
+    monkeypatch.setattr(BookingEvent.objects, 'bulk_create', locked)
+    booking_events.record(slot_id=test_timeslot.pk, user_id=test_user.pk, action='book', outcome='ok')
+
+    assert booking_events.drain() == 0
+    assert len(attempts) == 3
+    assert booking_events.pending() == 0
+
+
+@pytest.mark.django_db
+def test_events_survive_slot_deletion(test_user, test_timeslot):
+    booking_events.record(slot_id=test_timeslot.pk, user_id=test_user.pk, action='book', outcome='ok')
+    booking_events.flush()
+    slot_id = test_timeslot.pk
+    test_timeslot.delete()
+    assert BookingEvent.objects.filter(slot_id=slot_id).count() == 1
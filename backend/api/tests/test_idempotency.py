@@ -0,0 +1,147 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from api.models import IdempotencyRecord
+from datetime import timedelta
+from io import StringIO
+
+
+@pytest.mark.django_db
+def test_book_retry_replays_original_response(api_client, test_user_with_profile, test_timeslot):
+    """ A retried booking returns the first success instead of 'already booked'. """
+    api_client.force_authenticate(user=test_user_with_profile)
+    url = reverse('timeslot-book', kwargs={'pk': test_timeslot.pk})
+
+    first = api_client.post(url, HTTP_IDEMPOTENCY_KEY='retry-1')
+    assert first.status_code == 200
+
+    with CaptureQueriesContext(connection) as queries:
+        retry = api_client.post(url, HTTP_IDEMPOTENCY_KEY='retry-1')
+
+    assert retry.status_code == 200
+    assert retry['Idempotent-Replayed'] == 'true'
+    assert retry.json() == first.json()
+    assert not any('api_timeslot' in q['sql'] for q in queries.captured_queries)
+    assert len(queries.captured_queries) == 1
+
+    # Without the key the second attempt is a genuine duplicate.
+    assert api_client.post(url).status_code == 400
+
+
+@pytest.mark.django_db
+def test_idempotency_keys_are_per_user(api_client, test_user_with_profile, other_user, test_timeslot):
+    """ The same key from another user is a different request. """
+    url = reverse('timeslot-book', kwargs={'pk': test_timeslot.pk})
+    api_client.force_authenticate(user=test_user_with_profile)
+    assert api_client.post(url, HTTP_IDEMPOTENCY_KEY='shared').status_code == 200
+
+    api_client.force_authenticate(user=other_user)
+    response = api_client.post(url, HTTP_IDEMPOTENCY_KEY='shared')
+    assert response.status_code == 400
+    assert 'already booked' in response.data['detail'].lower()
+
+
+@pytest.mark.django_db
+def test_idempotency_key_reused_for_other_request(api_client, test_user_with_profile, test_timeslot):
+    """ Reusing a key on a different endpoint is rejected. """
+    api_client.force_authenticate(user=test_user_with_profile)
+    api_client.post(reverse('timeslot-book', kwargs={'pk': test_timeslot.pk}), HTTP_IDEMPOTENCY_KEY='k1')
+    response = api_client.post(reverse('timeslot-unbook', kwargs={'pk': test_timeslot.pk}), HTTP_IDEMPOTENCY_KEY='k1')
+
+    assert response.status_code == 422
+    test_timeslot.refresh_from_db()
+    assert test_timeslot.booked_by == test_user_with_profile
+
+
+@pytest.mark.django_db
+def test_idempotency_key_in_progress(api_client, test_user_with_profile, test_timeslot):
+    """ A retry arriving while the original is still running gets 409. """
+    url = reverse('timeslot-book', kwargs={'pk': test_timeslot.pk})
+    IdempotencyRecord.objects.create(
+        user=test_user_with_profile, key='slow', fingerprint=f'POST {url}', expires_at=timezone.now() + timedelta(hours=1)
+    )
+    api_client.force_authenticate(user=test_user_with_profile)
+
+    assert api_client.post(url, HTTP_IDEMPOTENCY_KEY='slow').status_code == 409
+
+
+@pytest.mark.django_db
+def test_stale_claim_is_taken_over(api_client, test_user_with_profile, test_timeslot):
+    """ A claim whose request died is not a 409 until the key expires: a retry runs the view. """
+    url = reverse('timeslot-book', kwargs={'pk': test_timeslot.pk})
+    now = timezone.now()
+    IdempotencyRecord.objects.create(
+        user=test_user_with_profile, key='crashed', fingerprint=f'POST {url}',
+        claimed_at=now - timedelta(minutes=5), expires_at=now + timedelta(hours=1)
+    )
+    api_client.force_authenticate(user=test_user_with_profile)
+
+    response = api_client.post(url, HTTP_IDEMPOTENCY_KEY='crashed')
+    assert response.status_code == 200
+    assert IdempotencyRecord.objects.get(key='crashed').status_code == 200
+    retry = api_client.post(url, HTTP_IDEMPOTENCY_KEY='crashed')
+    assert retry['Idempotent-Replayed'] == 'true'
+
+
+@pytest.mark.django_db
+def test_replay_is_not_throttled(settings, api_client, test_user_with_profile, test_timeslot):
+    """ Retries of a completed request get the stored response even once the bucket is empty. """
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {'booking': '1/min', 'booking_global': '100/min'},
+    }
+    api_client.force_authenticate(user=test_user_with_profile)
+    url = reverse('timeslot-book', kwargs={'pk': test_timeslot.pk})
+    assert api_client.post(url, HTTP_IDEMPOTENCY_KEY='once').status_code == 200
+
+    for _ in range(3):
+        retry = api_client.post(url, HTTP_IDEMPOTENCY_KEY='once')
+        assert retry.status_code == 200
+        assert retry['Idempotent-Replayed'] == 'true'
+    assert api_client.post(url, HTTP_IDEMPOTENCY_KEY='new').status_code == 429
+
+
+@pytest.mark.django_db
+def test_throttled_request_with_fresh_key_costs_no_queries(booking_rates, api_client, test_user_with_profile, test_timeslot):
+    """ Only a key with a stored response is looked up once the throttle has said no. """
+    api_client.force_authenticate(user=test_user_with_profile)
+    url = reverse('timeslot-unbook', kwargs={'pk': test_timeslot.pk})
+    for attempt in range(3):
+        assert api_client.post(url, HTTP_IDEMPOTENCY_KEY=f'attempt-{attempt}').status_code == 403
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.post(url, HTTP_IDEMPOTENCY_KEY='fresh')
+    assert response.status_code == 429
+    assert len(queries.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_expired_idempotency_key_runs_again(api_client, test_user_with_profile, test_timeslot):
+    """ After the TTL a key is treated as new. """
+    url = reverse('timeslot-book', kwargs={'pk': test_timeslot.pk})
+    IdempotencyRecord.objects.create(
+        user=test_user_with_profile, key='old', fingerprint=f'POST {url}', status_code=400,
+        response_body={'detail': 'stale'}, expires_at=timezone.now() - timedelta(seconds=1)
+    )
+    api_client.force_authenticate(user=test_user_with_profile)
+
+    response = api_client.post(url, HTTP_IDEMPOTENCY_KEY='old')
+    assert response.status_code == 200
+    assert IdempotencyRecord.objects.get(key='old').status_code == 200
+
+
+@pytest.mark.django_db
+def test_purge_idempotency_keys_command(test_user):
+    """ The purge command removes only expired records. """
+    now = timezone.now()
+    IdempotencyRecord.objects.create(user=test_user, key='a', fingerprint='x', expires_at=now - timedelta(hours=1))
+    IdempotencyRecord.objects.create(user=test_user, key='b', fingerprint='x', expires_at=now + timedelta(hours=1))
+
+    out = StringIO()
+    call_command('purge_idempotency_keys', stdout=out)
+
+    assert 'Deleted 1 expired' in out.getvalue()
+    assert list(IdempotencyRecord.objects.values_list('key', flat=True)) == ['b']
@@ -0,0 +1,91 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from api import profiling
+from api.middleware import ProfilingMiddleware
+
+User = get_user_model()
+
+
+@pytest.fixture
+def staff_user(db):
+    return User.objects.create_user(username='staffer', password='password', is_staff=True)
+
+
+def _token_client(api_client, user):
+    api_client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+    return api_client
+
+
+@pytest.mark.django_db
+def test_staff_request_is_profiled_and_report_downloadable(settings, api_client, staff_user, test_timeslot):
+    settings.REQUEST_PROFILING_TOP = 1000
+    client = _token_client(api_client, staff_user)
+    url = reverse('timeslot-detail', args=[test_timeslot.pk])
+
+    response = client.get(url, HTTP_X_PROFILE='1')
+    assert response.status_code == 200
+    assert response.json()['id'] == test_timeslot.pk  # the real response is untouched
+    report_id = response['X-Profile-Id']
+
+    report = client.get(reverse('profile-report', args=[report_id])).json()
+    assert report['path'] == url and report['status'] == 200
+    assert any('get_queryset' in row['function'] for row in report['functions'])
+    assert report['allocations']
+    assert report['sql']['count'] == len(report['sql']['queries']) >= 2
+    assert any('api_timeslot' in query['sql'] for query in report['sql']['queries'])
+
+
+@pytest.mark.django_db
+def test_inline_report_via_query_flag(api_client, staff_user):
+    client = _token_client(api_client, staff_user)
+    response = client.get(reverse('category-list'), {'_profile': 'inline'})
+    assert response.status_code == 200
+    report = response.json()
+    assert report['status'] == 200 and 'functions' in report
+    assert 'X-Profile-Id' not in response
+
+
+@pytest.mark.django_db
+def test_session_authenticated_staff_can_profile(admin_client):
+    response = admin_client.get(reverse('category-list'), HTTP_X_PROFILE='inline')
+    # The admin session isn't accepted by the API (token only), but the profile still records the 401.
+    assert response.json()['status'] == 401
+
+
+@pytest.mark.django_db
+def test_flag_is_ignored_for_non_staff(api_client, test_user, test_timeslot):
+    client = _token_client(api_client, test_user)
+    response = client.get(reverse('timeslot-detail', args=[test_timeslot.pk]), HTTP_X_PROFILE='inline')
+    assert response.status_code == 200
+    assert response.json()['id'] == test_timeslot.pk
+    assert 'X-Profile-Id' not in response
+    assert client.get(reverse('profile-report', args=['anything'])).status_code == 403
+
+    bad_token = APIClient(HTTP_AUTHORIZATION='Token bogus')
+    assert bad_token.get(reverse('category-list'), HTTP_X_PROFILE='1').status_code == 401
+
+
+@pytest.mark.django_db
+def test_unflagged_requests_skip_the_profiler(api_client, staff_user, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('profiler should not run')
+    monkeypatch.setattr(profiling, 'is_staff_request', fail)
+    monkeypatch.setattr(profiling, 'profile_request', fail)
+    client = _token_client(api_client, staff_user)
+    assert client.get(reverse('category-list')).status_code == 200
+
+
+@pytest.mark.django_db
+def test_unknown_report_is_404(api_client, staff_user):
+    client = _token_client(api_client, staff_user)
+    assert client.get(reverse('profile-report', args=['missing'])).status_code == 404
+
+
+def test_middleware_removed_when_disabled(settings):
+    settings.REQUEST_PROFILING_ENABLED = False
+    with pytest.raises(MiddlewareNotUsed):
+        ProfilingMiddleware(lambda request: None)
@@ -0,0 +1,205 @@
+"""
+Query budgets per API endpoint.
+
+Each test runs one request at 1, 100 and 10,000 rows of the data it reads and
+fails if the request issues more SQL queries than its budget, or if the count
+changes with the number of rows (an N+1 query). Requests authenticate with a
+real token, so the token lookup is part of every budget. When a change
+legitimately adds a query, raise the budget in the same commit.
+"""
+import pytest
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from api.cache import category_cache
+from api.models import Category, TimeSlot, UserProfile
+from api.views import _encode_cursor
+from query_budget import assert_query_budget
+
+User = get_user_model()
+
+
+class Rows:
+    """ Tops tables up to a given row count with bulk inserts.
+
+    bulk_create() skips the signals that invalidate the category cache, so it
+    is reloaded here; measured requests then see a warm cache, as in steady
+    state. """
+    def __init__(self):
+        self.base = timezone.now() + timedelta(hours=1)
+
+    def categories(self, count):
+        budget_categories = Category.objects.filter(name__startswith='Budget category ')
+        existing = budget_categories.count()
+        names = [f'Budget category {i}' for i in range(existing, count)]
+        Category.objects.bulk_create(Category(name=name, name_key=Category.normalize(name)) for name in names)
+        category_cache.invalidate()
+        category_cache.all()
+        return list(budget_categories.order_by('pk')[:count])
+
+    def users(self, count):
+        existing = User.objects.filter(username__startswith='budget-user-').count()
+        created = User.objects.bulk_create(
+            User(username=f'budget-user-{i}', password='!') for i in range(existing, count)
+        )
+        UserProfile.objects.bulk_create(UserProfile(user=user) for user in created)
+        return list(User.objects.filter(username__startswith='budget-user-').order_by('pk')[:count])
+
+    def timeslots(self, count, booked_by=None):
+        """ `count` slots within the next week, spread over categories and (if given) users. """
+        existing = TimeSlot.objects.count()
+        categories = self.categories(min(count, 100))
+        slots = []
+        for i in range(existing, count):
+            start = self.base + timedelta(seconds=30 * i)
+            slots.append(TimeSlot(
+                category=categories[i % len(categories)],
+                start_time=start,
+                end_time=start + timedelta(seconds=30),
+                booked_by=booked_by[i % len(booked_by)] if booked_by and i % 2 else None,
+            ))
+        TimeSlot.objects.bulk_create(slots)
+
+
+@pytest.fixture
+def rows(db):
+    return Rows()
+
+
+@pytest.fixture
+def token_client(api_client, test_user_with_profile):
+    token = Token.objects.create(user=test_user_with_profile)
+    api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return api_client
+
+
+@pytest.mark.django_db
+def test_category_list_budget(token_client, rows):
+    """ Categories come from the process-local cache: only the token lookup hits the DB. """
+    url = reverse('category-list')
+    assert_query_budget(1, rows.categories, lambda _: token_client.get(url))
+
+
+@pytest.mark.django_db
+def test_category_detail_budget(token_client, rows):
+    assert_query_budget(
+        1, lambda count: rows.categories(count)[-1],
+        lambda category: token_client.get(reverse('category-detail', args=[category.pk])),
+    )
+
+
+@pytest.mark.django_db
+def test_category_search_budget(token_client, rows):
+    """ A page of prefix matches, deep in the result set, is one indexed query. """
+    def grow(count):
+        middle = rows.categories(count)[count // 2]
+        return _encode_cursor(middle.name_key, middle.pk)
+    url = reverse('category-list')
+    assert_query_budget(2, grow, lambda cursor: token_client.get(url, {'q': 'budget CAT', 'limit': 50, 'cursor': cursor}))
+
+
+@pytest.mark.django_db
+def test_timeslot_list_budget(token_client, rows):
+    """ Every slot in the week, half of them booked by different users. """
+    def grow(count):
+        rows.timeslots(count, booked_by=rows.users(min(count, 1000)))
+    url = reverse('timeslot-list')
+    params = {'start': rows.base.isoformat(), 'days': 7}
+    assert_query_budget(2, grow, lambda _: token_client.get(url, params))
+
+
+@pytest.mark.django_db
+def test_timeslot_list_sparse_budget(token_client, rows):
+    def grow(count):
+        rows.timeslots(count, booked_by=rows.users(min(count, 1000)))
+    url = reverse('timeslot-list')
+    params = {'start': rows.base.isoformat(), 'days': 7, 'fields': 'id,start_time,end_time,is_booked,category.name'}
+    assert_query_budget(2, grow, lambda _: token_client.get(url, params))
+
+
+@pytest.mark.django_db
+def test_timeslot_detail_budget(token_client, rows):
+    def grow(count):
+        rows.timeslots(count, booked_by=rows.users(min(count, 1000)))
+        return TimeSlot.objects.filter(booked_by__isnull=False).last() or TimeSlot.objects.last()
+    assert_query_budget(
+        2, grow, lambda slot: token_client.get(reverse('timeslot-detail', args=[slot.pk]))
+    )
+
+
+@pytest.mark.django_db
+def test_book_budget(token_client, rows, test_user_with_profile, test_category):
+    """ Booking a fresh slot while the user already holds `count` bookings. """
+    def grow(count):
+        rows.timeslots(count, booked_by=[test_user_with_profile])
+        start = timezone.now() + timedelta(days=30, hours=count)
+        return TimeSlot.objects.create(category=test_category, start_time=start, end_time=start + timedelta(hours=1))
+    assert_query_budget(
+        4, grow, lambda slot: token_client.post(reverse('timeslot-book', args=[slot.pk]))
+    )
+
+
+@pytest.mark.django_db
+def test_unbook_budget(token_client, rows, test_user_with_profile, test_category):
+    def grow(count):
+        rows.timeslots(count, booked_by=[test_user_with_profile])
+        start = timezone.now() + timedelta(days=30, hours=count)
+        return TimeSlot.objects.create(
+            category=test_category, start_time=start, end_time=start + timedelta(hours=1),
+            booked_by=test_user_with_profile,
+        )
+    assert_query_budget(
+        3, grow, lambda slot: token_client.post(reverse('timeslot-unbook', args=[slot.pk]))
+    )
+
+
+@pytest.mark.django_db
+def test_book_with_idempotency_key_budget(token_client, rows, test_user_with_profile, test_category):
+    def grow(count):
+        rows.timeslots(count, booked_by=[test_user_with_profile])
+        start = timezone.now() + timedelta(days=30, hours=count)
+        return TimeSlot.objects.create(category=test_category, start_time=start, end_time=start + timedelta(hours=1))
+    assert_query_budget(
+        9, grow,
+        lambda slot: token_client.post(reverse('timeslot-book', args=[slot.pk]), HTTP_IDEMPOTENCY_KEY=f'book-{slot.pk}'),
+    )
+
+
+@pytest.mark.django_db
+def test_preferences_get_budget(token_client, rows, test_user_with_profile):
+    """ A profile interested in `count` categories. """
+    def grow(count):
+        test_user_with_profile.profile.interested_categories.set(rows.categories(count))
+    url = reverse('user-preferences')
+    assert_query_budget(4, grow, lambda _: token_client.get(url))
+
+
+@pytest.mark.django_db
+def test_preferences_put_budget(token_client, rows, test_user_with_profile, test_category):
+    """ Replacing the selection while `count` categories exist. The selection
+    itself is capped at 100: beyond that SQLite splits the id lookup and the
+    M2M insert into batches (999 parameters per statement), which is bounded
+    chunking, not a per-row query. """
+    def grow(count):
+        test_user_with_profile.profile.interested_categories.set([test_category])
+        return [category.pk for category in rows.categories(count)[-100:]]
+    url = reverse('user-preferences')
+    assert_query_budget(
+        9, grow,
+        lambda ids: token_client.put(url, {'interested_category_ids': ids}, format='json'),
+    )
+
+
+@pytest.mark.django_db
+def test_login_budget(rows, test_user_with_profile):
+    """ Login cost must not depend on how many users exist. The token already
+    exists, as for any returning user; each login starts without a session. """
+    Token.objects.create(user=test_user_with_profile)
+    url = reverse('rest_login')
+    assert_query_budget(
+        10, rows.users,
+        lambda _: APIClient().post(url, {'username': test_user_with_profile.username, 'password': 'password'}, format='json'),
+    )
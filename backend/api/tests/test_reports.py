@@ -0,0 +1,122 @@
+import csv
+import io
+import pytest
+from datetime import datetime, timedelta, timezone
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+from api import bulk
+from api.models import BookingEvent, Category, TimeSlot
+from api.reports import HEADER, utilization_rows
+
+MONDAY = datetime(2030, 3, 4, 9, tzinfo=timezone.utc)
+
+
+def _slot(category, start, booked_by=None):
+    return TimeSlot.objects.create(
+        category=category, start_time=start, end_time=start + timedelta(hours=1), booked_by=booked_by,
+    )
+
+
+def _released(slot, user):
+    BookingEvent.objects.create(
+        slot=slot, user=user, action=BookingEvent.UNBOOK, outcome=BookingEvent.OK, created_at=django_timezone.now(),
+    )
+
+
+@pytest.fixture
+def report_data(db, test_user):
+    """ Two categories over two weeks, with bookings and releases. """
+    yoga, chess = Category.objects.create(name='Yoga'), Category.objects.create(name='Chess')
+    _slot(yoga, MONDAY, booked_by=test_user)
+    released = _slot(yoga, MONDAY + timedelta(days=6))  # Sunday, same week
+    _released(released, test_user)
+    _released(released, test_user)
+    _slot(chess, MONDAY + timedelta(days=1))
+    next_week = _slot(yoga, MONDAY + timedelta(days=7), booked_by=test_user)
+    # Unsuccessful attempts don't count as releases.
+    BookingEvent.objects.create(
+        slot=next_week, user=test_user, action=BookingEvent.UNBOOK, outcome=BookingEvent.NOT_OWNER,
+        created_at=django_timezone.now(),
+    )
+    return yoga, chess
+
+
+@pytest.mark.django_db
+def test_rows_are_grouped_per_week_and_category(report_data):
+    yoga, chess = report_data
+    assert list(utilization_rows()) == [
+        ['2030-03-04', yoga.pk, 'Yoga', 2, 1, 2, '0.5000'],
+        ['2030-03-04', chess.pk, 'Chess', 1, 0, 0, '0.0000'],
+        ['2030-03-11', yoga.pk, 'Yoga', 1, 1, 0, '1.0000'],
+    ]
+
+
+@pytest.mark.django_db
+def test_bulk_releases_are_counted(report_data, test_user):
+    """ Staff releases are logged as their own action and counted next to users' unbooks. """
+    yoga, _ = report_data
+    bulk.release_bookings(TimeSlot.objects.filter(category=yoga, start_time__gte=MONDAY + timedelta(days=7)))
+    assert BookingEvent.objects.filter(action=BookingEvent.RELEASE, user=test_user).count() == 1
+    assert list(utilization_rows(TimeSlot.objects.filter(category=yoga)))[-1] == ['2030-03-11', yoga.pk, 'Yoga', 1, 0, 1, '0.0000']
+
+
+@pytest.mark.django_db
+def test_rows_use_two_queries_whatever_the_range(report_data, django_assert_num_queries):
+    with django_assert_num_queries(2):
+        assert len(list(utilization_rows(chunk_size=1))) == 3
+
+
+@pytest.mark.django_db
+def test_rows_only_cover_the_given_slots(report_data):
+    yoga, _ = report_data
+    rows = list(utilization_rows(TimeSlot.objects.filter(category=yoga, start_time__gte=MONDAY + timedelta(days=7))))
+    assert rows == [['2030-03-11', yoga.pk, 'Yoga', 1, 1, 0, '1.0000']]
+
+
+def _read(response):
+    assert response.streaming
+    return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+
+@pytest.mark.django_db
+def test_report_endpoint_streams_csv(api_client, report_data):
+    yoga, _ = report_data
+    api_client.force_authenticate(user=User.objects.create_user('staff', is_staff=True))
+    response = api_client.get(reverse('utilization-report'), {'start': '2030-03-01', 'end': '2030-03-11', 'category_id': yoga.pk})
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/csv'
+    assert 'utilization.csv' in response['Content-Disposition']
+    assert _read(response) == [HEADER, ['2030-03-04', str(yoga.pk), 'Yoga', '2', '1', '2', '0.5000']]
+
+
+@pytest.mark.django_db
+def test_report_endpoint_is_admin_only(api_client, test_user):
+    url = reverse('utilization-report')
+    assert api_client.get(url).status_code == 401
+    api_client.force_authenticate(user=test_user)
+    assert api_client.get(url).status_code == 403
+
+
+@pytest.mark.django_db
+def test_report_endpoint_rejects_bad_parameters(api_client):
+    api_client.force_authenticate(user=User.objects.create_user('staff', is_staff=True))
+    url = reverse('utilization-report')
+    assert api_client.get(url, {'start': 'yesterday'}).status_code == 400
+    response = api_client.get(url, {'category_id': 'yoga'})
+    assert response.status_code == 400
+    assert 'category_id' in response.json()
+
+
+@pytest.mark.django_db
+def test_command_writes_csv(report_data, tmp_path):
+    _, chess = report_data
+    out = io.StringIO()
+    call_command('utilization_report', stdout=out)
+    assert len(list(csv.reader(io.StringIO(out.getvalue())))) == 4
+
+    path = tmp_path / 'report.csv'
+    call_command('utilization_report', '--category', str(chess.pk), '--output', str(path), stderr=io.StringIO())
+    with open(path, newline='') as written:
+        assert list(csv.reader(written)) == [HEADER, ['2030-03-04', str(chess.pk), 'Chess', '1', '0', '0', '0.0000']]
@@ -83,4 +83,52 @@ def test_timeslot_serializer_booked_by_user_unauthenticated(
     # Ensure the serializer doesn't crash if context is missing (optional robustness check)
     serializer_no_context = TimeSlotSerializer(booked_by_test_user_timeslot)
     # Check it returns False safely (or handle potential error depending on desired behavior)
-    assert serializer_no_context.data['booked_by_user'] is False
\ No newline at end of file
+    assert serializer_no_context.data['booked_by_user'] is False
+
+@pytest.mark.django_db
+def test_timeslot_serializer_sparse_fields(factory, test_user, booked_by_other_user_timeslot):
+    """ The `fields` context key limits output and renders bare relations as ids. """
+    request = factory.get('/fake-url/')
+    request.user = test_user
+    context = {'request': request, 'fields': ['id', 'category', 'booked_by.id', 'is_booked'], 'expand': set()}
+
+    data = TimeSlotSerializer(booked_by_other_user_timeslot, context=context).data
+
+    assert set(data) == {'id', 'category', 'booked_by', 'is_booked'}
+    assert data['category'] == booked_by_other_user_timeslot.category_id
+    assert data['booked_by'] == {'id': booked_by_other_user_timeslot.booked_by_id}
+    assert data['is_booked'] is True
+
+
+@pytest.mark.django_db
+def test_user_profile_serializer_validates_ids_in_one_query(test_user):
+    """ interested_category_ids checks all submitted ids with a single IN query. """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from api.models import Category
+    from api.serializers import UserProfileSerializer
+
+    categories = Category.objects.bulk_create([Category(name=f'Bulk Cat {i}') for i in range(50)])
+    ids = [category.pk for category in categories]
+
+    serializer = UserProfileSerializer(test_user.profile, data={'interested_category_ids': ids})
+    with CaptureQueriesContext(connection) as queries:
+        assert serializer.is_valid(), serializer.errors
+    assert len(queries.captured_queries) == 1
+    assert [c.pk for c in serializer.validated_data['interested_categories']] == ids
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('ids, message', [
+    ([999999], 'does not exist'),
+    (['abc'], 'Incorrect type'),
+    ([True], 'Incorrect type'),
+    ('1,2', 'Expected a list'),
+])
+def test_user_profile_serializer_rejects_bad_ids(test_user, test_category, ids, message):
+    """ Bulk validation keeps DRF's per-item error messages. """
+    from api.serializers import UserProfileSerializer
+
+    serializer = UserProfileSerializer(test_user.profile, data={'interested_category_ids': ids})
+    assert not serializer.is_valid()
+    assert message in str(serializer.errors['interested_category_ids'])
@@ -0,0 +1,120 @@
+import pytest
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from api import slowqueries
+from api.models import TimeSlot
+from api.slowqueries import fingerprint, slow_query_log
+
+
+@pytest.fixture
+def log_everything(settings):
+    """ Record every statement, starting from an empty log. """
+    settings.SLOW_QUERY_THRESHOLD_MS = 0
+    slow_query_log.clear()
+    yield
+    slow_query_log.clear()
+
+
+def _entry(fragment):
+    matches = [entry for entry in slowqueries.collect() if fragment in entry['fingerprint']]
+    assert len(matches) == 1, [entry['fingerprint'] for entry in slowqueries.collect()]
+    return matches[0]
+
+
+def test_fingerprint_normalises_literals_and_lists():
+    assert fingerprint(
+        'SELECT "t"."id" FROM "t" WHERE "t"."x" IN (%s, %s, %s) AND "t"."name" = \'it\'\'s\'  LIMIT 21'
+    ) == 'SELECT "t"."id" FROM "t" WHERE "t"."x" IN (...) AND "t"."name" = ? LIMIT ?'
+    assert fingerprint('SELECT 1 FROM t WHERE id IN (%s)') == fingerprint('SELECT 2 FROM t WHERE id IN (%s, %s)')
+    assert fingerprint('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)') == 'INSERT INTO t (a, b) VALUES (...)'
+
+
+@pytest.mark.django_db
+def test_wrapper_installed_on_every_connection():
+    connection.ensure_connection()
+    assert slow_query_log in connection.execute_wrappers
+
+
+@pytest.mark.django_db
+def test_full_scan_is_flagged_and_index_use_is_not(log_everything):
+    now = timezone.now()
+    TimeSlot.objects.filter(end_time__gt=now).count()      # no index on end_time
+    TimeSlot.objects.filter(start_time__gte=now).count()   # api_timeslot_start_idx
+
+    scan = _entry('"api_timeslot"."end_time" >')
+    assert scan['full_scan'] and 'SCAN api_timeslot' in scan['plan']
+    search = _entry('"api_timeslot"."start_time" >=')
+    assert not search['full_scan'] and 'api_timeslot_start_idx' in search['plan']
+    assert search['count'] == 1 and search['max_ms'] >= 0
+
+
+@pytest.mark.django_db
+def test_explain_is_not_counted_as_a_query(log_everything):
+    with CaptureQueriesContext(connection) as queries:
+        TimeSlot.objects.filter(end_time__gt=timezone.now()).exists()
+    assert len(queries.captured_queries) == 1
+    assert _entry('"api_timeslot"."end_time" >')['plan']
+
+
+@pytest.mark.django_db
+def test_statements_are_attributed_to_their_view(log_everything, api_client, test_user_with_profile, test_timeslot):
+    api_client.force_authenticate(user=test_user_with_profile)
+    api_client.get(reverse('timeslot-list'), {'start': timezone.now().date().isoformat(), 'days': 7})
+    api_client.get(reverse('timeslot-list'), {'start': timezone.now().date().isoformat(), 'days': 3})
+    entry = _entry('FROM "api_timeslot" LEFT OUTER JOIN')
+    assert entry['views'] == {'GET timeslot-list': 2}
+    assert entry['count'] == 2
+
+
+@pytest.mark.django_db
+def test_fast_statements_are_ignored(settings):
+    settings.SLOW_QUERY_THRESHOLD_MS = 10_000
+    slow_query_log.clear()
+    TimeSlot.objects.count()
+    assert slow_query_log.snapshot() == []
+
+
+def test_collect_merges_processes():
+    slow_query_log.clear()
+    other = {
+        'fingerprint': 'SELECT ? FROM x', 'sql': 'SELECT 1 FROM x', 'count': 2, 'total_ms': 300.0, 'max_ms': 200.0,
+        'views': {'GET a': 2}, 'plan': 'SCAN x', 'full_scan': True, 'last_seen': 1.0,
+    }
+    cache.set(slowqueries.SNAPSHOT_KEY % 'host:1', [other])
+    cache.set(slowqueries.SNAPSHOT_KEY % 'host:2', [{**other, 'count': 1, 'total_ms': 500.0, 'max_ms': 500.0, 'views': {'GET b': 1}}])
+    cache.set(slowqueries.INDEX_KEY, [slowqueries.SNAPSHOT_KEY % 'host:1', slowqueries.SNAPSHOT_KEY % 'host:2', 'gone'])
+
+    [entry] = slowqueries.collect()
+    assert (entry['count'], entry['total_ms'], entry['max_ms']) == (3, 800.0, 500.0)
+    assert entry['avg_ms'] == pytest.approx(800 / 3)
+    assert entry['views'] == {'GET a': 2, 'GET b': 1}
+    assert 'gone' not in cache.get(slowqueries.INDEX_KEY)
+
+
+def test_log_keeps_the_costliest_fingerprints(settings):
+    settings.SLOW_QUERY_LOG_MAX_ENTRIES = 2
+    slow_query_log.clear()
+    for table, ms in (('a', 5.0), ('b', 1.0), ('c', 3.0)):
+        slow_query_log.record(connection, f'INSERT INTO {table} VALUES (%s)', [1], ms)
+    assert sorted(entry['fingerprint'] for entry in slow_query_log.snapshot()) == [
+        'INSERT INTO a VALUES (...)', 'INSERT INTO c VALUES (...)'
+    ]
+    slow_query_log.clear()
+
+
+@pytest.mark.django_db
+def test_admin_page_and_dump_command(log_everything, admin_client):
+    TimeSlot.objects.filter(end_time__gt=timezone.now()).count()
+
+    response = admin_client.get(reverse('admin:api_slowquery_changelist'), {'full_scan': '1'})
+    assert response.status_code == 200
+    assert b'Full scan' in response.content and b'end_time' in response.content
+
+    out = StringIO()
+    call_command('dump_slow_queries', '--full-scans', stdout=out)
+    assert 'FULL SCAN' in out.getvalue() and 'SCAN api_timeslot' in out.getvalue()
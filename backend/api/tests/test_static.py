@@ -0,0 +1,52 @@
+import gzip
+import json
+import pytest
+from django.core.management import call_command
+from django.test import Client
+
+BUNDLE = b'console.log("calendar");\n' * 400
+
+
+@pytest.fixture
+def collected_static(settings, tmp_path):
+    """ Run collectstatic with the production storage over a fake frontend build. """
+    dist = tmp_path / 'dist'
+    (dist / 'assets').mkdir(parents=True)
+    (dist / 'assets' / 'index.js').write_bytes(BUNDLE)
+    settings.STATICFILES_DIRS = [dist]
+    settings.STATIC_ROOT = tmp_path / 'staticfiles'
+    settings.STORAGES = {
+        **settings.STORAGES,
+        'staticfiles': {'BACKEND': 'api.storage.ParallelCompressedManifestStaticFilesStorage'},
+    }
+    settings.STATIC_COMPRESS_WORKERS = 2
+    # Only the frontend build, not every app's static files.
+    settings.STATICFILES_FINDERS = ['django.contrib.staticfiles.finders.FileSystemFinder']
+    call_command('collectstatic', interactive=False, verbosity=0)
+    manifest = json.loads((settings.STATIC_ROOT / 'staticfiles.json').read_text())
+    return settings.STATIC_ROOT, manifest['paths']
+
+
+def test_collectstatic_writes_hashed_and_precompressed_files(collected_static):
+    """ Hashed names are in the manifest, with .gz (and .br when available) siblings. """
+    root, paths = collected_static
+    hashed = paths['assets/index.js']
+    assert hashed != 'assets/index.js'
+    assert gzip.decompress((root / (hashed + '.gz')).read_bytes()) == BUNDLE
+    try:
+        import brotli
+    except ImportError:
+        return
+    assert brotli.decompress((root / (hashed + '.br')).read_bytes()) == BUNDLE
+
+
+def test_hashed_asset_served_immutable_and_negotiated(collected_static):
+    """ WhiteNoise serves the precompressed variant with a long-lived immutable Cache-Control. """
+    _, paths = collected_static
+    response = Client().get('/static/' + paths['assets/index.js'], HTTP_ACCEPT_ENCODING='gzip')
+
+    assert response.status_code == 200
+    assert response['Content-Encoding'] == 'gzip'
+    assert 'immutable' in response['Cache-Control']
+    assert 'Accept-Encoding' in response['Vary']
+    assert gzip.decompress(b''.join(response.streaming_content)) == BUNDLE
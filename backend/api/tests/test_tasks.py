@@ -0,0 +1,163 @@
+import pytest
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+from api import tasks
+from api.models import Task
+
+CALLS = []
+
+
+@tasks.task
+def record_call(value, scale=1):
+    CALLS.append(value * scale)
+
+
+@tasks.task(max_attempts=2)
+def always_fails():
+    raise RuntimeError('boom')
+
+
+def not_a_task():
+    CALLS.append('should not run')
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    CALLS.clear()
+
+
+@pytest.mark.django_db
+def test_enqueue_is_part_of_the_surrounding_transaction():
+    """ A task queued in a rolled-back transaction never reaches the queue. """
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            record_call.enqueue(1)
+            raise RuntimeError('request failed')
+    assert not Task.objects.exists()
+
+    with transaction.atomic():
+        queued = record_call.enqueue(2, scale=3)
+    queued.refresh_from_db()
+    assert (queued.name, queued.args, queued.kwargs, queued.status) == ('test_tasks.record_call', [2], {'scale': 3}, Task.QUEUED)
+    assert queued.max_attempts == 3
+
+
+def test_enqueue_rejects_plain_functions():
+    with pytest.raises(TypeError):
+        tasks.enqueue(not_a_task)
+
+
+@pytest.mark.django_db
+def test_claim_is_exclusive_and_respects_run_after():
+    ready = record_call.enqueue(1)
+    later = record_call.enqueue(2, delay=timedelta(minutes=2))
+
+    claimed = tasks.claim(10)
+    assert [t.pk for t in claimed] == [ready.pk]
+    assert claimed[0].status == Task.RUNNING and claimed[0].attempts == 1 and claimed[0].claim_token
+    assert tasks.claim(10) == []  # already taken
+
+    assert [t.pk for t in tasks.claim(10, now=timezone.now() + timedelta(minutes=3))] == [later.pk]
+
+
+@pytest.mark.django_db
+def test_abandoned_claim_is_taken_over(settings):
+    settings.TASK_CLAIM_TIMEOUT = timedelta(minutes=5)
+    record_call.enqueue(1)
+    [first] = tasks.claim(1)
+    assert tasks.claim(1, now=timezone.now() + timedelta(minutes=1)) == []
+
+    [second] = tasks.claim(1, now=timezone.now() + timedelta(minutes=6))
+    assert second.pk == first.pk and second.attempts == 2
+    # The first worker finishing late must not overwrite the new claim.
+    tasks.execute(first)
+    second.refresh_from_db()
+    assert second.status == Task.RUNNING
+    assert tasks.execute(second) == Task.DONE
+
+
+@pytest.mark.django_db
+def test_task_killing_its_worker_is_not_reclaimed_forever(settings):
+    """ Once the last attempt's claim times out the task fails instead of running again. """
+    settings.TASK_CLAIM_TIMEOUT = timedelta(minutes=5)
+    queued = tasks.enqueue(always_fails)  # max_attempts=2
+    now = timezone.now()
+    assert len(tasks.claim(1, now=now)) == 1
+    assert len(tasks.claim(1, now=now + timedelta(minutes=6))) == 1  # second and last attempt
+
+    assert tasks.claim(1, now=now + timedelta(minutes=12)) == []
+    queued.refresh_from_db()
+    assert queued.status == Task.FAILED and queued.attempts == 2
+    assert queued.finished_at is not None and 'TASK_CLAIM_TIMEOUT' in queued.last_error
+
+
+@pytest.mark.django_db
+def test_execute_runs_task_and_marks_it_done():
+    record_call.enqueue(2, scale=5)
+    [claimed] = tasks.claim(1)
+    assert tasks.execute(claimed) == Task.DONE
+    claimed.refresh_from_db()
+    assert CALLS == [10]
+    assert claimed.status == Task.DONE and claimed.finished_at is not None and claimed.claim_token == ''
+
+
+@pytest.mark.django_db
+def test_failures_retry_with_backoff_then_fail(settings):
+    settings.TASK_RETRY_BACKOFF = 60
+    queued = always_fails.enqueue()
+
+    [claimed] = tasks.claim(1)
+    assert tasks.execute(claimed) == Task.QUEUED
+    queued.refresh_from_db()
+    assert queued.status == Task.QUEUED
+    assert 'RuntimeError: boom' in queued.last_error
+    assert timedelta(seconds=59) < queued.run_after - timezone.now() <= timedelta(seconds=66)
+
+    [claimed] = tasks.claim(1, now=queued.run_after)
+    assert tasks.execute(claimed) == Task.FAILED
+    queued.refresh_from_db()
+    assert queued.status == Task.FAILED and queued.attempts == 2
+
+
+def test_retry_delay_doubles_up_to_the_cap(settings):
+    settings.TASK_RETRY_BACKOFF = 10
+    settings.TASK_RETRY_BACKOFF_MAX = 50
+    assert 10 <= tasks.retry_delay(1) <= 11
+    assert 20 <= tasks.retry_delay(2) <= 22
+    assert 50 <= tasks.retry_delay(5) <= 55
+
+
+@pytest.mark.django_db
+def test_rows_naming_other_functions_are_not_run():
+    Task.objects.create(name='test_tasks.not_a_task', max_attempts=1)
+    [claimed] = tasks.claim(1)
+    assert tasks.execute(claimed) == Task.FAILED
+    assert CALLS == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_worker_drains_the_queue():
+    for value in range(6):
+        record_call.enqueue(value)
+    always_fails.enqueue(max_attempts=1)
+
+    out = StringIO()
+    call_command('run_worker', '--once', '--threads', '3', '--poll-interval', '0.01', stdout=out)
+
+    assert sorted(CALLS) == list(range(6))
+    assert Task.objects.filter(status=Task.DONE).count() == 6
+    assert Task.objects.filter(status=Task.FAILED).count() == 1
+    assert 'Ran 6 task(s); 0 to be retried, 1 failed.' in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_send_slot_digests_can_be_queued():
+    out = StringIO()
+    call_command('send_slot_digests', '--enqueue', '--batch-size', '20', stdout=out)
+    queued = Task.objects.get()
+    assert queued.name == 'api.digests.send_new_slot_digests_task'
+    assert queued.kwargs == {'batch_size': 20}
+    assert 'Queued digest run' in out.getvalue()
@@ -0,0 +1,103 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory
+from api.throttling import BookingGlobalThrottle, BookingUserThrottle, parse_rate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+    def __call__(self):
+        return self.now
+
+
+def _request(user):
+    request = APIRequestFactory().post('/fake-url/')
+    request.user = user
+    return request
+
+
+def _throttle(cls, clock):
+    throttle = cls()
+    throttle.timer = clock
+    return throttle
+
+
+def test_parse_rate():
+    assert parse_rate('10/min') == (10, 60)
+    assert parse_rate('50/s') == (50, 1)
+
+
+@pytest.mark.django_db
+def test_bucket_bursts_then_refills(booking_rates, test_user):
+    """ Capacity requests pass at once; then one token per period/capacity. """
+    clock = FakeClock()
+    allowed = [_throttle(BookingUserThrottle, clock).allow_request(_request(test_user), None) for _ in range(4)]
+    assert allowed == [True, True, True, False]
+
+    throttle = _throttle(BookingUserThrottle, clock)
+    assert not throttle.allow_request(_request(test_user), None)
+    assert throttle.wait() == pytest.approx(20)
+
+    clock.now += 20
+    assert _throttle(BookingUserThrottle, clock).allow_request(_request(test_user), None)
+    assert not _throttle(BookingUserThrottle, clock).allow_request(_request(test_user), None)
+
+
+@pytest.mark.django_db
+def test_idle_bucket_does_not_overflow(booking_rates, test_user):
+    """ A long idle period refills to capacity, not beyond. """
+    clock = FakeClock()
+    _throttle(BookingUserThrottle, clock).allow_request(_request(test_user), None)
+    clock.now += 50  # within the key lifetime, worth 2.5 tokens of refill
+    allowed = [_throttle(BookingUserThrottle, clock).allow_request(_request(test_user), None) for _ in range(4)]
+    assert allowed == [True, True, True, False]
+
+
+@pytest.mark.django_db
+def test_global_bucket_shared_between_users(booking_rates, test_user, other_user):
+    """ The global bucket limits all users together. """
+    clock = FakeClock()
+    results = [
+        _throttle(BookingGlobalThrottle, clock).allow_request(_request(user), None)
+        for user in [test_user, other_user] * 3
+    ]
+    assert results == [True] * 5 + [False]
+
+
+@pytest.mark.django_db
+def test_book_throttled_with_retry_after_and_no_queries(booking_rates, api_client, test_user_with_profile, other_user, test_timeslot):
+    """ Excess booking attempts get 429 + Retry-After without touching the database. """
+    api_client.force_authenticate(user=test_user_with_profile)
+    url = reverse('timeslot-unbook', kwargs={'pk': test_timeslot.pk})
+    for _ in range(3):
+        assert api_client.post(url).status_code == 403  # not booked by this user, but allowed through
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.post(url)
+
+    assert response.status_code == 429
+    assert int(response['Retry-After']) > 0
+    assert len(queries.captured_queries) == 0
+
+    # Other users have their own bucket.
+    api_client.force_authenticate(user=other_user)
+    assert api_client.post(reverse('timeslot-book', kwargs={'pk': test_timeslot.pk})).status_code == 200
+
+
+@pytest.mark.django_db
+def test_user_rejection_does_not_spend_global_tokens(booking_rates, test_user, other_user):
+    """ Once the per-user bucket rejects, the global bucket is left alone. """
+    clock = FakeClock()
+    for _ in range(10):
+        request = _request(test_user)
+        if _throttle(BookingUserThrottle, clock).allow_request(request, None):
+            _throttle(BookingGlobalThrottle, clock).allow_request(request, None)
+        else:
+            assert _throttle(BookingGlobalThrottle, clock).allow_request(request, None)
+
+    # 3 global tokens spent by test_user, 2 left for everyone else.
+    others = [_throttle(BookingGlobalThrottle, clock).allow_request(_request(other_user), None) for _ in range(3)]
+    assert others == [True, True, False]
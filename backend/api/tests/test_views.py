@@ -1,4 +1,6 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.urls import reverse
 from rest_framework.test import APIClient
@@ -123,12 +125,13 @@ def test_put_user_preferences_success(api_client, test_user_with_profile, test_c
 
 @pytest.mark.django_db
 def test_get_timeslots_invalid_start_date(api_client, test_user_with_profile):
-    """ Test GET /timeslots/ with an invalid date format (covers except ValueError). """
+    """ Test GET /timeslots/ with an invalid date format is rejected. """
     api_client.force_authenticate(user=test_user_with_profile)
     url = reverse('timeslot-list')
     response = api_client.get(url, {'start_date': 'invalid-date-format'}) # Send bad date
 
-    assert response.status_code == 200 # Should still succeed but potentially return all slots
+    assert response.status_code == 400 # Rejected instead of falling back to all slots
+    assert 'start' in response.data
 
 @pytest.mark.django_db
 def test_get_timeslots_filter_category_brackets(api_client, test_user_with_profile, test_category, test_timeslot):
@@ -285,4 +288,203 @@ def test_unbook_timeslot_in_past(api_client, test_user_with_profile, test_catego
     assert response.status_code == 400
     assert 'cannot unbook a slot in the past' in response.data.get('detail', '').lower()
     past_booked_slot.refresh_from_db()
-    assert past_booked_slot.booked_by == test_user_with_profile # Should still be booked
\ No newline at end of file
+    assert past_booked_slot.booked_by == test_user_with_profile # Should still be booked
+
+@pytest.mark.django_db
+def test_get_timeslots_sparse_fields_without_joins(api_client, test_user_with_profile, booked_by_test_user_timeslot):
+    """ ?fields= limits the payload and drops the category/user joins when only ids are needed. """
+    api_client.force_authenticate(user=test_user_with_profile)
+    url = reverse('timeslot-list')
+    fields = 'id,start_time,end_time,category.id,booked_by_user'
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(url, {'fields': fields})
+
+    assert response.status_code == 200
+    slot = next(s for s in response.data if s['id'] == booked_by_test_user_timeslot.id)
+    assert set(slot) == {'id', 'start_time', 'end_time', 'category', 'booked_by_user'}
+    assert slot['category'] == {'id': booked_by_test_user_timeslot.category_id}
+    assert slot['booked_by_user'] is True
+
+    timeslot_sql = [q['sql'] for q in queries.captured_queries if 'FROM "api_timeslot"' in q['sql']]
+    assert len(timeslot_sql) == 1
+    assert 'JOIN' not in timeslot_sql[0]
+    assert '"api_timeslot"."category_id"' in timeslot_sql[0]
+
+@pytest.mark.django_db
+def test_get_timeslots_sparse_fields_expand(api_client, test_user_with_profile, booked_by_test_user_timeslot):
+    """ Bare relations render as primary keys unless listed in ?expand=. """
+    api_client.force_authenticate(user=test_user_with_profile)
+    url = reverse('timeslot-list')
+    response = api_client.get(url, {'fields': 'id,category,booked_by', 'expand': 'booked_by'})
+
+    assert response.status_code == 200
+    slot = response.data[0]
+    assert slot['category'] == booked_by_test_user_timeslot.category_id
+    assert slot['booked_by']['username'] == test_user_with_profile.username
+
+    response = api_client.get(url, {'fields': 'id,category.name'})
+    assert response.data[0]['category'] == {'name': booked_by_test_user_timeslot.category.name}
+
+@pytest.mark.django_db
+def test_get_timeslots_sparse_fields_unknown(api_client, test_user_with_profile):
+    """ Unknown fields and non-relations in ?expand= are rejected with 400. """
+    api_client.force_authenticate(user=test_user_with_profile)
+    url = reverse('timeslot-list')
+
+    response = api_client.get(url, {'fields': 'id,secret'})
+    assert response.status_code == 400
+    assert 'secret' in str(response.data['fields'])
+
+    response = api_client.get(url, {'fields': 'id', 'expand': 'start_time'})
+    assert response.status_code == 400
+
+    response = api_client.get(url, {'fields': 'category.password'})
+    assert response.status_code == 400
+
+@pytest.mark.django_db
+def test_get_timeslots_without_fields_unchanged(api_client, test_user_with_profile, booked_by_test_user_timeslot):
+    """ Without ?fields= the full nested representation is returned. """
+    api_client.force_authenticate(user=test_user_with_profile)
+    response = api_client.get(reverse('timeslot-list'))
+
+    slot = response.data[0]
+    assert slot['category']['name'] == booked_by_test_user_timeslot.category.name
+    assert slot['booked_by']['username'] == test_user_with_profile.username
+    assert slot['is_booked'] is True
+
+@pytest.mark.django_db
+def test_get_timeslots_month_range(api_client, test_user_with_profile, test_category):
+    """ ?start=&end= returns a whole month in one request, end exclusive. """
+    inside = [
+        TimeSlot.objects.create(category=test_category, start_time=datetime(2030, 3, day, 9, tzinfo=zoneinfo.ZoneInfo("UTC")),
+                                end_time=datetime(2030, 3, day, 10, tzinfo=zoneinfo.ZoneInfo("UTC")))
+        for day in (1, 15, 31)
+    ]
+    TimeSlot.objects.create(category=test_category, start_time=datetime(2030, 4, 1, 0, tzinfo=zoneinfo.ZoneInfo("UTC")),
+                            end_time=datetime(2030, 4, 1, 1, tzinfo=zoneinfo.ZoneInfo("UTC")))
+
+    api_client.force_authenticate(user=test_user_with_profile)
+    response = api_client.get(reverse('timeslot-list'), {'start': '2030-03-01', 'end': '2030-04-01'})
+
+    assert response.status_code == 200
+    assert [slot['id'] for slot in response.data] == [slot.id for slot in inside]
+
+@pytest.mark.django_db
+def test_get_timeslots_days_range(api_client, test_user_with_profile, test_category):
+    """ ?start=&days= covers an agenda window of N days. """
+    utc = zoneinfo.ZoneInfo("UTC")
+    first = TimeSlot.objects.create(category=test_category, start_time=datetime(2030, 3, 1, 9, tzinfo=utc),
+                                    end_time=datetime(2030, 3, 1, 10, tzinfo=utc))
+    TimeSlot.objects.create(category=test_category, start_time=datetime(2030, 3, 3, 9, tzinfo=utc),
+                            end_time=datetime(2030, 3, 3, 10, tzinfo=utc))
+
+    api_client.force_authenticate(user=test_user_with_profile)
+    response = api_client.get(reverse('timeslot-list'), {'start': '2030-03-01', 'days': 2})
+
+    assert response.status_code == 200
+    assert [slot['id'] for slot in response.data] == [first.id]
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [
+    {'start': 'tomorrow'},
+    {'start': '2030-02-30'},
+    {'end': '2030-03-01'},
+    {'start': '2030-03-01', 'end': '2030-03-10', 'days': 3},
+    {'start': '2030-03-01', 'days': 'many'},
+    {'start': '2030-03-01', 'days': 0},
+    {'start': '2030-03-10', 'end': '2030-03-01'},
+    {'start': '2030-01-01', 'end': '2031-01-01'},
+    {'start': '2025-01-01', 'days': 999999999},
+    {'start': '9999-12-30', 'days': 5},
+    {'start': '2025-01-01', 'days': 10000000000},
+])
+def test_get_timeslots_invalid_range(api_client, test_user_with_profile, params):
+    """ Malformed, inverted or too-wide ranges are rejected with 400. """
+    api_client.force_authenticate(user=test_user_with_profile)
+    response = api_client.get(reverse('timeslot-list'), params)
+
+    assert response.status_code == 400
+
+@pytest.mark.django_db
+def test_get_timeslots_range_uses_plain_comparison(api_client, test_user_with_profile):
+    """ The range filter compares start_time directly so the index can serve it. """
+    api_client.force_authenticate(user=test_user_with_profile)
+    with CaptureQueriesContext(connection) as queries:
+        api_client.get(reverse('timeslot-list'), {'start_date': '2030-03-01'})
+
+    sql = next(q['sql'] for q in queries.captured_queries if 'FROM "api_timeslot"' in q['sql'])
+    assert '"api_timeslot"."start_time" >=' in sql
+    assert 'django_datetime_cast_date' not in sql
+
+@pytest.mark.django_db
+def test_get_categories_served_from_cache(api_client, test_user_with_profile, test_category):
+    """ Category list and detail hit the DB only to load the cache. """
+    api_client.force_authenticate(user=test_user_with_profile)
+    api_client.get(reverse('category-list'))
+    with CaptureQueriesContext(connection) as queries:
+        list_response = api_client.get(reverse('category-list'))
+        detail_response = api_client.get(reverse('category-detail', kwargs={'pk': test_category.pk}))
+
+    assert list_response.data == [{'id': test_category.id, 'name': test_category.name}]
+    assert detail_response.data == {'id': test_category.id, 'name': test_category.name}
+    assert len(queries.captured_queries) == 0
+    assert api_client.get(reverse('category-detail', kwargs={'pk': 999999})).status_code == 404
+
+@pytest.mark.django_db
+def test_suggest_timeslots(api_client, test_user_with_profile, other_user, test_category):
+    """ /timeslots/suggest/ returns the next free, non-conflicting slots in the user's categories. """
+    other_cat = Category.objects.create(name='Not Interested Cat')
+    test_user_with_profile.profile.interested_categories.add(test_category)
+    now = timezone.now()
+
+    def slot(hours, category=test_category, booked_by=None):
+        return TimeSlot.objects.create(category=category, start_time=now + timedelta(hours=hours),
+                                       end_time=now + timedelta(hours=hours + 1), booked_by=booked_by)
+
+    slot(-3)                                    # in the past
+    mine = slot(10, booked_by=test_user_with_profile)
+    slot(10.5)                                  # overlaps my booking
+    slot(12, booked_by=other_user)              # taken
+    slot(13, category=other_cat)                # not in my categories
+    expected = [slot(14), slot(20), slot(30)]
+
+    api_client.force_authenticate(user=test_user_with_profile)
+    url = reverse('timeslot-suggest')
+    response = api_client.get(url, {'n': 2})
+
+    assert response.status_code == 200
+    assert [s['id'] for s in response.data] == [s.id for s in expected[:2]]
+    assert mine.id not in [s['id'] for s in response.data]
+
+    # An explicit category replaces the profile's interests.
+    response = api_client.get(url, {'category_id': other_cat.id, 'fields': 'id'})
+    assert response.status_code == 200
+    assert len(response.data) == 1 and set(response.data[0]) == {'id'}
+
+@pytest.mark.django_db
+def test_suggest_timeslots_single_query(api_client, test_user_with_profile, test_category):
+    """ The suggestion is one SQL statement with a LIMIT, however many slots exist. """
+    test_user_with_profile.profile.interested_categories.add(test_category)
+    now = timezone.now()
+    TimeSlot.objects.bulk_create([
+        TimeSlot(category=test_category, start_time=now + timedelta(hours=i), end_time=now + timedelta(hours=i, minutes=30))
+        for i in range(1, 200)
+    ])
+
+    api_client.force_authenticate(user=test_user_with_profile)
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(reverse('timeslot-suggest'), {'n': 5})
+
+    assert len(response.data) == 5
+    timeslot_sql = [q['sql'] for q in queries.captured_queries if 'FROM "api_timeslot"' in q['sql']]
+    assert len(timeslot_sql) == 1
+    assert 'LIMIT 5' in timeslot_sql[0]
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('n', ['0', '51', 'ten'])
+def test_suggest_timeslots_invalid_n(api_client, test_user_with_profile, n):
+    """ n must be a whole number within bounds. """
+    api_client.force_authenticate(user=test_user_with_profile)
+    response = api_client.get(reverse('timeslot-suggest'), {'n': n})
+
+    assert response.status_code == 400
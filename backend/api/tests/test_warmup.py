@@ -0,0 +1,52 @@
+import json
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from api import warmup
+
+
+@pytest.mark.django_db
+def test_warm_up_runs_every_step():
+    timings = warmup.warm_up()
+    assert [name for name, _ in timings] == [name for name, _ in warmup.STEPS]
+    assert all(seconds is not None for _, seconds in timings)
+
+
+def test_failed_step_does_not_stop_startup(caplog):
+    def broken():
+        raise RuntimeError('database is down')
+    calls = []
+    timings = warmup.warm_up([('broken', broken), ('after', lambda: calls.append(1))])
+    assert timings[0] == ('broken', None)
+    assert timings[1][0] == 'after' and timings[1][1] is not None
+    assert calls == [1]
+    assert "Warm-up step 'broken' failed" in caplog.text
+
+
+def test_warm_urls_and_serializers_cover_api_routes():
+    from api.views import TimeSlotViewSet
+    assert TimeSlotViewSet in set(warmup._view_classes())
+    assert warmup.warm_urls() > 10
+    # Timeslot, category, preferences and booking action serializers at least.
+    assert warmup.warm_serializers() >= 4
+
+
+def test_warm_up_if_enabled_respects_setting(settings, monkeypatch):
+    calls = []
+    monkeypatch.setattr(warmup, 'warm_up', lambda: calls.append(1))
+    settings.WARM_UP_ON_STARTUP = False
+    warmup.warm_up_if_enabled()
+    assert calls == []
+    settings.WARM_UP_ON_STARTUP = True
+    warmup.warm_up_if_enabled()
+    assert calls == [1]
+
+
+def test_startup_report_measures_each_app():
+    out = StringIO()
+    call_command('startup_report', '--no-warm-up', '--json', stdout=out)
+    report = json.loads(out.getvalue())
+    labels = {app['label'] for app in report['apps']}
+    assert {'api', 'auth', 'rest_framework'} <= labels
+    assert report['warm_up'] == []
+    assert report['total'] >= report['setup'] > 0
@@ -0,0 +1,126 @@
+"""
+Token-bucket throttles for the booking write path.
+
+A bucket holds up to N tokens and refills at N per period, so a client may
+burst N requests and then sustain N per period. Rates come from
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] under each class's `scope`, in DRF's
+usual "N/period" form (period: s, m, h or d).
+
+State lives in Django's cache and is updated only with `add`/`incr`/`decr`,
+which are atomic on the local-memory, Redis and Memcached backends (not on
+the database cache). A bucket is stored as the time it was created (`epoch`)
+plus a counter of tokens taken since then; the level at time t is
+
+    capacity + (t - epoch) * rate - taken
+
+with `taken` raised whenever an idle bucket would otherwise overflow. No
+database query is made, so rejecting a request is cheap.
+
+A bucket is only as shared as the cache holding it. With the local-memory
+backend (the CACHES default in settings) every worker process has its own
+buckets, so a limit of N per period really allows N per period per worker;
+that includes BookingGlobalThrottle. Configure a shared cache (Redis,
+Memcached) to enforce the rates across processes.
+"""
+import time
+from django.core.cache import cache as default_cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+  """ '10/min' -> (10, 60). """
+  try:
+    count, period = rate.split('/')
+    return int(count), PERIODS[period.strip()[0]]
+  except (ValueError, KeyError, IndexError):
+    raise ImproperlyConfigured(f"Invalid token bucket rate '{rate}'; expected e.g. '10/min'.")
+
+
+class TokenBucketThrottle(BaseThrottle):
+  cache = default_cache
+  timer = time.time
+  scope = None
+  cache_format = 'throttle:bucket:%(scope)s:%(ident)s'
+
+  def __init__(self):
+    rates = api_settings.DEFAULT_THROTTLE_RATES or {}
+    if self.scope not in rates:
+      raise ImproperlyConfigured(f"No DEFAULT_THROTTLE_RATES entry for scope '{self.scope}'.")
+    self.rate = rates[self.scope]
+    self.capacity, self.period = (None, None) if self.rate is None else parse_rate(self.rate)
+    self._wait = None
+
+  def get_cache_key(self, request, view):
+    raise NotImplementedError('.get_cache_key() must be overridden')
+
+  def allow_request(self, request, view):
+    if self.rate is None:
+      return True
+    # Once an earlier bucket rejected the request, don't spend tokens from this one.
+    if getattr(request, '_token_bucket_rejected', False):
+      return True
+    key = self.get_cache_key(request, view)
+    if key is None:
+      return True
+
+    now = self.timer()
+    refill_rate = self.capacity / self.period
+    # Idle buckets refill completely after one period; keep them a little longer.
+    timeout = int(self.period * 2) + 1
+
+    self.cache.add(f'{key}:epoch', now, timeout)
+    epoch = self.cache.get(f'{key}:epoch', now)
+    taken_key = f'{key}:{epoch!r}'
+    self.cache.add(taken_key, 0, timeout)
+    try:
+      taken = self.cache.incr(taken_key)
+    except ValueError:  # expired between add() and incr()
+      self.cache.add(taken_key, 1, timeout)
+      taken = 1
+
+    refilled = int((now - epoch) * refill_rate)
+    if taken - 1 < refilled:
+      # The bucket was full before this request: drop the overflow.
+      taken = self.cache.incr(taken_key, refilled - (taken - 1))
+    self.cache.touch(f'{key}:epoch', timeout)
+    self.cache.touch(taken_key, timeout)
+
+    level = self.capacity + (now - epoch) * refill_rate - taken
+    if level >= 0:
+      return True
+
+    # Rejected requests don't consume a token.
+    self.cache.decr(taken_key)
+    self._wait = -level / refill_rate
+    request._token_bucket_rejected = True
+    return False
+
+  def wait(self):
+    return self._wait
+
+
+class BookingUserThrottle(TokenBucketThrottle):
+  """ Per-user bucket for book/unbook. """
+  scope = 'booking'
+
+  def get_cache_key(self, request, view):
+    if not request.user or not request.user.is_authenticated:
+      return None
+    return self.cache_format % {'scope': self.scope, 'ident': request.user.pk}
+
+
+class BookingGlobalThrottle(TokenBucketThrottle):
+  """
+  One bucket shared by every user, protecting the single SQLite writer.
+
+  Shared between processes only with a shared cache backend; with the
+  per-process default, the allowed rate is multiplied by the worker count.
+  """
+  scope = 'booking_global'
+
+  def get_cache_key(self, request, view):
+    return self.cache_format % {'scope': self.scope, 'ident': 'all'}
@@ -9,6 +9,8 @@ router.register(r'timeslots', views.TimeSlotViewSet, basename='timeslot')
 urlpatterns = [
   path('', include(router.urls)),
   path('user/preferences/', views.UserPreferencesView.as_view(), name='user-preferences'),
+  path('profiles/<str:profile_id>/', views.ProfileReportView.as_view(), name='profile-report'),
+  path('reports/utilization.csv', views.UtilizationReportView.as_view(), name='utilization-report'),
   path('auth/', include('dj_rest_auth.urls')),
   path('auth/registration/', include('dj_rest_auth.registration.urls')),
 ]
\ No newline at end of file
@@ -1,16 +1,89 @@
 from rest_framework import viewsets, permissions, generics, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from datetime import datetime, timedelta
-from .models import Category, TimeSlot, UserProfile
-from .serializers import CategorySerializer, TimeSlotSerializer, UserProfileSerializer, BookingActionSerializer
+from django.utils.dateparse import parse_date, parse_datetime
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, time, timedelta
+import json
+import sys
+from .cache import category_cache
+from .models import BookingEvent, Category, TimeSlot, UserProfile
+from .events import record_booking_event
+from .profiling import get_report
+from .reports import csv_lines, utilization_rows
+from .idempotency import idempotent, is_replay, might_replay
+from .throttling import BookingGlobalThrottle, BookingUserThrottle
+from .serializers import CategorySerializer, TimeSlotSerializer, UserProfileSerializer, UserSerializer, BookingActionSerializer, split_sparse_fields
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+  """
+  Without parameters, every category (from the process-local cache).
+
+  With ?q= (a case-insensitive name prefix), ?limit= or ?cursor=, one page of
+  matches ordered by name: {"results": [{"id", "name"}, ...], "next": cursor
+  or null}. Pages are read from the (name_key, id) index with keyset
+  pagination: pass `next` back as ?cursor= (with the same q) for the following
+  page, so a page costs the same however deep it is.
+  """
   queryset = Category.objects.all()
   serializer_class = CategorySerializer
   permission_classes = [permissions.IsAuthenticated]
+  SEARCH_PARAMS = ('q', 'limit', 'cursor')
+  SEARCH_DEFAULT_LIMIT = 20
+  SEARCH_MAX_LIMIT = 100
+
+  def list(self, request, *args, **kwargs):
+    if any(name in request.query_params for name in self.SEARCH_PARAMS):
+      return self.search(request)
+    serializer = self.get_serializer(category_cache.all(), many=True)
+    return Response(serializer.data)
+
+  def search(self, request):
+    params = request.query_params
+    try:
+      limit = int(params.get('limit') or self.SEARCH_DEFAULT_LIMIT)
+    except ValueError:
+      raise ValidationError({'limit': ['A whole number is required.']})
+    if not 1 <= limit <= self.SEARCH_MAX_LIMIT:
+      raise ValidationError({'limit': [f'Must be between 1 and {self.SEARCH_MAX_LIMIT}.']})
+
+    queryset = Category.objects.order_by('name_key', 'id')
+    prefix = Category.normalize(params.get('q', '').strip())
+    if prefix:
+      # The range lets the index narrow the scan on every backend; it is only an exact
+      # prefix match under binary collation, so LIKE 'prefix%' filters what it finds.
+      queryset = queryset.filter(name_key__gte=prefix, name_key__startswith=prefix)
+      if ord(prefix[-1]) < sys.maxunicode:
+        queryset = queryset.filter(name_key__lt=prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    if params.get('cursor'):
+      name_key, pk = _decode_cursor(params['cursor'])
+      queryset = queryset.filter(Q(name_key__gt=name_key) | Q(id__gt=pk), name_key__gte=name_key)
+
+    page = list(queryset.values_list('id', 'name', 'name_key')[:limit + 1])
+    more = len(page) > limit
+    page = page[:limit]
+    return Response({
+      'results': [{'id': pk, 'name': name} for pk, name, _ in page],
+      'next': _encode_cursor(page[-1][2], page[-1][0]) if more else None,
+    })
+
+  def get_object(self):
+    try:
+      pk = int(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+    except (TypeError, ValueError):
+      raise Http404
+    category = category_cache.get(pk)
+    if category is None:
+      raise Http404
+    self.check_object_permissions(self.request, category)
+    return category
 
 class UserPreferencesView(generics.RetrieveUpdateAPIView):
   serializer_class = UserProfileSerializer
@@ -21,103 +94,302 @@ class UserPreferencesView(generics.RetrieveUpdateAPIView):
     profile, created = UserProfile.objects.get_or_create(user=self.request.user)
     return profile
 
+class ProfileReportView(APIView):
+  """ A request profile stored by ProfilingMiddleware (see api/profiling.py). """
+  permission_classes = [permissions.IsAdminUser]
+
+  def get(self, request, profile_id):
+    report = get_report(profile_id)
+    if report is None:
+      # Also what another worker's report looks like without a shared cache.
+      raise NotFound('No such profile report: it expired, or was stored by another worker process.')
+    return Response(report)
+
+def _parse_range_bound(value, name):
+  """ Parse a YYYY-MM-DD date (midnight, current timezone) or an ISO 8601 datetime. """
+  try:
+    day = parse_date(value)
+    if day is not None:
+      return timezone.make_aware(datetime.combine(day, time.min))
+    moment = parse_datetime(value)
+  except ValueError:
+    moment = None
+  if moment is None:
+    raise ValidationError({name: ['Use YYYY-MM-DD or an ISO 8601 datetime.']})
+  return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+def _encode_cursor(name_key, pk):
+  return urlsafe_b64encode(json.dumps([name_key, pk]).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(value):
+  """ Inverse of _encode_cursor(); a tampered or garbled cursor is a 400. """
+  try:
+    name_key, pk = json.loads(urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+    if isinstance(name_key, str) and isinstance(pk, int):
+      return name_key, pk
+  except (ValueError, TypeError):
+    pass
+  raise ValidationError({'cursor': ['Invalid cursor.']})
+
+
+def _split_param(value):
+  """ 'a, b,,c' -> ['a', 'b', 'c']; missing or blank -> None. """
+  if not value:
+    return None
+  return [part.strip() for part in value.split(',') if part.strip()] or None
+
+
+class UtilizationReportView(APIView):
+  """
+  Booking utilization per category per week as a streamed CSV download (see
+  api/reports.py). Optional ?start= and ?end= (YYYY-MM-DD or ISO 8601, end
+  exclusive) and ?category_id= (repeatable) narrow the slots covered.
+  """
+  permission_classes = [permissions.IsAdminUser]
+
+  def perform_content_negotiation(self, request, force=False):
+    # The body is CSV whatever the Accept header says; errors still render as JSON.
+    return super().perform_content_negotiation(request, force=True)
+
+  def get(self, request):
+    params = request.query_params
+    slots = TimeSlot.objects.all()
+    if params.get('start'):
+      slots = slots.filter(start_time__gte=_parse_range_bound(params['start'], 'start'))
+    if params.get('end'):
+      slots = slots.filter(start_time__lt=_parse_range_bound(params['end'], 'end'))
+    category_ids = params.getlist('category_id')
+    if category_ids:
+      if not all(value.isdigit() for value in category_ids):
+        raise ValidationError({'category_id': ['A whole number is required.']})
+      slots = slots.filter(category_id__in=category_ids)
+
+    response = StreamingHttpResponse(csv_lines(utilization_rows(slots)), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="utilization.csv"'
+    return response
+
+
 class TimeSlotViewSet(viewsets.ReadOnlyModelViewSet):
   serializer_class = TimeSlotSerializer
   permission_classes = [permissions.IsAuthenticated]
+  # Actions that honour ?fields= / ?expand=
+  sparse_fieldset_actions = ('list', 'retrieve', 'suggest')
+  SUGGEST_MAX_RESULTS = 50
 
-  def get_queryset(self):
-    category_ids_str_get = self.request.GET.getlist('category_id') 
-    category_ids_str_get_brackets = self.request.GET.getlist('category_id[]') 
-    
-    # --- Filtering Logic ---
-    queryset = TimeSlot.objects.select_related('category', 'booked_by').all()
-
-    # Filter by week (example: requires 'start_date' query parameter YYYY-MM-DD)
-    start_date_str = self.request.query_params.get('start_date')
-    if start_date_str:
+  def throttled(self, request, wait):
+    if self.action in ('book', 'unbook'):
+      # A retry answered from its stored Idempotency-Key response is let through.
+      # The cache marker is checked first so a rejection with a fresh key queries nothing.
+      if might_replay(request) and is_replay(request):
+        return
+      # Rejected booking attempts belong in the audit log too.
+      pk = self.kwargs.get('pk', '')
+      if pk.isdigit():
+        record_booking_event(request, int(pk), self.action, BookingEvent.THROTTLED)
+    super().throttled(request, wait)
+
+  def get_sparse_fieldset(self):
+    """ Parse ?fields= and ?expand= into (fields or None, expand set). """
+    if not hasattr(self, '_sparse_fieldset'):
+      fields, expand = None, set()
+      if self.action in self.sparse_fieldset_actions:
+        fields = _split_param(self.request.query_params.get('fields'))
+        expand = set(_split_param(self.request.query_params.get('expand')) or [])
+        unknown = TimeSlotSerializer.invalid_sparse_fields(fields or [], expand)
+        if unknown:
+          raise ValidationError({'fields': [f"Unknown or non-expandable field(s): {', '.join(unknown)}."]})
+      self._sparse_fieldset = (fields, expand)
+    return self._sparse_fieldset
+
+  def get_serializer_context(self):
+    context = super().get_serializer_context()
+    fields, expand = self.get_sparse_fieldset()
+    if fields is not None:
+      context.update(fields=fields, expand=expand)
+    return context
+
+  def _apply_sparse_fieldset(self, queryset):
+    """ Join and load only what the requested fields need. """
+    fields, expand = self.get_sparse_fieldset()
+    if fields is None:
+      return queryset.select_related('booked_by')
+
+    wanted, nested = split_sparse_fields(fields)
+    wanted |= expand
+    columns = ['id'] + [name for name in ('start_time', 'end_time') if name in wanted]
+    if wanted & {'booked_by', 'is_booked', 'booked_by_user'}:
+      columns.append('booked_by')  # the FK column is enough for these
+    if 'category' in wanted:
+      columns.append('category')  # rendered from the category cache, never joined
+    if 'booked_by' in wanted:
+      sub_fields = set(UserSerializer.Meta.fields) if 'booked_by' in expand else nested.get('booked_by', set())
+      if sub_fields - {'id'}:
+        queryset = queryset.select_related('booked_by')
+        columns.extend(f'booked_by__{name}' for name in sub_fields)
+    return queryset.only(*columns)
+
+  def get_date_range(self):
+    """
+    Return the requested (start, end) window as aware datetimes, end exclusive,
+    or None when no range was requested. Malformed or too-wide ranges raise a
+    ValidationError (400).
+    """
+    params = self.request.query_params
+    start_date_str = params.get('start_date')
+    start_str, end_str, days_str = params.get('start'), params.get('end'), params.get('days')
+
+    if start_date_str and not (start_str or end_str or days_str):
+      # Week view: the 7 days from start_date.
+      start_str, days_str = start_date_str, '7'
+    if not (start_str or end_str or days_str):
+      return None
+    if not start_str:
+      raise ValidationError({'start': ["This parameter is required with 'end' or 'days'."]})
+    if end_str and days_str:
+      raise ValidationError({'days': ["Pass either 'end' or 'days', not both."]})
+
+    max_days = getattr(settings, 'TIMESLOT_MAX_RANGE_DAYS', 92)
+    start = _parse_range_bound(start_str, 'start')
+    if end_str:
+      end = _parse_range_bound(end_str, 'end')
+    else:
       try:
-        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-        end_date = start_date + timedelta(days=7)
-        # Filter slots that *start* within the week
-        queryset = queryset.filter(start_time__date__gte=start_date, start_time__date__lt=end_date)
+        days = int(days_str or 7)
       except ValueError:
-        # Handle invalid date format if necessary
-        pass
+        raise ValidationError({'days': ['A whole number of days is required.']})
+      if days < 1:
+        raise ValidationError({'days': ['Must be at least 1.']})
+      # Checked before building the timedelta, which overflows for huge values.
+      if days > max_days:
+        raise ValidationError({'days': [f'Date range cannot exceed {max_days} days.']})
+      try:
+        end = start + timedelta(days=days)
+      except (OverflowError, ValueError):
+        raise ValidationError({'days': ['The range ends after the last supported date.']})
 
-    # Filter by specific Category IDs passed from Frontend
-    # Use getlist to handle multiple category_id parameters
-    category_ids_str = self.request.query_params.getlist('category_id')
-    # Convert to integers, handling potential errors
-    # --- Check if the list is actually populated ---
-
-    if category_ids_str_get_brackets:
-      print("[DEBUG] Using key 'category_id[]' for filtering.")
-      category_ids_str = category_ids_str_get_brackets
-    elif category_ids_str_get:
-      # Fallback to 'category_id' if the first wasn't populated but this one is
-      print("[DEBUG] Using key 'category_id' for filtering.")
-      category_ids_str = category_ids_str_get
-    else:
-      # Neither key yielded results
-      print("[DEBUG] No category_id or category_id[] parameter found.")
-      category_ids_str = [] # Ensure it's an empty list
-      
-    if category_ids_str: # Only attempt conversion and filtering if the list is not empty
-      valid_category_ids = []
-      for cat_id_str in category_ids_str:
-        try:
-          valid_category_ids.append(int(cat_id_str))
-        except (ValueError, TypeError):
-          pass # Ignore invalid IDs silently
-
-      # --- Apply filter ONLY if valid integer IDs were found ---
-      if valid_category_ids:
-        print(f"[DEBUG] Applying category filter for IDs: {valid_category_ids}") # Add Debug Print
-        queryset = queryset.filter(category_id__in=valid_category_ids) # Use __in for multiple IDs
-      else:
-        print("[DEBUG] No valid category IDs found after conversion, not filtering by category.") # Add Debug Print
-    else:
-      print("[DEBUG] category_id parameter not found or empty in request, not filtering by category.") # Add Debug Print
+    if end <= start:
+      raise ValidationError({'end': ["Must be after 'start'."]})
+    if end - start > timedelta(days=max_days):
+      raise ValidationError({'end': [f'Date range cannot exceed {max_days} days.']})
+    return start, end
+
+  def get_category_ids(self):
+    """
+    Valid integer ids from ?category_id[]= (preferred) or ?category_id=.
+    Non-integer values are ignored; an empty list means no category filter.
+    """
+    raw_ids = self.request.query_params.getlist('category_id[]') or self.request.query_params.getlist('category_id')
+    category_ids = []
+    for raw_id in raw_ids:
+      try:
+        category_ids.append(int(raw_id))
+      except (ValueError, TypeError):
+        pass # Ignore invalid IDs silently
+    return category_ids
 
+  def get_queryset(self):
+    queryset = self._apply_sparse_fieldset(TimeSlot.objects.all())
+
+    # Filter by date range: legacy ?start_date= (one week), or ?start= with ?end= / ?days=
+    date_range = self.get_date_range()
+    if date_range:
+      # Plain comparisons on start_time so the start_time index is used for the range scan.
+      queryset = queryset.filter(start_time__gte=date_range[0], start_time__lt=date_range[1])
+
+    # Filter by specific Category IDs passed from Frontend
+    category_ids = self.get_category_ids()
+    if category_ids:
+      queryset = queryset.filter(category_id__in=category_ids)
 
     return queryset.order_by('start_time')
 
 
+  # --- Free slot finder ---
+  @action(detail=False, methods=['get'])
+  def suggest(self, request):
+    """
+    The next `n` (default 10, max SUGGEST_MAX_RESULTS) unbooked future slots in
+    the user's interested categories, or in ?category_id= when given, that do
+    not overlap any slot the user has already booked.
+
+    Computed as one query: an anti-join against the user's bookings, ordered by
+    start_time and limited to `n`, so the database stops at the first `n` hits.
+    """
+    try:
+      limit = int(request.query_params.get('n', 10))
+    except ValueError:
+      raise ValidationError({'n': ['A whole number is required.']})
+    if not 1 <= limit <= self.SUGGEST_MAX_RESULTS:
+      raise ValidationError({'n': [f'Must be between 1 and {self.SUGGEST_MAX_RESULTS}.']})
+
+    category_ids = self.get_category_ids()
+    if not category_ids:
+      category_ids = UserProfile.interested_categories.through.objects.filter(
+        userprofile__user=request.user
+      ).values('category_id')
+
+    conflicting = TimeSlot.objects.filter(
+      booked_by=request.user,
+      start_time__lt=OuterRef('end_time'),
+      end_time__gt=OuterRef('start_time'),
+    )
+    slots = (
+      self._apply_sparse_fieldset(TimeSlot.objects.all())
+      .filter(booked_by__isnull=True, start_time__gt=timezone.now(), category_id__in=category_ids)
+      .exclude(Exists(conflicting))
+      .order_by('start_time', 'id')[:limit]
+    )
+    serializer = self.get_serializer(slots, many=True)
+    return Response(serializer.data)
+
   # --- Booking Action ---
-  @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated], serializer_class=BookingActionSerializer)
+  @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated], serializer_class=BookingActionSerializer,
+          throttle_classes=[BookingUserThrottle, BookingGlobalThrottle])
+  @idempotent
   def book(self, request, pk=None):
     timeslot = self.get_object() # Gets the specific timeslot by pk
 
     if timeslot.booked_by:
+      record_booking_event(request, timeslot.pk, BookingEvent.BOOK, BookingEvent.ALREADY_BOOKED)
       return Response({'detail': 'Slot already booked.'}, status=status.HTTP_400_BAD_REQUEST)
 
     if timeslot.start_time < timezone.now():
+      record_booking_event(request, timeslot.pk, BookingEvent.BOOK, BookingEvent.PAST)
       return Response({'detail': 'Cannot book a slot in the past.'}, status=status.HTTP_400_BAD_REQUEST)
 
     # Check for conflicts
     existing_booking = TimeSlot.objects.filter(booked_by=request.user, start_time__lt=timeslot.end_time, end_time__gt=timeslot.start_time).exists()
     if existing_booking:
+      record_booking_event(request, timeslot.pk, BookingEvent.BOOK, BookingEvent.CONFLICT)
       return Response({'detail': 'You already have a booking conflicting with this time.'}, status=status.HTTP_400_BAD_REQUEST)
 
     timeslot.booked_by = request.user
     timeslot.save()
+    record_booking_event(request, timeslot.pk, BookingEvent.BOOK, BookingEvent.OK)
 
     output_serializer = TimeSlotSerializer(timeslot, context={'request': request})
     return Response(output_serializer.data, status=status.HTTP_200_OK)
 
   # --- Unbooking Action ---
-  @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated], serializer_class=BookingActionSerializer)
+  @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated], serializer_class=BookingActionSerializer,
+          throttle_classes=[BookingUserThrottle, BookingGlobalThrottle])
+  @idempotent
   def unbook(self, request, pk=None):
       timeslot = self.get_object()
 
       if timeslot.booked_by != request.user:
+          record_booking_event(request, timeslot.pk, BookingEvent.UNBOOK, BookingEvent.NOT_OWNER)
           return Response({'detail': 'You did not book this slot.'}, status=status.HTTP_403_FORBIDDEN)
 
       if timeslot.start_time < timezone.now():
+            record_booking_event(request, timeslot.pk, BookingEvent.UNBOOK, BookingEvent.PAST)
             return Response({'detail': 'Cannot unbook a slot in the past.'}, status=status.HTTP_400_BAD_REQUEST)
 
       timeslot.booked_by = None
       timeslot.save()
+      record_booking_event(request, timeslot.pk, BookingEvent.UNBOOK, BookingEvent.OK)
 
       output_serializer = TimeSlotSerializer(timeslot, context={'request': request})
       return Response(output_serializer.data, status=status.HTTP_200_OK)
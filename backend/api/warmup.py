@@ -0,0 +1,179 @@
+"""
+Startup warm-up for the WSGI/ASGI entry points.
+
+Django and DRF defer a lot of work to the first request a process serves:
+compiling URL patterns, importing the modules behind each route (allauth via
+dj_rest_auth), building serializer fields, loading translation catalogs and
+opening the first database connection. `warm_up()` does that work before the
+server accepts traffic. Under `gunicorn --preload` it runs once in the master
+and the workers inherit the result; it finishes by closing every database and
+cache connection so no socket is shared across the fork.
+
+Each step is best effort: a failure (e.g. the database not reachable yet) is
+logged and startup continues.
+
+`profile_startup()` measures django.setup() per app plus the warm-up steps; the
+startup_report command runs it in a fresh interpreter.
+"""
+import logging
+import time
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _walk_patterns(patterns):
+  from django.urls import URLPattern, URLResolver
+  for pattern in patterns:
+    if isinstance(pattern, URLResolver):
+      yield pattern
+      yield from _walk_patterns(pattern.url_patterns)
+    elif isinstance(pattern, URLPattern):
+      yield pattern
+
+
+def _view_classes():
+  from django.urls import get_resolver
+  seen = set()
+  for pattern in _walk_patterns(get_resolver().url_patterns):
+    view_class = getattr(getattr(pattern, 'callback', None), 'cls', None)
+    if view_class is not None and view_class not in seen:
+      seen.add(view_class)
+      yield view_class
+
+
+def warm_urls():
+  """ Build the resolver's lookup tables and compile every route's regex. """
+  from django.urls import get_resolver
+  resolver = get_resolver()
+  resolver.reverse_dict  # populates the reverse, namespace and app lookups
+  count = 0
+  for pattern in _walk_patterns(resolver.url_patterns):
+    pattern.pattern.regex  # compiled on first access
+    count += 1
+  return count
+
+
+def warm_serializers():
+  """ Instantiate the serializer of every DRF view (and its extra actions) and build its fields. """
+  serializer_classes = set()
+  for view_class in _view_classes():
+    serializer_class = getattr(view_class, 'serializer_class', None)
+    if isinstance(serializer_class, type):
+      serializer_classes.add(serializer_class)
+    for extra_action in getattr(view_class, 'get_extra_actions', lambda: [])():
+      serializer_class = extra_action.kwargs.get('serializer_class')
+      if isinstance(serializer_class, type):
+        serializer_classes.add(serializer_class)
+  for serializer_class in serializer_classes:
+    serializer_class(context={}).fields  # built on first access
+  return len(serializer_classes)
+
+
+def warm_translations():
+  from django.utils import translation
+  translation.activate(settings.LANGUAGE_CODE)
+  translation.deactivate()
+
+
+def warm_database():
+  """ Open each connection once, so backend setup (version checks, type maps) is done. """
+  from django.db import connections
+  for alias in connections:
+    connections[alias].ensure_connection()
+
+
+def warm_caches():
+  from .cache import category_cache
+  return len(category_cache.all())
+
+
+def release_connections():
+  """ Close database and cache connections; forked workers open their own. """
+  from django.core.cache import close_caches
+  from django.db import connections
+  connections.close_all()
+  close_caches()
+
+
+STEPS = [
+  ('urls', warm_urls),
+  ('serializers', warm_serializers),
+  ('translations', warm_translations),
+  ('database', warm_database),
+  ('caches', warm_caches),
+  ('release connections', release_connections),
+]
+
+
+def warm_up(steps=STEPS):
+  """ Run each step once; returns [(name, seconds)], with None as the time of a failed step. """
+  timings = []
+  for name, step in steps:
+    started = time.perf_counter()
+    try:
+      step()
+    except Exception:
+      logger.warning("Warm-up step '%s' failed; it will happen on the first request instead.", name, exc_info=True)
+      timings.append((name, None))
+      continue
+    timings.append((name, time.perf_counter() - started))
+  logger.info('Warm-up finished in %.1f ms.', sum(seconds or 0 for _, seconds in timings) * 1000)
+  return timings
+
+
+def warm_up_if_enabled():
+  if getattr(settings, 'WARM_UP_ON_STARTUP', True):
+    warm_up()
+
+
+def profile_startup(include_warm_up=True):
+  """
+  Time django.setup() per app and then the warm-up steps. Only meaningful in
+  a process where Django has not been set up yet.
+
+  Per app, `import` is loading the app module and its AppConfig, `models` is
+  importing its models module and `ready` is AppConfig.ready().
+  """
+  import django
+  from django.apps import AppConfig
+
+  apps = {}
+
+  def timed(config, method_name, key):
+    method = getattr(config, method_name)
+    def wrapper(*args, **kwargs):
+      started = time.perf_counter()
+      try:
+        return method(*args, **kwargs)
+      finally:
+        apps[config.label][key] += time.perf_counter() - started
+    setattr(config, method_name, wrapper)
+
+  original_create = AppConfig.create.__func__
+
+  def create(cls, entry):
+    started = time.perf_counter()
+    config = original_create(cls, entry)
+    apps[config.label] = {'name': config.name, 'import': time.perf_counter() - started, 'models': 0.0, 'ready': 0.0}
+    timed(config, 'import_models', 'models')
+    timed(config, 'ready', 'ready')
+    return config
+
+  report = {}
+  started = time.perf_counter()
+  settings.INSTALLED_APPS  # import the settings module
+  report['settings'] = time.perf_counter() - started
+
+  AppConfig.create = classmethod(create)
+  try:
+    setup_started = time.perf_counter()
+    django.setup()
+    report['setup'] = time.perf_counter() - setup_started
+  finally:
+    AppConfig.create = classmethod(original_create)
+
+  report['apps'] = [{'label': label, **timings} for label, timings in apps.items()]
+  report['warm_up'] = warm_up() if include_warm_up else []
+  report['total'] = time.perf_counter() - started
+  return report
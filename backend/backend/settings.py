@@ -10,17 +10,14 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-STATIC_URL = '/static/'
-STATIC_ROOT = BASE_DIR / 'staticfiles'
-STATICFILES_DIRS = [
-    BASE_DIR.parent / 'frontend/dist', 
-]
-
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = 'django-insecure-ld=34o#n6bv2^_7p2x)xb4cb_r=jx(p$+8v(jo-7xmc7egooz#'
 
@@ -54,8 +51,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.CompressionMiddleware',
+    'api.middleware.ProfilingMiddleware',
+    'api.middleware.SlowQueryOriginMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -73,6 +74,11 @@ CORS_ALLOWED_ORIGINS = [
 # Allow credentials (cookies, authorization headers) if using session/token auth
 CORS_ALLOW_CREDENTIALS = True
 
+# Let browser clients send Idempotency-Key on book/unbook and X-Profile, and read the
+# replay/throttle/profile headers
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'x-profile')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'Retry-After', 'X-Profile-Id']
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -104,15 +110,95 @@ DATABASES = {
     }
 }
 
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+#
+# Django's default local-memory cache, spelled out because several features
+# keep cross-request state in it: the booking throttles, the category cache
+# version, Idempotency-Key replay markers and stored profile reports. Each
+# process gets its own copy, so with several workers every throttle bucket
+# (including booking_global) exists once per worker. Under a multi-process
+# server point this at a shared backend, e.g. Redis
+# ('django.core.cache.backends.redis.RedisCache', needs the redis package).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    # Token buckets for book/unbook (api.throttling): burst N, then N per period.
+    # Buckets live in the default cache, so with the per-process cache above the
+    # effective limits are N per worker; booking_global allows workers x 50/s.
+    'DEFAULT_THROTTLE_RATES': {
+        'booking': '10/min',
+        'booking_global': '50/s',
+    },
 }
 
+# Longest (seconds) a process serves its in-memory Category copy (api/cache.py)
+# without reloading. Saves reach other processes sooner through a shared cache.
+CATEGORY_CACHE_TTL = 60
+
+# Widest window (in days) a single /api/timeslots/ request may cover via start/end/days
+TIMESLOT_MAX_RANGE_DAYS = 92
+
+# How long a book/unbook response is kept for replay under its Idempotency-Key
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# A request still running under a key after this long is presumed dead; a retry takes the key over
+IDEMPOTENCY_CLAIM_TIMEOUT = timedelta(minutes=1)
+
+# Run api.warmup.warm_up() when backend/wsgi.py or asgi.py is loaded (before
+# fork with gunicorn --preload), so no worker pays first-request setup costs.
+WARM_UP_ON_STARTUP = True
+
+# BookingEvent audit log (api/events.py): rows are buffered in memory and
+# written with one bulk insert when the buffer is full or the oldest row is
+# this many seconds old. None flushes only when full (and at exit).
+BOOKING_EVENT_BUFFER_SIZE = 100
+BOOKING_EVENT_FLUSH_INTERVAL = 2.0
+# A write failing with OperationalError (e.g. SQLite "database is locked") is
+# retried this many times, after this many seconds, doubling each time.
+BOOKING_EVENT_FLUSH_RETRIES = 3
+BOOKING_EVENT_RETRY_DELAY = 0.5
+
+# Background task queue (api/tasks.py, run with `manage.py run_worker`).
+TASK_WORKER_THREADS = 4
+TASK_MAX_ATTEMPTS = 3  # default per task, including the first run
+TASK_RETRY_BACKOFF = 30  # seconds before the first retry; doubles per attempt
+TASK_RETRY_BACKOFF_MAX = 3600
+TASK_CLAIM_TIMEOUT = timedelta(minutes=10)  # a running task not finished by then is run again
+
+# Per-request profiling for staff (api/profiling.py): send `X-Profile: 1` or
+# `?_profile=1` and fetch /api/profiles/<X-Profile-Id>/, or use `inline`.
+# Stored reports are in the default cache: with the per-process one above, only
+# `inline` works reliably when several workers serve the API.
+REQUEST_PROFILING_ENABLED = True
+REQUEST_PROFILING_TOP = 30  # rows per section of the report
+REQUEST_PROFILING_TTL = 3600  # seconds a stored report is kept
+
+# Slow-query log (api/slowqueries.py): statements at least this slow are
+# aggregated per fingerprint with their EXPLAIN plan; see the "Slow queries"
+# admin page or `manage.py dump_slow_queries`.
+SLOW_QUERY_LOG_ENABLED = True
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG_MAX_ENTRIES = 200  # distinct fingerprints kept per process
+SLOW_QUERY_PUBLISH_INTERVAL = 10  # seconds between publishing to the cache
+
+# Response compression (api.middleware.CompressionMiddleware). zstd and br are
+# used when the optional `zstandard` / `brotli` packages are installed.
+API_COMPRESSION_MIN_SIZE = 1024  # bytes; smaller non-streaming responses are sent as-is
+API_COMPRESSION_LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}
+API_COMPRESSION_CONTENT_TYPES = ['application/json', 'text/csv']
+
 REST_AUTH = {
     'LOGIN_SERIALIZER': 'dj_rest_auth.serializers.LoginSerializer',
     'REGISTER_SERIALIZER': 'dj_rest_auth.registration.serializers.RegisterSerializer',
@@ -171,7 +257,25 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
-STATIC_URL = 'static/'
+STATIC_URL = '/static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STATICFILES_DIRS = [
+    BASE_DIR.parent / 'frontend/dist', 
+]
+
+# collectstatic writes content-hashed copies, a manifest, and .gz/.br siblings
+# (generated in STATIC_COMPRESS_WORKERS processes; .br needs `brotli`).
+# WhiteNoiseMiddleware serves hashed files with an immutable, far-future
+# Cache-Control and picks the precompressed variant from Accept-Encoding.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'api.storage.ParallelCompressedManifestStaticFilesStorage',
+    },
+}
+STATIC_COMPRESS_WORKERS = None  # None = one per CPU
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
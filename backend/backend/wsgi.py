@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Do the first-request work (URL compilation, serializer setup, DB connection)
+# now, before serving; see api/warmup.py. Disable with WARM_UP_ON_STARTUP = False.
+from api.warmup import warm_up_if_enabled  # noqa: E402
+
+warm_up_if_enabled()
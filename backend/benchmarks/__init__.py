@@ -0,0 +1,11 @@
+"""
+Benchmarks for the backend hot paths. Run from the backend directory, e.g.
+`python -m benchmarks.compression`.
+"""
+import os
+
+
+def setup_django():
+  os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+  import django
+  django.setup()
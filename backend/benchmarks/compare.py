@@ -0,0 +1,94 @@
+"""
+Compare hot path benchmark results against the committed baseline.
+
+A case regresses when its best time (less noisy than the median on a busy
+machine) or its peak memory grows by more than `--threshold` (a fraction,
+default 0.25) and by more than a small absolute amount (timer and allocator
+noise), or when it runs more SQL queries than before. Exits with status 1 if anything regressed, so it can gate CI.
+
+    python -m benchmarks.compare                    # run the suite now, compare
+    python -m benchmarks.compare results.json       # compare a saved run
+    python -m benchmarks.compare results.json --baseline other.json --threshold 0.1
+
+Timings only compare meaningfully on the same machine and Python/Django
+versions as the baseline; a warning is printed when the environments differ.
+Refresh the baseline with `python -m benchmarks.hotpaths --save-baseline` in
+the change that intentionally moves the numbers.
+"""
+import argparse
+import json
+from pathlib import Path
+from . import setup_django
+from .hotpaths import BASELINE
+
+# metric -> smallest increase that can count as a regression
+METRICS = {'min_ms': 0.05, 'peak_kb': 4.0, 'queries': 0}
+
+
+def compare(baseline, current, threshold=0.25):
+  """
+  One row per metric of every case in `current`: (scale, case, metric,
+  before, after, change, regressed). `before` and `change` are None for cases
+  not in the baseline.
+  """
+  rows = []
+  for scale, cases in current['results'].items():
+    for name, metrics in cases.items():
+      previous = baseline['results'].get(scale, {}).get(name)
+      for metric, min_delta in METRICS.items():
+        after = metrics[metric]
+        if previous is None or metric not in previous:
+          rows.append((scale, name, metric, None, after, None, False))
+          continue
+        before = previous[metric]
+        change = (after - before) / before if before else None
+        if metric == 'queries':
+          regressed = after > before
+        else:
+          regressed = after - before > min_delta and (before == 0 or change > threshold)
+        rows.append((scale, name, metric, before, after, change, regressed))
+  return rows
+
+
+def environment_differences(baseline, current):
+  before, after = baseline.get('environment', {}), current.get('environment', {})
+  return [f'{key}: {before.get(key)} -> {after.get(key)}' for key in sorted(set(before) | set(after)) if before.get(key) != after.get(key)]
+
+
+def print_comparison(rows):
+  print(f"{'scale':<7} {'case':<27} {'metric':<9} {'baseline':>10} {'current':>10} {'change':>8}")
+  for scale, name, metric, before, after, change, regressed in rows:
+    before_text = '-' if before is None else f'{before:g}'
+    change_text = 'new' if before is None else ('-' if change is None else f'{change:+.0%}')
+    flag = '  REGRESSION' if regressed else ''
+    print(f"{scale:<7} {name:<27} {metric:<9} {before_text:>10} {after:>10g} {change_text:>8}{flag}")
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('current', nargs='?', help='Results JSON from benchmarks.hotpaths --output; runs the suite when omitted.')
+  parser.add_argument('--baseline', default=str(BASELINE), help=f'Baseline JSON (default {BASELINE.name}).')
+  parser.add_argument('--threshold', type=float, default=0.25, help='Allowed relative slowdown or memory growth (default 0.25).')
+  args = parser.parse_args(argv)
+
+  baseline = json.loads(Path(args.baseline).read_text())
+  if args.current:
+    current = json.loads(Path(args.current).read_text())
+  else:
+    setup_django()
+    from .hotpaths import run_in_test_database
+    current = run_in_test_database(baseline['scales'], baseline['repeat'])
+
+  for difference in environment_differences(baseline, current):
+    print(f'Warning: environment differs from the baseline ({difference}); timings may not be comparable.')
+  rows = compare(baseline, current, args.threshold)
+  print_comparison(rows)
+  regressions = sum(row[-1] for row in rows)
+  if regressions:
+    print(f'{regressions} regression(s) beyond {args.threshold:.0%}.')
+    raise SystemExit(1)
+  print('No regressions.')
+
+
+if __name__ == '__main__':
+  main()
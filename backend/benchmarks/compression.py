@@ -0,0 +1,68 @@
+"""
+Bytes on the wire and CPU per request for compressed week listings.
+
+Builds /api/timeslots/ payloads shaped like TimeSlotSerializer's full output
+at typical week sizes and reports, for every available codec at the levels
+configured in API_COMPRESSION_LEVELS, the compressed size, ratio and CPU time
+per response.
+
+    python -m benchmarks.compression [--repeat 50]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from . import setup_django
+
+WEEK_SIZES = (20, 100, 500)  # slots per week: sparse, typical, dense
+CATEGORIES = ['Yoga', 'Pilates', 'Spin', 'Boxing', 'Swimming', 'Climbing']
+
+
+def week_payload(slot_count):
+  from rest_framework.renderers import JSONRenderer
+  start = datetime(2025, 5, 5, 7, tzinfo=timezone.utc)
+  rows = []
+  for i in range(slot_count):
+    slot_start = start + timedelta(minutes=20 * i)
+    booked = i % 3 == 0
+    rows.append({
+      'id': 10000 + i,
+      'category': {'id': i % len(CATEGORIES) + 1, 'name': CATEGORIES[i % len(CATEGORIES)]},
+      'start_time': slot_start.isoformat().replace('+00:00', 'Z'),
+      'end_time': (slot_start + timedelta(hours=1)).isoformat().replace('+00:00', 'Z'),
+      'booked_by': {'id': i % 40 + 1, 'username': f'member{i % 40}', 'first_name': 'Alex', 'last_name': 'Member'} if booked else None,
+      'is_booked': booked,
+      'booked_by_user': False,
+    })
+  return JSONRenderer().render(rows)
+
+
+def measure(codec, level, body, repeat):
+  started = time.process_time()
+  for _ in range(repeat):
+    compressed = codec.compress(body, level)
+  cpu_ms = (time.process_time() - started) * 1000 / repeat
+  return len(compressed), cpu_ms
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('--repeat', type=int, default=50, help='Compressions per measurement (default 50).')
+  args = parser.parse_args(argv)
+
+  setup_django()
+  from django.conf import settings
+  from api.compression import available_codecs
+  levels = getattr(settings, 'API_COMPRESSION_LEVELS', {})
+
+  print(f"{'slots':>6} {'codec':>6} {'level':>5} {'bytes':>9} {'ratio':>6} {'cpu ms':>8}")
+  for slot_count in WEEK_SIZES:
+    body = week_payload(slot_count)
+    print(f"{slot_count:>6} {'none':>6} {'-':>5} {len(body):>9} {1.0:>6.2f} {0.0:>8.3f}")
+    for codec in available_codecs():
+      level = levels.get(codec.name, codec.default_level)
+      size, cpu_ms = measure(codec, level, body, args.repeat)
+      print(f"{slot_count:>6} {codec.name:>6} {level:>5} {size:>9} {len(body) / size:>6.2f} {cpu_ms:>8.3f}")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,69 @@
+"""
+Deterministic benchmark data.
+
+`generate(slot_count)` fills the (empty) database with categories, users with
+profiles and interests, and `slot_count` time slots spread over WEEKS weeks
+from ANCHOR, about a third of them booked. The same seed always produces the
+same rows, so timings taken on different commits are comparable. Everything
+is inserted with bulk_create; run it inside a transaction you roll back.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+SEED = 20250505
+# A Monday far enough ahead that every generated slot can still be booked.
+ANCHOR = datetime(2100, 1, 4, tzinfo=timezone.utc)
+WEEKS = 4
+SLOT_LENGTH = timedelta(hours=1)
+INTERESTS_PER_USER = 3
+
+
+def generate(slot_count, seed=SEED):
+  """ Create the rows for one scale; returns what the benchmark cases need. """
+  from django.contrib.auth.models import User
+  from api.cache import category_cache
+  from api.models import Category, TimeSlot, UserProfile
+
+  rng = random.Random(seed)
+  category_count = max(5, slot_count // 50)
+  user_count = max(10, slot_count // 20)
+
+  names = [f'Benchmark category {i:05d}' for i in range(category_count)]
+  categories = Category.objects.bulk_create(Category(name=name, name_key=Category.normalize(name)) for name in names)
+  users = User.objects.bulk_create(
+    User(username=f'bench{i:06d}', first_name='Bench', last_name=f'User {i}', password='!')
+    for i in range(user_count)
+  )
+  # bulk_create skips the post_save signal that normally creates the profile.
+  profiles = UserProfile.objects.bulk_create(UserProfile(user=user) for user in users)
+  Interest = UserProfile.interested_categories.through
+  Interest.objects.bulk_create(
+    Interest(userprofile_id=profile.pk, category_id=category.pk)
+    for profile in profiles
+    for category in rng.sample(categories, INTERESTS_PER_USER)
+  )
+
+  quarter_hours = WEEKS * 7 * 24 * 4
+  slots = []
+  for _ in range(slot_count):
+    start = ANCHOR + timedelta(minutes=15 * rng.randrange(quarter_hours))
+    slots.append(TimeSlot(
+      category=rng.choice(categories),
+      start_time=start,
+      end_time=start + SLOT_LENGTH,
+      booked_by=rng.choice(users) if rng.random() < 0.3 else None,
+    ))
+  TimeSlot.objects.bulk_create(slots, batch_size=1000)
+
+  # The client of the write benchmarks books nothing else, so booking never conflicts.
+  client = User.objects.create_user('bench-client', password='!')
+  free_slot = TimeSlot.objects.filter(booked_by__isnull=True).order_by('start_time', 'id').first()
+
+  category_cache.invalidate()
+  return SimpleNamespace(
+    categories=categories,
+    client=client,
+    free_slot=free_slot,
+    week=(ANCHOR, ANCHOR + timedelta(days=7)),
+  )
@@ -0,0 +1,233 @@
+"""
+Wall time, allocations and query counts for the API hot paths.
+
+Each scale gets a fresh data set from benchmarks.data (inside a transaction
+that is rolled back afterwards) in a throwaway test database, and each case is
+run once to warm up, then `--repeat` times with the garbage collector off.
+Reported per case: median and best wall time, peak memory allocated during
+one run (tracemalloc) and the number of SQL queries.
+
+    python -m benchmarks.hotpaths [--scales small medium] [--repeat 20] [--output results.json]
+    python -m benchmarks.hotpaths --save-baseline    # rewrite benchmarks/baseline.json
+
+Compare a run against the committed baseline with `python -m benchmarks.compare`.
+"""
+import argparse
+import gc
+import itertools
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from . import setup_django
+
+BASELINE = Path(__file__).with_name('baseline.json')
+# Number of generated time slots per scale.
+SCALES = {'small': 200, 'medium': 2_000, 'large': 20_000}
+# Don't let throttling, or the booking audit log filling up, skew the write cases.
+BENCHMARK_THROTTLE_RATES = {'booking': '1000000/s', 'booking_global': '1000000/s'}
+
+
+def _factory():
+  from rest_framework.test import APIRequestFactory
+  return APIRequestFactory()
+
+
+def timeslot_serializer(data):
+  """ TimeSlotSerializer(many=True), full output, over one week of slots. """
+  from rest_framework.request import Request
+  from api.models import TimeSlot
+  from api.serializers import TimeSlotSerializer
+  slots = list(
+    TimeSlot.objects.filter(start_time__gte=data.week[0], start_time__lt=data.week[1])
+    .select_related('booked_by').order_by('start_time')
+  )
+  request = Request(_factory().get('/api/timeslots/'))
+  request.user = data.client
+  return lambda: TimeSlotSerializer(slots, many=True, context={'request': request}).data
+
+
+def timeslot_queryset(data):
+  """ TimeSlotViewSet.get_queryset() for a week in three categories, evaluated. """
+  from rest_framework.request import Request
+  from api.views import TimeSlotViewSet
+  params = {
+    'start_date': data.week[0].date().isoformat(),
+    'category_id[]': [category.pk for category in data.categories[:3]],
+  }
+  request = Request(_factory().get('/api/timeslots/', params))
+
+  def run():
+    view = TimeSlotViewSet(request=request, action='list', format_kwarg=None, args=(), kwargs={})
+    return list(view.get_queryset())
+  return run
+
+
+def book_unbook(data):
+  """ POST book then unbook on a free slot, through the routed views, responses rendered. """
+  from django.urls import resolve, reverse
+  from rest_framework.test import force_authenticate
+  factory = _factory()
+  urls = [reverse(name, kwargs={'pk': data.free_slot.pk}) for name in ('timeslot-book', 'timeslot-unbook')]
+  matches = [(url, resolve(url)) for url in urls]
+
+  def run():
+    for url, match in matches:
+      request = factory.post(url)
+      force_authenticate(request, user=data.client)
+      response = match.func(request, *match.args, **match.kwargs)
+      response.render()
+      if response.status_code != 200:
+        raise RuntimeError(f'POST {url} returned {response.status_code}: {response.content[:200]!r}')
+  return run
+
+
+def profile_update(data):
+  """ UserProfileSerializer update of interested_category_ids, alternating two selections of ten. """
+  from api.serializers import UserProfileSerializer
+  profile = data.client.profile
+  selections = itertools.cycle([
+    [category.pk for category in data.categories[0::2][:10]],
+    [category.pk for category in data.categories[1::2][:10]],
+  ])
+
+  def run():
+    serializer = UserProfileSerializer(profile, data={'interested_category_ids': next(selections)})
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+    return serializer.data
+  return run
+
+
+CASES = {
+  'serializer.timeslot_list': timeslot_serializer,
+  'viewset.timeslot_queryset': timeslot_queryset,
+  'view.book_unbook': book_unbook,
+  'serializer.profile_update': profile_update,
+}
+
+
+def measure(func, repeat):
+  from django.db import connection
+  from django.test.utils import CaptureQueriesContext
+  func()  # warm up: lazy imports, caches, compiled SQL
+
+  gc_was_enabled = gc.isenabled()
+  gc.disable()
+  timings = []
+  try:
+    for _ in range(repeat):
+      started = time.perf_counter()
+      func()
+      timings.append(time.perf_counter() - started)
+  finally:
+    if gc_was_enabled:
+      gc.enable()
+
+  with CaptureQueriesContext(connection) as queries:
+    func()
+
+  tracemalloc.start()
+  try:
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+
+  return {
+    'median_ms': round(statistics.median(timings) * 1000, 3),
+    'min_ms': round(min(timings) * 1000, 3),
+    'peak_kb': round(peak / 1024, 1),
+    'queries': len(queries),
+  }
+
+
+def run_suite(scales=SCALES, repeat=20, cases=CASES):
+  """ {scale: {case: metrics}} for every case at every scale; needs an empty database. """
+  from django.db import transaction
+  from django.test import override_settings
+  from django.conf import settings
+  from api.cache import category_cache
+  from api.events import booking_events
+  from .data import generate
+
+  overrides = {
+    'REST_FRAMEWORK': {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': BENCHMARK_THROTTLE_RATES},
+    'BOOKING_EVENT_FLUSH_INTERVAL': None,
+    'BOOKING_EVENT_BUFFER_SIZE': 10 ** 9,
+  }
+  results = {}
+  with override_settings(**overrides):
+    for scale, slot_count in scales.items():
+      try:
+        with transaction.atomic():
+          data = generate(slot_count)
+          results[scale] = {name: measure(setup(data), repeat) for name, setup in cases.items()}
+          transaction.set_rollback(True)
+      finally:
+        booking_events.discard()
+        category_cache.invalidate()
+  return results
+
+
+def environment():
+  import django
+  from django.db import connection
+  return {
+    'python': platform.python_version(),
+    'django': django.get_version(),
+    'database': connection.vendor,
+    'machine': platform.machine(),
+  }
+
+
+def run_in_test_database(scales, repeat):
+  """ Run the suite against a throwaway test database and return the full report. """
+  from django.db import connection
+  from django.test.utils import setup_test_environment, teardown_test_environment
+  setup_test_environment(debug=False)
+  old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+  try:
+    results = run_suite(scales, repeat)
+    return {'environment': environment(), 'repeat': repeat, 'scales': scales, 'results': results}
+  finally:
+    connection.creation.destroy_test_db(old_name, verbosity=0)
+    teardown_test_environment()
+
+
+def print_report(report):
+  print(f"{'scale':<7} {'case':<27} {'median ms':>10} {'min ms':>9} {'peak KB':>9} {'queries':>7}")
+  for scale, cases in report['results'].items():
+    for name, metrics in cases.items():
+      print(
+        f"{scale:<7} {name:<27} {metrics['median_ms']:>10.3f} {metrics['min_ms']:>9.3f}"
+        f" {metrics['peak_kb']:>9.1f} {metrics['queries']:>7}"
+      )
+
+
+def write_report(report, path):
+  Path(path).write_text(json.dumps(report, indent=2) + '\n')
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(SCALES), help='Scales to run (default all).')
+  parser.add_argument('--repeat', type=int, default=20, help='Timed runs per case (default 20).')
+  parser.add_argument('--output', help='Also write the results as JSON to this file.')
+  parser.add_argument('--save-baseline', action='store_true', help=f'Write the results to {BASELINE.name}.')
+  args = parser.parse_args(argv)
+
+  setup_django()
+  report = run_in_test_database({scale: SCALES[scale] for scale in args.scales}, args.repeat)
+  print_report(report)
+  if args.output:
+    write_report(report, args.output)
+  if args.save_baseline:
+    write_report(report, BASELINE)
+    print(f'Baseline written to {BASELINE}.')
+
+
+if __name__ == '__main__':
+  main()
@@ -35,6 +35,13 @@ export const updateUserPreferences = (categoryIds) => apiClient.put('/user/prefe
 
 // --- Categories ---
 export const fetchCategories = () => apiClient.get('/categories/');
+// One page of categories whose name starts with `query` (case-insensitive): { results: [{id, name}], next }.
+// Pass `next` back as `cursor` for the following page; it is null on the last one.
+export const searchCategories = (query, { limit = 20, cursor = null } = {}) => {
+  const params = { q: query, limit };
+  if (cursor) params.cursor = cursor;
+  return apiClient.get('/categories/', { params });
+};
 
 // --- Time Slots ---
 // startDate should be 'YYYY-MM-DD'
@@ -42,6 +49,8 @@ export const fetchTimeSlots = (startDate, categoryIds = null) => {
   console.log(`API Call: fetchTimeSlots triggered with startDate=${startDate}, categoryIds=${JSON.stringify(categoryIds)}`);
   const params = {
     start_date: startDate,
+    // Only the fields the calendar renders; lets the backend skip the booked_by user join
+    fields: 'id,start_time,end_time,is_booked,booked_by_user,category.id,category.name',
     // Axios will automatically format this as category_id=1&category_id=3 etc. if categoryIds is [1, 3]
     category_id: categoryIds
   };
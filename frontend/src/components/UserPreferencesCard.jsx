@@ -1,12 +1,27 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import {
   Card, CardContent, Typography, FormGroup, FormControlLabel, Checkbox, Button,
-  Box, CircularProgress, Alert, Snackbar
+  Box, CircularProgress, Alert, Snackbar, TextField
 } from '@mui/material';
-import { fetchCategories, fetchUserProfile, updateUserPreferences } from '../api/apiService';
+import { searchCategories, fetchUserProfile, updateUserPreferences } from '../api/apiService';
 
+const SEARCH_DEBOUNCE_MS = 300;
+const SEARCH_PAGE_SIZE = 20;
+
+// Only the user's selected categories are loaded up front; others are found by name
+// prefix as the user types, so the card stays small however many categories exist.
 function UserPreferencesCard({ onSelectionChange, onSaveSuccess }) {
-  const [categories, setCategories] = useState([]);
+  // Selected (or once selected) categories by id, kept so their names stay shown
+  const [knownCategories, setKnownCategories] = useState(new Map());
+  const [query, setQuery] = useState('');
+  // Latest search text, for discarding "Show more" pages that arrive after it changed
+  const queryRef = useRef('');
+  queryRef.current = query.trim();
+  const [searchResults, setSearchResults] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [searching, setSearching] = useState(false);
+  // Shown under the search field so a failed search doesn't hide the selections
+  const [searchError, setSearchError] = useState('');
   const [selectedCategoryIds, setSelectedCategoryIds] = useState(new Set());
   const [initialSelectedIds, setInitialSelectedIds] = useState(new Set());
   const [loading, setLoading] = useState(false);
@@ -17,41 +32,26 @@ function UserPreferencesCard({ onSelectionChange, onSaveSuccess }) {
   const loadData = useCallback(async () => {
     setLoading(true);
     setError('');
-    setCategories([]);
+    setKnownCategories(new Map());
     setSelectedCategoryIds(new Set());
     setInitialSelectedIds(new Set());
     try {
       const results = await Promise.allSettled([
-        fetchCategories(),
         fetchUserProfile()
       ]);
 
       console.log("API Fetch Results:", results);
 
-      const categoriesResult = results[0];
-      const profileResult = results[1];
-
-      // Process Categories Result
-      if (categoriesResult.status === 'fulfilled' && categoriesResult.value?.data) {
-        const categoryData = categoriesResult.value.data;
-        console.log("[TEST DEBUG] Categories Response Data:", categoryData);
-        if (Array.isArray(categoryData)) {
-          setCategories(categoryData);
-        } else {
-          console.warn("Received non-array data for categories:", categoryData);
-          setError(prev => prev ? prev + " / Invalid category data" : "Invalid category data");
-        }
-      } else {
-        console.error("Failed to fetch categories:", categoriesResult.reason || "Unknown error");
-        setError(prev => prev ? prev + " / Failed to load categories" : "Failed to load categories");
-      }
+      const profileResult = results[0];
 
       // Process Profile Result (and inform parent of initial selection)
       let initialSelection = new Set(); // Use appropriate type if using TS
       if (profileResult.status === 'fulfilled' && profileResult.value?.data) {
         const profileData = profileResult.value.data;
         console.log("[TEST DEBUG] Profile Response Data:", profileData);
-        const userSelectedIds = new Set(profileData?.interested_categories?.map(cat => cat.id) || []);
+        const interested = profileData?.interested_categories || [];
+        setKnownCategories(new Map(interested.map(cat => [cat.id, cat])));
+        const userSelectedIds = new Set(interested.map(cat => cat.id));
         setSelectedCategoryIds(userSelectedIds);
         setInitialSelectedIds(userSelectedIds);
         initialSelection = userSelectedIds; // Store for callback
@@ -72,7 +72,7 @@ function UserPreferencesCard({ onSelectionChange, onSaveSuccess }) {
     // Catch potential errors *outside* Promise.allSettled
     console.error("Unexpected error in loadData:", err);
     setError("An unexpected error occurred while loading data.");
-    setCategories([]); // Reset on unexpected error
+    setKnownCategories(new Map()); // Reset on unexpected error
     setSelectedCategoryIds(new Set());
     setInitialSelectedIds(new Set());
   } finally {
@@ -82,6 +82,55 @@ function UserPreferencesCard({ onSelectionChange, onSaveSuccess }) {
 
   useEffect(() => { loadData(); }, [loadData]);
 
+  // Search as the user types, once they pause
+  useEffect(() => {
+    const prefix = query.trim();
+    setNextCursor(null);
+    setSearchError('');
+    if (!prefix) {
+      setSearchResults([]);
+      setSearching(false);
+      return undefined;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      setSearching(true);
+      try {
+        const response = await searchCategories(prefix, { limit: SEARCH_PAGE_SIZE });
+        if (!cancelled) {
+          setSearchResults(response.data?.results || []);
+          setNextCursor(response.data?.next || null);
+        }
+      } catch (err) {
+        console.error("Failed to search categories:", err);
+        if (!cancelled) setSearchError("Failed to search categories. Try again.");
+      } finally {
+        if (!cancelled) setSearching(false);
+      }
+    }, SEARCH_DEBOUNCE_MS);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [query]);
+
+  const handleLoadMore = async () => {
+    const prefix = query.trim();
+    setSearching(true);
+    setSearchError('');
+    try {
+      const response = await searchCategories(prefix, { limit: SEARCH_PAGE_SIZE, cursor: nextCursor });
+      if (queryRef.current !== prefix) return; // the user typed something else meanwhile
+      setSearchResults(prev => [...prev, ...(response.data?.results || [])]);
+      setNextCursor(response.data?.next || null);
+    } catch (err) {
+      console.error("Failed to load more categories:", err);
+      if (queryRef.current === prefix) setSearchError("Failed to load more categories. Try again.");
+    } finally {
+      if (queryRef.current === prefix) setSearching(false);
+    }
+  };
+
   const handleCheckboxChange = (event) => {
     const { value, checked } = event.target;
     const categoryId = parseInt(value, 10);
@@ -90,6 +139,11 @@ function UserPreferencesCard({ onSelectionChange, onSaveSuccess }) {
     const newIds = new Set(selectedCategoryIds);
     if (checked) {
       newIds.add(categoryId);
+      // Remember the name so the category stays listed after the search changes
+      const category = searchResults.find(cat => cat.id === categoryId);
+      if (category && !knownCategories.has(categoryId)) {
+        setKnownCategories(new Map(knownCategories).set(categoryId, category));
+      }
     } else {
       newIds.delete(categoryId);
     }
@@ -128,6 +182,14 @@ function UserPreferencesCard({ onSelectionChange, onSaveSuccess }) {
   const hasChanges = initialSelectedIds.size !== selectedCategoryIds.size ||
                     ![...initialSelectedIds].every(id => selectedCategoryIds.has(id));
 
+  // Selected categories first (unchecked ones stay until saved so they can be re-checked),
+  // then search matches not already listed.
+  const listedCategories = [...knownCategories.values()].filter(
+    cat => selectedCategoryIds.has(cat.id) || initialSelectedIds.has(cat.id)
+  );
+  const listedIds = new Set(listedCategories.map(cat => cat.id));
+  const categories = [...listedCategories, ...searchResults.filter(cat => !listedIds.has(cat.id))];
+
   return (
     <Card>
       <CardContent>
@@ -141,6 +203,20 @@ function UserPreferencesCard({ onSelectionChange, onSaveSuccess }) {
         {loading && <CircularProgress size={24} sx={{ display: 'block', margin: 'auto' }} />}
         {error && !loading && <Alert severity="error" sx={{ mb: 2 }}>{error}</Alert>}
 
+        {!loading && !error && (
+          <TextField
+            label="Find categories"
+            placeholder="Start typing a category name"
+            size="small"
+            fullWidth
+            value={query}
+            onChange={(event) => setQuery(event.target.value)}
+            error={Boolean(searchError)}
+            helperText={searchError}
+            sx={{ mb: 1 }}
+          />
+        )}
+
         {!loading && !error && (
           <FormGroup>
             {categories.length > 0 ? categories.map((category) => (
@@ -155,7 +231,17 @@ function UserPreferencesCard({ onSelectionChange, onSaveSuccess }) {
                 }
                 label={category.name}
               />
-            )) : <Typography variant="body2">No categories available.</Typography>}
+            )) : (
+              <Typography variant="body2">
+                {query.trim() && !searching ? 'No matching categories.' : 'No categories selected.'}
+              </Typography>
+            )}
+            {searching && <CircularProgress size={20} sx={{ display: 'block', margin: 'auto', mt: 1 }} />}
+            {nextCursor && !searching && (
+              <Button size="small" onClick={handleLoadMore} sx={{ alignSelf: 'flex-start' }}>
+                Show more
+              </Button>
+            )}
           </FormGroup>
         )}
 
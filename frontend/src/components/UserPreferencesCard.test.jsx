@@ -1,7 +1,9 @@
 import { render, screen } from '@testing-library/react';
 import userEvent from '@testing-library/user-event';
 import { describe, it, expect, vi } from 'vitest';
+import { http, HttpResponse } from 'msw';
 
+import { server } from '../mocks/server';
 import UserPreferencesCard from './UserPreferencesCard';
 
 describe('UserPreferencesCard', () => {
@@ -20,19 +22,50 @@ describe('UserPreferencesCard', () => {
     return { user, mockOnSelectionChange, mockOnSaveSuccess };
   };
 
-  it('loads categories and user preferences correctly', async () => {
+  it('loads the user preferences without listing every category', async () => {
     setup();
 
-    // Wait for loading to finish and check if categories from MSW handlers are rendered
-    expect(await screen.findByText('Mock Cat 1')).toBeInTheDocument();
-    expect(screen.getByText('Mock Cat 2')).toBeInTheDocument();
-
-    // Check if initially selected checkbox (from mock profile) is checked
-    const checkbox1 = screen.getByRole('checkbox', { name: 'Mock Cat 1' });
+    // The selected category from the mock profile is shown, checked
+    const checkbox1 = await screen.findByRole('checkbox', { name: 'Mock Cat 1' });
     expect(checkbox1).toBeChecked();
 
-    // Check if initially unselected checkbox is not checked
-    const checkbox2 = screen.getByRole('checkbox', { name: 'Mock Cat 2' });
+    // Other categories are only fetched once the user searches
+    expect(screen.queryByText('Mock Cat 2')).not.toBeInTheDocument();
+  });
+
+  it('finds categories by name prefix and keeps selections', async () => {
+    const { user, mockOnSelectionChange } = setup();
+    await screen.findByRole('checkbox', { name: 'Mock Cat 1' });
+
+    await user.type(screen.getByLabelText('Find categories'), 'mock cat');
+
+    // Matches are listed once, after the already selected category
+    const checkbox2 = await screen.findByRole('checkbox', { name: 'Mock Cat 2' });
     expect(checkbox2).not.toBeChecked();
+    expect(screen.getAllByRole('checkbox', { name: 'Mock Cat 1' })).toHaveLength(1);
+
+    await user.click(checkbox2);
+    expect(mockOnSelectionChange).toHaveBeenLastCalledWith(new Set([1, 2]));
+
+    // A selected category stays listed when the search changes
+    await user.clear(screen.getByLabelText('Find categories'));
+    expect(await screen.findByRole('checkbox', { name: 'Mock Cat 2' })).toBeChecked();
+  });
+
+  it('shows a failed search next to the search field and keeps the selections', async () => {
+    const { user } = setup();
+    await screen.findByRole('checkbox', { name: 'Mock Cat 1' });
+    server.use(
+      http.get('http://localhost:8000/api/categories/', () => new HttpResponse(null, { status: 500 }), { once: true })
+    );
+
+    await user.type(screen.getByLabelText('Find categories'), 'mock');
+    expect(await screen.findByText(/Failed to search categories/)).toBeInTheDocument();
+    expect(screen.getByRole('checkbox', { name: 'Mock Cat 1' })).toBeChecked();
+
+    // The next search works and clears the message
+    await user.type(screen.getByLabelText('Find categories'), ' cat');
+    expect(await screen.findByRole('checkbox', { name: 'Mock Cat 2' })).toBeInTheDocument();
+    expect(screen.queryByText(/Failed to search categories/)).not.toBeInTheDocument();
   });
 });
\ No newline at end of file
@@ -25,8 +25,14 @@ export const handlers = [
   }),
   
   // Mock fetching categories
-  http.get(`${API_BASE_URL}/categories/`, () => {
+  http.get(`${API_BASE_URL}/categories/`, ({ request }) => {
     console.log('MSW: Intercepting GET /api/categories/');
+    const url = new URL(request.url);
+    if (url.searchParams.has('q')) {
+      const prefix = url.searchParams.get('q').trim().toLowerCase();
+      const results = mockCategories.filter(cat => cat.name.toLowerCase().startsWith(prefix));
+      return HttpResponse.json({ results, next: null });
+    }
     return HttpResponse.json(mockCategories)
   }),
 